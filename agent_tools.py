@@ -0,0 +1,88 @@
+from typing import Any
+
+from sqlalchemy import text
+from langchain_community.agent_toolkits.sql.toolkit import SQLDatabaseToolkit
+from langchain_community.tools.sql_database.tool import QuerySQLCheckerTool, QuerySQLDataBaseTool
+
+import tracing
+from guardrails import StatementTimeout, check_statement, fetch_capped, statement_timeout
+from results import AGENT_MAX_ROWS, enforce_limit
+from sql_repair import REPAIRED_PREFIX, SQLRepairer, SQLValidationError, check_sql
+
+
+class BoundedQuerySQLDataBaseTool(QuerySQLDataBaseTool):
+    """sql_db_query that fetches at most AGENT_MAX_ROWS rows through a cursor, under the guardrails.
+
+    The stock tool runs fetchall() and stringifies everything, so a broad
+    question can pull millions of rows into memory just to truncate them.
+    Only read-only SELECTs run, each under the statement timeout and byte cap.
+    `on_result(sql, columns, rows, truncated)`, if set, gets every result it fetched.
+    """
+
+    max_rows: int = AGENT_MAX_ROWS
+    on_result: Any = None
+
+    def _fetch(self, query):
+        query = check_statement(query, self.db.dialect)
+        bounded = enforce_limit(query, self.max_rows + 1)
+        with self.db._engine.connect() as conn, statement_timeout(conn):
+            result = conn.execute(text(bounded))
+            columns = list(result.keys())
+            rows, truncated = fetch_capped(result, self.max_rows)
+        tracing.annotate_sql(rows=len(rows), truncated=truncated is not None)
+        if self.on_result is not None:
+            self.on_result(query, columns, rows, truncated)
+        return rows, truncated
+
+    def _run(self, query, run_manager=None):
+        prefix = ''
+        try:
+            rows, truncated = self._fetch(query)
+        except StatementTimeout as e:
+            # Re-running it (or a repaired copy) would only hit the timeout again
+            return f"Error: {e}. Write a cheaper query: filter, aggregate or limit before joining."
+        except Exception as e:
+            # Mechanical mistakes are repaired here instead of costing the agent another LLM turn
+            try:
+                repaired, _ = check_sql(self.db._engine, query, SQLRepairer.from_database(self.db))
+                rows, truncated = self._fetch(repaired)
+            except Exception:
+                return f"Error: {e}"
+            prefix = f"{REPAIRED_PREFIX}{' '.join(repaired.splitlines())}\n"
+        if not rows:
+            return prefix
+        note = {
+            'rows': f'\n(showing the first {self.max_rows} rows only)',
+            'bytes': f'\n(showing the first {len(rows)} rows only: the result is too large)',
+        }.get(truncated, '')
+        return prefix + str([tuple(r) for r in rows]) + note
+
+
+class LocalQueryCheckerTool(QuerySQLDataBaseTool):
+    """sql_db_query_checker without the LLM: EXPLAIN dry run plus local repair against the schema"""
+
+    name: str = 'sql_db_query_checker'
+
+    def _run(self, query, run_manager=None):
+        try:
+            sql, fixes = check_sql(self.db._engine, query, SQLRepairer.from_database(self.db))
+        except SQLValidationError as e:
+            return f"Error: {e}"
+        return sql if not fixes else f"{sql}\n(corrected: {'; '.join(fixes)})"
+
+
+class BoundedSQLDatabaseToolkit(SQLDatabaseToolkit):
+    """SQLDatabaseToolkit whose query tool is row-bounded (passing its results to `on_result`)
+    and whose checker needs no LLM call"""
+
+    on_result: Any = None
+
+    def get_tools(self):
+        tools = []
+        for tool in super().get_tools():
+            if isinstance(tool, QuerySQLDataBaseTool):
+                tool = BoundedQuerySQLDataBaseTool(db=self.db, description=tool.description, on_result=self.on_result)
+            elif isinstance(tool, QuerySQLCheckerTool):
+                tool = LocalQueryCheckerTool(db=self.db, description=tool.description)
+            tools.append(tool)
+        return tools
@@ -1,14 +1,14 @@
 import streamlit as st
+import time
 from pathlib import Path
-from sqlalchemy import create_engine
-from langchain.sql_database import SQLDatabase
-from langchain_community.agent_toolkits.sql.toolkit import SQLDatabaseToolkit
-from langchain_groq import ChatGroq
-from langchain.agents import create_sql_agent
-from langchain.agents.agent_types import AgentType
-from langchain.callbacks import StreamlitCallbackHandler
-import tempfile
-import os
+from intent_router import greeting_reply
+from conversation import Conversation, RENDER_WINDOW
+from async_runner import AsyncRunner
+from theme import theme_colors, theme_css
+from concurrent.futures import CancelledError
+import uuid
+# The database, LLM and dataframe layers are imported further down, where they are first
+# needed: the first render (and the API key prompt) only waits for Streamlit itself
 
 # ──────────────────────────────────────────────────────
 # 🎨 Page Setup & Custom CSS
@@ -33,284 +33,9 @@ with toggle_col:
         st.rerun()
 
 
-# Define theme colors based on current mode
-def get_theme_colors():
-    if st.session_state.dark_mode:
-        return {
-            'bg': '#0e1117',
-            'text': '#fafafa',
-            'secondary_bg': '#262730',
-            'border': '#464853',
-            'card_bg': '#1e1e2e',
-            'gradient_start': '#667eea',
-            'gradient_end': '#764ba2',
-            'success_bg': '#1a472a',
-            'success_color': '#4ade80',
-            'success_border': '#22543d',
-            'error_bg': '#5b1d1d',
-            'error_color': '#ef4444',
-            'error_border': '#7f1d1d',
-            'feature_bg': 'rgba(102, 126, 234, 0.2)',
-            'main_content_bg': 'rgba(102, 126, 234, 0.15)',
-            'main_content_border': 'rgba(102, 126, 234, 0.3)'
-        }
-    else:
-        return {
-            'bg': '#ffffff',
-            'text': '#262626',
-            'secondary_bg': '#f8fafc',
-            'border': '#e2e8f0',
-            'card_bg': '#f1f5f9',
-            'gradient_start': '#667eea',
-            'gradient_end': '#764ba2',
-            'success_bg': '#dcfce7',
-            'success_color': '#15803d',
-            'success_border': '#bbf7d0',
-            'error_bg': '#fef2f2',
-            'error_color': '#dc2626',
-            'error_border': '#fecaca',
-            'feature_bg': 'rgba(102, 126, 234, 0.1)',
-            'main_content_bg': 'rgba(102, 126, 234, 0.08)',
-            'main_content_border': 'rgba(102, 126, 234, 0.2)'
-        }
-colors = get_theme_colors()
-
-# Custom CSS with proper theme support
-st.markdown(f"""
-<style>
-    /* Main app background */
-    .stApp {{
-        background-color: {colors['bg']} !important;
-        color: {colors['text']} !important;
-    }}
-    
-    /* Sidebar styling */
-    .css-1d391kg, .css-1cypcdb, section[data-testid="stSidebar"] {{
-        background-color: {colors['secondary_bg']} !important;
-    }}
-    
-    /* Text elements */
-    .stMarkdown, .stText, p, span, div {{
-        color: {colors['text']} !important;
-    }}
-    
-    /* Reduce top padding */
-    .block-container {{
-        padding-top: 1rem;
-        padding-bottom: 0rem;
-    }}
-    
-    /* Main title styling */
-    .main-title {{
-        background: linear-gradient(90deg, {colors['gradient_start']} 0%, {colors['gradient_end']} 100%);
-        -webkit-background-clip: text;
-        -webkit-text-fill-color: transparent;
-        background-clip: text;
-        font-size: 2.5rem;
-        font-weight: bold;
-        text-align: center;
-        margin-bottom: 0.5rem;
-        margin-top: 0;
-    }}
-    
-    /* Sidebar SQLBOT title */
-    .sidebar-header {{
-        background: linear-gradient(45deg, {colors['gradient_start']}, {colors['gradient_end']});
-        color: white;
-        padding: 1rem;
-        border-radius: 10px;
-        margin-bottom: 1rem;
-        box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
-        text-align: center;
-    }}
-    
-    .sidebar-header h1 {{
-        color: white !important;
-        font-size: 1.8rem;
-        margin: 0;
-        font-weight: bold;
-    }}
-    
-    .sidebar-header p {{
-        color: rgba(255, 255, 255, 0.8) !important;
-        margin: 0.3rem 0 0 0;
-        font-size: 0.85rem;
-    }}
-    
-    /* Connection status indicator */
-    .connection-status {{
-        padding: 0.75rem;
-        border-radius: 8px;
-        text-align: center;
-        margin: 1rem 0;
-        font-weight: bold;
-        border: 1px solid;
-    }}
-    
-    .connected {{
-        background-color: {colors['success_bg']};
-        color: {colors['success_color']} !important;
-        border-color: {colors['success_border']};
-    }}
-    
-    .disconnected {{
-        background-color: {colors['error_bg']};
-        color: {colors['error_color']} !important;
-        border-color: {colors['error_border']};
-    }}
-    
-    /* Database info card */
-    .db-info {{
-        background: {colors['card_bg']};
-        padding: 1rem;
-        border-radius: 10px;
-        margin: 1rem 0;
-        border-left: 4px solid {colors['gradient_start']};
-        color: {colors['text']} !important;
-    }}
-    
-    /* Feature highlights */
-    .feature-box {{
-        background: {colors['feature_bg']};
-        padding: 1rem;
-        border-radius: 8px;
-        margin: 0.5rem 0;
-        border-left: 3px solid {colors['gradient_start']};
-        color: {colors['text']} !important;
-    }}
-    
-    /* File upload info */
-    .file-upload-info {{
-        background: {colors['feature_bg']};
-        padding: 1rem;
-        border-radius: 8px;
-        margin: 1rem 0;
-        border-left: 3px solid {colors['gradient_start']};
-        color: {colors['text']} !important;
-    }}
-    
-    /* Main content styling */
-    .main-content-box {{
-        text-align: center;
-        padding: 1.5rem;
-        background: {colors['main_content_bg']};
-        border-radius: 10px;
-        margin-bottom: 1.5rem;
-        border: 1px solid {colors['main_content_border']};
-    }}
-    
-    .main-content-box h3 {{
-        color: {colors['gradient_start']} !important;
-        margin-bottom: 0.5rem;
-    }}
-    
-    .main-content-box p {{
-        color: {colors['text']} !important;
-        opacity: 0.8;
-        margin: 0;
-    }}
-    
-    /* Custom button styling */
-    .stButton > button {{
-        background: linear-gradient(45deg, {colors['gradient_start']}, {colors['gradient_end']}) !important;
-        color: white !important;
-        border: none !important;
-        border-radius: 8px !important;
-        padding: 0.5rem 1rem !important;
-        font-weight: bold !important;
-        transition: all 0.3s ease !important;
-    }}
-    
-    .stButton > button:hover {{
-        transform: translateY(-2px) !important;
-        box-shadow: 0 4px 8px rgba(0, 0, 0, 0.2) !important;
-    }}
-    
-    /* Theme toggle button specific styling */
-    button[title="Toggle Dark/Light Mode"] {{
-        width: 35px !important;
-        height: 35px !important;
-        min-height: 35px !important;
-        padding: 0 !important;
-        font-size: 18px !important;
-        border-radius: 6px !important;
-        display: flex !important;
-        align-items: center !important;
-        justify-content: center !important;
-    }}
-    
-    /* Chat message styling */
-    .stChatMessage {{
-        background-color: {colors['card_bg']} !important;
-        border-radius: 10px !important;
-        margin-bottom: 1rem !important;
-        color: {colors['text']} !important;
-    }}
-    
-    /* Input fields */
-    .stTextInput > div > div > input {{
-        background-color: {colors['secondary_bg']} !important;
-        color: {colors['text']} !important;
-        border-color: {colors['border']} !important;
-    }}
-    
-    .stSelectbox > div > div > select {{
-        background-color: {colors['secondary_bg']} !important;
-        color: {colors['text']} !important;
-        border-color: {colors['border']} !important;
-    }}
-    
-    /* Radio buttons */
-    .stRadio > div {{
-        color: {colors['text']} !important;
-    }}
-    
-    /* Expander */
-    .streamlit-expanderHeader {{
-        background-color: {colors['secondary_bg']} !important;
-        color: {colors['text']} !important;
-    }}
-    
-    .streamlit-expanderContent {{
-        background-color: {colors['card_bg']} !important;
-        color: {colors['text']} !important;
-    }}
-    
-    /* Success/Error messages */
-    .stSuccess {{
-        background-color: {colors['success_bg']} !important;
-        color: {colors['success_color']} !important;
-    }}
-    
-    .stError {{
-        background-color: {colors['error_bg']} !important;
-        color: {colors['error_color']} !important;
-    }}
-    
-    .stWarning {{
-        background-color: {colors['feature_bg']} !important;
-        color: {colors['text']} !important;
-    }}
-    
-    .stInfo {{
-        background-color: {colors['feature_bg']} !important;
-        color: {colors['text']} !important;
-    }}
-    
-    /* Footer styling */
-    .footer-text {{
-        text-align: center;
-        color: {colors['text']} !important;
-        opacity: 0.7;
-        padding: 1rem;
-    }}
-    
-    /* Hide Streamlit branding */
-    #MainMenu {{visibility: hidden;}}
-    footer {{visibility: hidden;}}
-    header {{visibility: hidden;}}
-</style>
-""", unsafe_allow_html=True)
+# Theme colors and the stylesheet are built once per process (theme.py)
+colors = theme_colors(st.session_state.dark_mode)
+st.markdown(theme_css(st.session_state.dark_mode), unsafe_allow_html=True)
 
 # ──────────────────────────────────────────────────────
 # 🤖 Sidebar - SQLBOT Branding
@@ -336,11 +61,12 @@ with st.sidebar:
 # Initialize session state for uploaded file
 if 'uploaded_file' not in st.session_state:
     st.session_state.uploaded_file = None
-if 'temp_db_path' not in st.session_state:
-    st.session_state.temp_db_path = None
+if 'upload_hashes' not in st.session_state:
+    st.session_state.upload_hashes = {}
 
 # ──────────────────────────────────────────────────────
 # 🛠️ Database Configuration
+auto_index = False
 with st.sidebar.expander("⚙️ Database Settings", expanded=True):
     if radio_opt.index(selected_opt) == 2:  # MySQL option
         db_uri = MYSQL
@@ -376,10 +102,35 @@ with st.sidebar.expander("⚙️ Database Settings", expanded=True):
                 <em>Click "Browse files" above to select your database file</em>
             </div>
             """, unsafe_allow_html=True)
+        auto_index = st.checkbox(
+            "🩺 Create suggested indexes",
+            help="When a generated query scans or sorts where an index would help, add the index to the "
+                 "copy of your file kept for this session (never the shared upload) and report the speed-up."
+        )
     else:  # Default SQLite option
         db_uri = LOCAL_DB
         st.info("📁 Using local Chinook.db SQLite database")
 
+FAST_MODE = '⚡ Fast (single-shot SQL)'
+SPECULATIVE_MODE = '🗳️ Speculative (parallel candidates)'
+AGENT_MODE = '🤖 Agent (multi-step)'
+
+# Read by the chat fragment from session state, so switching engines reruns only this widget
+@st.fragment
+def render_query_engine():
+    st.radio(
+        "🧠 Query engine",
+        [FAST_MODE, SPECULATIVE_MODE, AGENT_MODE],
+        key="sql_mode",
+        help="Fast writes the SQL in one LLM call, checks it locally and runs it; "
+             "it falls back to the agent if the query does not validate or fails. "
+             "Speculative asks for several queries at once, runs the valid ones in parallel and "
+             "answers with the result most of them agree on (more tokens, fewer retries)."
+    )
+
+with st.sidebar:
+    render_query_engine()
+
 # ──────────────────────────────────────────────────────
 # 🔑 API Configuration
 with st.sidebar:
@@ -391,11 +142,27 @@ with st.sidebar:
     else:
         st.markdown('<div class="connection-status disconnected">❌ API Key Required</div>', unsafe_allow_html=True)
 
+@st.cache_resource
+def get_async_runner():
+    return AsyncRunner()
+
+async_runner = get_async_runner()
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+
 # ──────────────────────────────────────────────────────
-# 🧹 Chat Controls
-with st.sidebar:
+# 🧹 Chat Controls (a fragment: stopping a query does not rerun the whole app)
+@st.fragment
+def render_chat_controls():
     st.markdown("### 🎛️ Chat Controls")
-    clear_btn = st.button('🧹 Clear Chat History', use_container_width=True)
+    if st.button('🧹 Clear Chat History', use_container_width=True):
+        st.session_state.pop('conversation', None)
+        st.rerun()
+    if st.button('⏹️ Stop Running Query', use_container_width=True) and async_runner.cancel_session(st.session_state.session_id):
+        st.info("⏹️ Stopped the running query")
+
+with st.sidebar:
+    render_chat_controls()
     
     # Feature highlights
     st.markdown("### ✨ Features")
@@ -439,81 +206,95 @@ if not api_key:
     st.stop()
 
 # ──────────────────────────────────────────────────────
-# 🤖 Initialize LLM
-llm = ChatGroq(groq_api_key=api_key, model_name='Llama3-8b-8192', streaming=True)
+# 📦 Database layer (SQLAlchemy and the SQLDatabase wrapper; LangChain agents load on first use)
+from pipeline import SQLBot, FAST, SPECULATIVE, AGENT, LOCAL_DB_PATH, sqlite_database, mysql_database, upload_database
+from resource_cache import ResourceCache, connection_key
+from uploads import private_copy, store_upload
+from query_cache import QueryCache
+from plan_analyzer import analyze_plan, index_and_time
+from sql_repair import repair_stats
+from guardrails import StatementTimeout, guard_notices, guard_stats
+from engines import pool_metrics
+from results import export_csv, export_parquet, PAGE_SIZE
+import tracing
+from tracing import Trace, instrument_engine, export_jsonl, export_otlp, timed_stream, TRACE_DIR
 
-def cleanup_temp_files():
-    """Clean up temporary database files"""
-    if st.session_state.temp_db_path and os.path.exists(st.session_state.temp_db_path):
-        try:
-            os.unlink(st.session_state.temp_db_path)
-            st.session_state.temp_db_path = None
-        except:
-            pass
+# ──────────────────────────────────────────────────────
+# ♻️ Shared resource cache (engines, SQLDatabase, LLM, agent survive reruns)
+@st.cache_resource
+def get_resource_cache():
+    return ResourceCache(max_entries=12, ttl=3600)
 
-def configure_db(db_uri, mysql_host=None, mysql_user=None, mysql_pass=None, mysql_db=None, uploaded_file=None):
+resource_cache = get_resource_cache()
+
+@st.cache_resource
+def get_query_cache():
+    return QueryCache()
+
+query_cache = get_query_cache()
+
+def store_uploaded_file(uploaded_file):
+    """Content-addressed copy of the upload; hashed once per uploaded file, not per rerun"""
+    file_key = getattr(uploaded_file, 'file_id', None) or (uploaded_file.name, uploaded_file.size)
+    sha = st.session_state.upload_hashes.get(file_key)
+    sha, path = store_upload(uploaded_file, sha=sha)
+    st.session_state.upload_hashes[file_key] = sha
+    return sha, path
+
+def configure_db(db_uri, mysql_host=None, mysql_user=None, mysql_pass=None, mysql_db=None, upload_path=None,
+                 immutable=True):
     if db_uri == LOCAL_DB:
-        dbfilepath = (Path(__file__).parent / 'Chinook.db').absolute()
-        if not dbfilepath.exists():
-            raise FileNotFoundError("Chinook.db not found. Please ensure the database file exists in the same directory.")
-        return SQLDatabase(create_engine(f'sqlite:///{dbfilepath}'))
-    
+        return sqlite_database(LOCAL_DB_PATH)
     elif db_uri == MYSQL:
-        if not (mysql_host and mysql_user and mysql_pass and mysql_db):
-            raise ValueError("Please complete all MySQL connection details.")
-        return SQLDatabase(create_engine(f'mysql+mysqlconnector://{mysql_user}:{mysql_pass}@{mysql_host}/{mysql_db}'))
-    
+        return mysql_database(mysql_host, mysql_user, mysql_pass, mysql_db)
     elif db_uri == UPLOAD_DB:
-        if uploaded_file is None:
-            raise ValueError("Please upload a database file to continue.")
-        
-        # Clean up previous temp files
-        cleanup_temp_files()
-        
-        # Create a new temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.db') as tmp_file:
-            tmp_file.write(uploaded_file.getvalue())
-            tmp_file_path = tmp_file.name
-        
-        try:
-            # Test the database connection
-            engine = create_engine(f'sqlite:///{tmp_file_path}')
-            db = SQLDatabase(engine)
-            
-            # Verify it's a valid SQLite database by trying to get tables
-            tables = db.get_usable_table_names()
-            if not tables:
-                raise ValueError("The uploaded file appears to be empty or invalid.")
-            
-            # Store the temp file path in session state
-            st.session_state.temp_db_path = tmp_file_path
-            
-            return db
-        except Exception as e:
-            # Clean up on error
-            if os.path.exists(tmp_file_path):
-                os.unlink(tmp_file_path)
-            raise e
+        return upload_database(upload_path, immutable=immutable)
+
+def get_db(db_uri, mysql_host=None, mysql_user=None, mysql_pass=None, mysql_db=None, uploaded_file=None,
+           private_path=None):
+    """Return a cached SQLDatabase for this connection, building it only on a cache miss.
+
+    With `private_path`, an upload is read from that session's own writable copy
+    instead of the shared, immutable content-addressed file.
+    """
+    upload_hash, upload_path = store_uploaded_file(uploaded_file) if uploaded_file is not None else (None, None)
+    if private_path is not None:
+        mysql_db, upload_path = str(private_path), private_path
+    conn_key = connection_key(db_uri, mysql_host, mysql_user, mysql_pass, mysql_db, upload_hash)
+    db = resource_cache.get_or_create(
+        conn_key,
+        lambda: configure_db(db_uri, mysql_host, mysql_user, mysql_pass, mysql_db, upload_path,
+                             immutable=private_path is None)
+    )
+    instrument_engine(db._engine)
+    return conn_key, db
 
 # ──────────────────────────────────────────────────────
 # 💾 Database Connection
+private_db_path = None
 try:
     if db_uri == MYSQL:
-        db = configure_db(db_uri, mysql_host, mysql_user, mysql_pass, mysql_db)
+        conn_key, db = get_db(db_uri, mysql_host, mysql_user, mysql_pass, mysql_db)
         st.success(f"✅ Connected to MySQL database: {mysql_db}")
     elif db_uri == UPLOAD_DB:
         # Use the uploaded file from session state if available
         current_file = uploaded_db if uploaded_db is not None else st.session_state.uploaded_file
         
         if current_file is not None:
-            db = configure_db(db_uri, uploaded_file=current_file)
+            if auto_index:
+                # Suggested indexes go into this session's copy, never into the file other sessions share
+                _, shared_path = store_uploaded_file(current_file)
+                private_db_path = private_copy(shared_path, st.session_state.session_id)
+            conn_key, db = get_db(db_uri, uploaded_file=current_file, private_path=private_db_path)
             st.success(f"✅ Connected to uploaded database: {current_file.name}")
         else:
             st.warning("⚠️ Please upload a database file to continue.")
             st.stop()
     else:
-        db = configure_db(db_uri)
+        conn_key, db = get_db(db_uri)
         st.success("✅ Connected to local SQLite database (Chinook.db)")
+    bot = SQLBot(db, conn_key, api_key, resource_cache, query_cache, async_runner)
+    warmup = bot.start_warmup()
     
     # Database info
     with st.expander("📊 Database Information", expanded=False):
@@ -537,10 +318,25 @@ try:
             </div>
             """, unsafe_allow_html=True)
             
+            pool = pool_metrics(db._engine)
+            if db_uri == MYSQL and pool:
+                st.caption(
+                    f"🏊 Connection pool: {pool['checked_out']} checked out / {pool['size']} size, "
+                    f"{pool['overflow']} overflow • wait avg {pool['avg_wait_ms']:.1f} ms, "
+                    f"max {pool['max_wait_ms']:.1f} ms over {pool['checkouts']} checkouts"
+                )
+            
+            cache_stats = resource_cache.stats()
+            st.caption(
+                f"♻️ Resource cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+                f"({cache_stats['entries']} cached, {cache_stats['evictions']} evicted)"
+            )
+            
             if st.button("🔍 Show Table Names"):
                 st.write("**Available Tables:**")
                 for table in table_names:
-                    st.write(f"• {table}")
+                    rows = warmup.tables.get(table, {}).get('rows')
+                    st.write(f"• {table}" + (f" ({rows:,} rows)" if rows is not None else ""))
         except Exception as e:
             st.error(f"❌ Error getting database information: {e}")
 
@@ -553,75 +349,280 @@ except Exception as e:
     st.stop()
 
 # ──────────────────────────────────────────────────────
-# 🤖 Create SQL Agent
-try:
-    toolkit = SQLDatabaseToolkit(db=db, llm=llm)
-    agent = create_sql_agent(
-        llm=llm,
-        toolkit=toolkit,
-        handle_parsing_errors=True,
-        verbose=False,
-        agent_type=AgentType.ZERO_SHOT_REACT_DESCRIPTION
-    )
-except Exception as e:
-    st.error(f"❌ Failed to create SQL agent: {e}")
-    st.stop()
+# 🔥 Warmup progress (polls while the background job runs, never blocks the chat)
+def render_warmup(polling):
+    fraction, label = warmup.progress()
+    if warmup.status == 'running':
+        st.progress(fraction, text=f"🔥 {label}")
+    else:
+        st.caption(f"🔥 {label}")
+        if polling:
+            # run_every is fixed when the fragment is declared; declare it again, without polling
+            st.rerun()
 
-# ──────────────────────────────────────────────────────
-# 💬 Chat Interface
-if 'messages' not in st.session_state or clear_btn:
-    st.session_state['messages'] = [
-        {
-            'role': 'assistant', 
-            'content': '👋 Hello! I\'m SQLBOT, your AI database assistant. Ask me anything about your database - I can help you write queries, analyze data, or just chat!'
-        }
-    ]
-
-# Display chat history
-for msg in st.session_state.messages:
-    with st.chat_message(msg['role']):
-        st.write(msg['content'])
+with st.sidebar:
+    warmup_polling = warmup.status == 'running'
+    st.fragment(run_every=1.0 if warmup_polling else None)(render_warmup)(warmup_polling)
 
 # ──────────────────────────────────────────────────────
-# ⌨️ Chat Input
-user_query = st.chat_input("💭 Ask about your data, request a query, or just say hi...", key="chat_input")
-
-if user_query:
-    # Add user message
-    st.session_state.messages.append({'role': 'user', 'content': user_query})
-    with st.chat_message('user'):
-        st.write(user_query)
-
-    # Generate response
-    with st.chat_message('assistant'):
-        streamlit_callback = StreamlitCallbackHandler(st.container())
+# 📋 Query Results (paginated, loaded one page at a time)
+EXPORT_DIR = Path(__file__).parent / '.sqlbot_cache' / 'exports'
+
+def render_results(sql, key, shown):
+    """Query, result page and exports. `shown` (kept on the message) holds the page on display,
+    so reruns redraw it from memory (expanders run even when collapsed); only turning the page queries"""
+    with st.expander("📋 Query results", expanded=False):
+        st.code(sql, language='sql')
+        page = st.number_input("Page", min_value=1, value=1, step=1, key=f"page_{key}") - 1
+        if shown.get('page') != page:
+            try:
+                columns, rows, truncated = bot.result_page(sql, page)
+            except Exception as e:
+                st.error(f"❌ Could not load results: {e}")
+                return
+            shown.update(page=page, columns=columns, rows=rows, truncated=truncated)
+        rows = shown['rows']
+        if rows:
+            st.dataframe([dict(zip(shown['columns'], r)) for r in rows], use_container_width=True)
+            more = " (more on the next page)" if shown['truncated'] == 'rows' else ""
+            st.caption(f"Rows {page * PAGE_SIZE + 1}–{page * PAGE_SIZE + len(rows)}{more}")
+        else:
+            st.caption("No rows on this page.")
         
+        export_cols = st.columns(2)
+        for col, (label, suffix, exporter) in zip(export_cols, [("CSV", "csv", export_csv), ("Parquet", "parquet", export_parquet)]):
+            if col.button(f"⬇️ Export {label}", key=f"export_{suffix}_{key}"):
+                # Message ids restart in every session, so the session id keeps exports apart
+                path = EXPORT_DIR / f"result_{st.session_state.session_id}_{key}.{suffix}"
+                count = exporter(db._engine, sql, path)
+                col.success(f"✅ {count} rows written to {path.name}")
+                with open(path, 'rb') as f:
+                    col.download_button(f"💾 Download {label}", f, file_name=path.name, key=f"download_{suffix}_{key}")
+
+# ──────────────────────────────────────────────────────
+# 📊 Insights (local totals / top-N and an automatic chart)
+def build_insight(sql):
+    """Summary of the query's result frame; None if the query cannot be re-run"""
+    with tracing.span('insights', 'internal'):
         try:
-            # 🔍 Smart query detection
-            sql_keywords = ['select', 'from', 'table', 'column', 'data', 'where', 'join', 'count', 'sum', 'avg', 'group by', 'order by']
-            is_sql_related = any(keyword in user_query.lower() for keyword in sql_keywords)
-            
-            with st.spinner('🤖 SQLBOT is thinking...'):
-                if is_sql_related:
-                    response = agent.run(user_query, callbacks=[streamlit_callback])
-                else:
-                    response = llm.invoke(user_query)
+            return bot.result_summary(sql)
+        except Exception:
+            return None
+
+def render_insight(summary):
+    from insights import chart_spec, format_value
+    chart, series = summary['chart'], summary['series']
+    if chart == 'metric':
+        cols = st.columns(min(len(summary['measures']), 4))
+        for col, (name, stats) in zip(cols, summary['measures'].items()):
+            col.metric(str(name), format_value(stats['total']))
+    elif chart is not None:
+        st.vega_lite_chart(series, chart_spec(summary), use_container_width=True)
+
+# ──────────────────────────────────────────────────────
+# 🩺 Query plan review (scans, temp B-trees, index suggestions)
+def review_plan(sql, catalog=None):
+    """Plan report for a generated query; on uploaded copies, optionally apply the suggested indexes"""
+    with tracing.span('plan_analysis', 'db'):
+        try:
+            report = analyze_plan(db._engine, sql, catalog)
+        except Exception:
+            return None
+    if report['suggestions'] and auto_index and private_db_path is not None:
+        with tracing.span('create_indexes', 'db'):
+            report.update(index_and_time(db._engine, private_db_path, sql, report['suggestions']))
+    return report
+
+def plan_summary(report):
+    if report.get('applied'):
+        return (f"🩺 Added {len(report['applied'])} index(es) to your copy: "
+                f"{report['before_ms']:.1f} ms before → {report['after_ms']:.1f} ms after")
+    return None
+
+def render_plan(report, key):
+    if not report['issues']:
+        return
+    with st.expander(f"🩺 Query plan ({len(report['issues'])} issue(s))", expanded=False):
+        st.code('\n'.join(report['plan']), language=None)
+        for issue in report['issues']:
+            st.markdown(f"- **{issue['kind']}**{' on `' + issue['table'] + '`' if issue['table'] else ''}: `{issue['detail']}`")
+        if report['suggestions'] and not report.get('applied'):
+            st.caption("Suggested indexes" + (" (enable auto-indexing for uploaded files to apply):" if db_uri == UPLOAD_DB else ":"))
+            st.code(';\n'.join(report['suggestions']), language='sql')
+
+# ──────────────────────────────────────────────────────
+# 💬 Chat Interface
+GREETING_MESSAGE = '👋 Hello! I\'m SQLBOT, your AI database assistant. Ask me anything about your database - I can help you write queries, analyze data, or just chat!'
+
+# Bounded history: recent turns verbatim, older ones rolled into a summary
+if 'conversation' not in st.session_state:
+    st.session_state.conversation = Conversation(GREETING_MESSAGE)
+    st.session_state.history_window = RENDER_WINDOW
+if 'traces' not in st.session_state:
+    st.session_state.traces = []
+
+# A fragment: sending a message or using a widget in the history reruns only the chat,
+# not the stylesheet, sidebar and connection setup above it
+@st.fragment
+def render_chat():
+    conversation = st.session_state.conversation
+
+    # Display chat history (only the latest window is drawn on each rerun)
+    history_start = time.perf_counter()
+    if conversation.summary:
+        with st.expander(f"🗂️ Earlier conversation ({conversation.rolled} messages summarized)", expanded=False):
+            st.markdown('\n'.join(f"- {line}" for line in conversation.summary))
+    if conversation.window(st.session_state.history_window)[1] and st.button("⬆️ Show earlier messages", key="show_earlier"):
+        st.session_state.history_window += RENDER_WINDOW
+    shown, hidden = conversation.window(st.session_state.history_window)
+    if hidden:
+        st.caption(f"{hidden} earlier message(s) hidden")
+    for msg in shown:
+        with st.chat_message(msg['role']):
+            st.write(msg['content'])
+            if msg.get('insight'):
+                render_insight(msg['insight'])
+            if msg.get('sql') and msg.get('db_id') == bot.db_id:
+                render_results(msg['sql'], msg['id'], msg.setdefault('results', {}))
+                if msg.get('plan'):
+                    render_plan(msg['plan'], msg['id'])
+            if 'timings' in msg:
+                st.caption(f"⏱️ first token {msg['timings']['ttft']:.2f}s • total {msg['timings']['total']:.2f}s")
+
+    history_render_ms = (time.perf_counter() - history_start) * 1000
+    # ⌨️ Chat Input
+    user_query = st.chat_input("💭 Ask about your data, request a query, or just say hi...", key="chat_input")
+
+    if user_query:
+        # A new question supersedes anything this session still has running from an abandoned rerun
+        async_runner.cancel_session(st.session_state.session_id)
+    
+        # Add user message; a follow-up is rewritten to carry the previous question and SQL
+        resolved = conversation.resolve(user_query)
+        conversation.append({'role': 'user', 'content': user_query, 'resolved': resolved})
+        with st.chat_message('user'):
+            st.write(user_query)
+
+        # Generate response
+        with st.chat_message('assistant'):
+            callback_container = st.container()
+            trace = Trace('chat_message', question=user_query[:200], history_render_ms=round(history_render_ms, 2))
+
+            try:
+                with trace.activate():
+                    # 🔍 Route locally: small talk, a data question for the agent, or plain chat
+                    route, schema = bot.route(user_query, follow_up=bool(resolved))
+                    trace.root.attrs['route'] = route.intent
                 
-                # Clean response text
-                clean_text = str(response) if isinstance(response, str) else response.content
+                    meta = {}
+                    if route.intent == 'greeting':
+                        chunks = iter([greeting_reply(user_query)])
+                    else:
+                        # LangChain callbacks load with the first real question, not with the page
+                        from langchain_community.callbacks.streamlit import StreamlitCallbackHandler
+                        from streaming import TraceCallbackHandler
+                        tracer = TraceCallbackHandler(trace)
+                        if route.intent == 'sql':
+                            mode = {FAST_MODE: FAST, SPECULATIVE_MODE: SPECULATIVE}.get(st.session_state.sql_mode, AGENT)
+                            chunks = bot.answer_sql(resolved or user_query, meta, schema, mode, [StreamlitCallbackHandler(callback_container)],
+                                                    [tracer], st.session_state.session_id)
+                        else:
+                            chunks = bot.chat(conversation.chat_prompt(user_query), [tracer], st.session_state.session_id)
                 
+                    # Render tokens as they arrive instead of waiting for the full response
+                    timings = {}
+                    clean_text = st.write_stream(timed_stream(chunks, timings))
+                    # Numbers come from the result frame, not from the LLM's narration
+                    insight = meta.get('summary') or (build_insight(meta['sql']) if meta.get('sql') else None)
+                    if insight:
+                        with tracing.span('render_chart', 'render'):
+                            render_insight(insight)
+                    plan = review_plan(meta['sql'], schema[1] if schema else None) if meta.get('sql') else None
+                    if plan and plan_summary(plan):
+                        st.markdown(f"_{plan_summary(plan)}_")
+                        clean_text = f"{clean_text}\n\n_{plan_summary(plan)}_"
+                    results = {}
+                    if meta.get('sql'):
+                        with tracing.span('render_results', 'render'):
+                            render_results(meta['sql'], conversation.next_id, results)
+                            if plan:
+                                render_plan(plan, conversation.next_id)
+                    # Queries the guardrails rejected, stopped or capped while answering
+                    guard_notes = guard_notices(trace)
+                    if guard_notes:
+                        st.warning('\n\n'.join(guard_notes))
+                        clean_text = f"{clean_text}\n\n" + '\n\n'.join(f"_{note}_" for note in guard_notes)
+                    st.caption(f"⏱️ first token {timings['ttft']:.2f}s • total {timings['total']:.2f}s")
+            
                 # Add assistant response to history
-                st.session_state.messages.append({'role': 'assistant', 'content': clean_text})
-                st.write(clean_text)
+                conversation.append({
+                    'role': 'assistant', 'content': clean_text, 'timings': timings,
+                    'sql': meta.get('sql'), 'db_id': bot.db_id, 'plan': plan, 'insight': insight,
+                    'results': results
+                })
 
-        except Exception as e:
-            error_msg = f"❌ Oops! Something went wrong: {str(e)}"
-            st.error(error_msg)
-            st.session_state.messages.append({'role': 'assistant', 'content': error_msg})
+            except CancelledError:
+                trace.root.error = 'cancelled'
+                st.warning("⏹️ Query stopped.")
+                conversation.append({'role': 'assistant', 'content': "⏹️ Query stopped."})
+            except StatementTimeout as e:
+                trace.root.error = str(e)
+                timeout_msg = f"⏱️ The {e}. Try a narrower question, e.g. with a filter or a smaller time range."
+                st.warning(timeout_msg)
+                conversation.append({'role': 'assistant', 'content': timeout_msg})
+            except Exception as e:
+                trace.root.error = str(e)
+                error_msg = f"❌ Oops! Something went wrong: {str(e)}"
+                st.error(error_msg)
+                conversation.append({'role': 'assistant', 'content': error_msg})
+            finally:
+                trace.finish()
+                st.session_state.traces = (st.session_state.traces + [trace])[-20:]
+                export_jsonl([trace], TRACE_DIR / 'traces.jsonl')
+
+render_chat()
 
 # ──────────────────────────────────────────────────────
-# 🧹 Cleanup on app termination
-import atexit
-atexit.register(cleanup_temp_files)
+# ⚡ Query Cache Stats and ⏱️ Performance (span tree of the latest message)
+# A fragment of its own: answers rerun only the chat, so these refresh on a full rerun or on demand
+@st.fragment
+def render_metrics():
+    st.markdown("### ⚡ Query Cache")
+    st.button("🔄 Refresh stats", key="refresh_metrics", use_container_width=True)
+    rates = query_cache.hit_rates()
+    st.caption(
+        f"Answers: {rates['answer']:.0%} hit rate "
+        f"({query_cache.stats['answer_hits']}/{query_cache.stats['answer_hits'] + query_cache.stats['answer_misses']}) • "
+        f"Results: {rates['result']:.0%} hit rate "
+        f"({query_cache.stats['result_hits']}/{query_cache.stats['result_hits'] + query_cache.stats['result_misses']})"
+    )
+    st.caption(
+        f"🔧 SQL auto-repair: {repair_stats['retries_avoided']} LLM retries avoided "
+        f"({repair_stats['checked']} checked, {repair_stats['failed']} not repairable)"
+    )
+    st.caption(
+        f"🛡️ Guardrails: {guard_stats['timeouts']} queries timed out, {guard_stats['rejected']} rejected, "
+        f"{guard_stats['row_capped'] + guard_stats['byte_capped']} results capped ({guard_stats['statements']} checked)"
+    )
+    with st.expander("⏱️ Performance", expanded=False):
+        if not st.session_state.traces:
+            st.caption("Ask a question to see where the time goes.")
+        else:
+            last_trace = st.session_state.traces[-1]
+            st.caption(" • ".join(
+                f"{kind}: {v['count']}× {v['ms']:.0f} ms" for kind, v in last_trace.summary().items()
+            ))
+            lines = []
+            for depth, s in last_trace.tree():
+                details = ", ".join(f"{k}={v}" for k, v in s.attrs.items() if k not in ('statement', 'input', 'question'))
+                label = s.attrs.get('statement', s.name)[:60] if s.kind == 'sql' else s.name
+                lines.append(f"{'  ' * depth}{label} [{s.kind}] {s.duration_ms:.1f} ms {details}".rstrip())
+            st.code("\n".join(lines), language=None)
+            if st.button("📤 Export traces (OpenTelemetry JSON)", use_container_width=True):
+                path = export_otlp(st.session_state.traces, TRACE_DIR / f"otlp_{st.session_state.session_id}.json")
+                st.success(f"✅ Wrote {len(st.session_state.traces)} traces to {path}")
+
+with st.sidebar:
+    render_metrics()
 
 # ──────────────────────────────────────────────────────
@@ -0,0 +1,107 @@
+import asyncio
+import contextvars
+import os
+import threading
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+DB_WORKERS = int(os.environ.get('SQLBOT_DB_WORKERS', '8'))
+MAX_LLM_CONCURRENCY = int(os.environ.get('SQLBOT_MAX_LLM_CONCURRENCY', '4'))
+
+
+class AsyncRunner:
+    """Process-wide event loop that runs agent and LLM calls off the Streamlit script threads.
+
+    - LLM work runs as coroutines (`ainvoke` / `astream`), so one session waiting
+      on Groq does not hold a thread.
+    - Blocking database calls made by the SQL tools go through the loop's default
+      executor, a bounded thread pool of `db_workers`.
+    - At most `max_llm_concurrency` LLM calls are in flight; the rest queue.
+      The limit applies to single generations of models wrapped with `limit`,
+      not to whole jobs, so an agent running SQL between turns holds no slot.
+    - Jobs are tracked per session so a session can cancel its own work.
+    """
+
+    def __init__(self, db_workers=DB_WORKERS, max_llm_concurrency=MAX_LLM_CONCURRENCY):
+        self.loop = asyncio.new_event_loop()
+        self.loop.set_default_executor(ThreadPoolExecutor(db_workers, thread_name_prefix='sqlbot-db'))
+        self.max_llm_concurrency = max_llm_concurrency
+        self._llm_slots = asyncio.Semaphore(max_llm_concurrency)
+        self._sessions = defaultdict(set)
+        self._lock = threading.Lock()
+        self.running = 0
+        self.waiting = 0
+        self.completed = 0
+        self.cancelled = 0
+        self._thread = threading.Thread(target=self.loop.run_forever, name='sqlbot-async', daemon=True)
+        self._thread.start()
+
+    def limit(self, llm):
+        """The chat model with each async generation taking an LLM slot (see LimitedChatModel)"""
+        from limited_llm import LimitedChatModel
+        if isinstance(llm, LimitedChatModel):
+            return llm
+        return LimitedChatModel(model=llm, runner=self)
+
+    @asynccontextmanager
+    async def llm_slot(self):
+        """Hold one of the `max_llm_concurrency` slots (on the runner's loop) for one LLM call"""
+        self.waiting += 1
+        try:
+            await self._llm_slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.running += 1
+        try:
+            yield
+        finally:
+            self.running -= 1
+            self._llm_slots.release()
+
+    def submit(self, coro_factory, session_id=None):
+        """Schedule `coro_factory()` on the loop; return a concurrent Future"""
+        # Carry the caller's context (e.g. the active trace) into the task on the loop thread
+        caller_context = contextvars.copy_context()
+
+        async def with_context():
+            for var, value in caller_context.items():
+                var.set(value)
+            return await coro_factory()
+
+        future = asyncio.run_coroutine_threadsafe(with_context(), self.loop)
+        if session_id is not None:
+            with self._lock:
+                self._sessions[session_id].add(future)
+        future.add_done_callback(lambda f: self._finished(session_id, f))
+        return future
+
+    def run(self, coro_factory, session_id=None, timeout=None):
+        """Blocking helper: submit and wait for the result"""
+        return self.submit(coro_factory, session_id).result(timeout)
+
+    def cancel_session(self, session_id):
+        """Cancel every queued or running job of one session; return how many were cancelled"""
+        with self._lock:
+            futures = list(self._sessions.get(session_id, ()))
+        return sum(f.cancel() for f in futures)
+
+    def stats(self):
+        return {
+            'running': self.running,
+            'waiting': self.waiting,
+            'completed': self.completed,
+            'cancelled': self.cancelled,
+            'max_llm_concurrency': self.max_llm_concurrency,
+        }
+
+    def _finished(self, session_id, future):
+        with self._lock:
+            if future.cancelled():
+                self.cancelled += 1
+            else:
+                self.completed += 1
+            if session_id is not None:
+                self._sessions[session_id].discard(future)
+                if not self._sessions[session_id]:
+                    del self._sessions[session_id]
@@ -0,0 +1,153 @@
+"""Answer a JSONL file of questions headlessly with the app's pipeline (routing, caches, fast SQL, agent).
+
+Each input line is a JSON object whose `--field` (default "question") holds the
+question; an "id" or "request_id" is carried over to the output. Questions run
+on `--workers` threads sharing one SQLBot, so the resource cache, the
+persistent answer cache and the LLM concurrency limit are shared like the
+app's sessions share them. One JSON line per answered question (answer, SQL,
+route, timings or error) is written as soon as it is done, in completion
+order; a summary with the throughput in questions per minute goes to stderr.
+Queries run under the guardrails (guardrails.py): read-only SELECTs only,
+statement timeout, row and byte caps; what they stopped is reported per answer.
+
+    GROQ_API_KEY=... python batch.py questions.jsonl [--out answers.jsonl] [--workers 4] [--mode fast]
+    python batch.py questions.jsonl --mysql-host db:3306 --mysql-user bot --mysql-db shop  # SQLBOT_MYSQL_PASSWORD
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from async_runner import AsyncRunner
+from guardrails import guard_notices, guard_stats
+from pipeline import AGENT, FAST, LOCAL_DB_KEY, LOCAL_DB_PATH, MODEL_NAME, SPECULATIVE, SQLBot, mysql_database, sqlite_database
+from query_cache import QueryCache
+from resource_cache import ResourceCache, connection_key
+from tracing import Trace, instrument_engine, timed_stream
+
+
+def load_items(path, field='question'):
+    """(line number, id, question) for every non-empty line of a JSONL file"""
+    items = []
+    with open(path, encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if not record.get(field):
+                raise ValueError(f"{path}:{number}: no {field!r} field")
+            items.append((number, record.get('id', record.get('request_id')), record[field]))
+    return items
+
+
+def connect(args, resources):
+    """SQLBot for the database selected on the command line"""
+    if args.mysql_host:
+        conn_key = connection_key('USE_MYSQL', args.mysql_host, args.mysql_user, args.mysql_password, args.mysql_db)
+        build = lambda: mysql_database(args.mysql_host, args.mysql_user, args.mysql_password, args.mysql_db)
+    else:
+        path = os.path.abspath(args.sqlite)
+        # The bundled database gets the app's key, so batch runs and the app share its cached answers
+        local = os.path.realpath(path) == os.path.realpath(LOCAL_DB_PATH)
+        conn_key = LOCAL_DB_KEY if local else connection_key('USE_SQLITE', db_name=path)
+        build = lambda: sqlite_database(path)
+    db = resources.get_or_create(conn_key, build)
+    instrument_engine(db._engine)
+    runner = AsyncRunner(max_llm_concurrency=args.workers)
+    return SQLBot(db, conn_key, args.api_key, resources, QueryCache(), runner, model_name=args.model)
+
+
+def answer_one(bot, item, mode):
+    """Output record for one question; failures are recorded, not raised"""
+    number, item_id, question = item
+    meta, timings = {}, {}
+    record = {'line': number, 'id': item_id, 'question': question}
+    # Traced so that queries the guardrails stopped or capped are reported with the answer
+    trace = Trace('batch_question', question=question[:200])
+    try:
+        with trace.activate():
+            chunks = bot.answer(question, meta, mode, session_id=f'batch-{number}')
+            record['answer'] = ''.join(timed_stream(chunks, timings))
+    except Exception as e:
+        record['error'] = str(e)
+    record.update(
+        route=meta.get('route'), sql=meta.get('sql'), cached=meta.get('cached', False),
+        guardrails=guard_notices(trace),
+        ttft_ms=round(timings['ttft'] * 1000, 1) if 'ttft' in timings else None,
+        total_ms=round(timings['total'] * 1000, 1) if 'total' in timings else None,
+    )
+    return record
+
+
+def run(bot, items, out, workers=4, mode=FAST):
+    """Answer `items` on `workers` threads, writing each record to `out` when done; return the summary"""
+    lock = threading.Lock()
+    latencies, routes, errors = [], {}, 0
+
+    def work(item):
+        nonlocal errors
+        record = answer_one(bot, item, mode)
+        with lock:
+            out.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+            out.flush()
+            routes[record['route']] = routes.get(record['route'], 0) + 1
+            if 'error' in record:
+                errors += 1
+            elif record['total_ms'] is not None:
+                latencies.append(record['total_ms'])
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(workers, thread_name_prefix='sqlbot-batch') as pool:
+        list(pool.map(work, items))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        'questions': len(items),
+        'errors': errors,
+        'routes': routes,
+        'workers': workers,
+        'mode': mode,
+        'elapsed_s': round(elapsed, 2),
+        'questions_per_minute': round(len(items) / elapsed * 60, 1) if elapsed else None,
+        'latency_ms_p50': round(statistics.median(latencies), 1) if latencies else None,
+        'latency_ms_p95': latencies[int(0.95 * (len(latencies) - 1))] if latencies else None,
+        'answer_cache': bot.answers.stats,
+        'guardrails': guard_stats,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('questions', help='JSONL file, one question per line')
+    parser.add_argument('--field', default='question', help='field holding the question')
+    parser.add_argument('--out', default='-', help='JSONL output file (default: stdout)')
+    parser.add_argument('--workers', type=int, default=4, help='questions answered in parallel')
+    parser.add_argument('--mode', choices=[FAST, SPECULATIVE, AGENT], default=FAST, help='query engine for data questions')
+    parser.add_argument('--sqlite', default=str(LOCAL_DB_PATH), help='SQLite file to query (default: Chinook.db)')
+    parser.add_argument('--mysql-host', help='MySQL "host[:port]"; queries MySQL instead of --sqlite')
+    parser.add_argument('--mysql-user')
+    parser.add_argument('--mysql-db')
+    parser.add_argument('--mysql-password', default=os.environ.get('SQLBOT_MYSQL_PASSWORD'))
+    parser.add_argument('--api-key', default=os.environ.get('GROQ_API_KEY'), help='Groq API key (default: $GROQ_API_KEY)')
+    parser.add_argument('--model', default=MODEL_NAME)
+    args = parser.parse_args()
+    if not args.api_key:
+        parser.error('a Groq API key is required (--api-key or GROQ_API_KEY)')
+
+    items = load_items(args.questions, args.field)
+    bot = connect(args, ResourceCache(max_entries=12, ttl=3600))
+    out = sys.stdout if args.out == '-' else open(args.out, 'w', encoding='utf-8')
+    try:
+        summary = run(bot, items, out, args.workers, args.mode)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(json.dumps(summary, indent=2), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
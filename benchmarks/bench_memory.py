@@ -0,0 +1,108 @@
+"""Session memory and rerun render time of a long chat, unbounded history vs. `Conversation`.
+
+Builds a chat of `--messages` messages from the Chinook question corpus, each
+assistant message carrying what app.py stores (answer, SQL, result summary with
+its chart frame, first result page, plan report, timings). Reports the memory the session holds
+(tracemalloc) and the time of one Streamlit rerun of app.py with that history
+(AppTest, median of `--reruns`), for:
+
+- unbounded: every message kept and drawn, as before
+- bounded: last turns verbatim, older ones summarized, latest window drawn
+
+    python benchmarks/bench_memory.py [--messages 600] [--reruns 3]
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+import warnings
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import create_engine
+
+from conversation import RENDER_WINDOW, VERBATIM_TURNS, Conversation
+from fake_llm import load_questions
+from insights import describe, load_summary
+from plan_analyzer import analyze_plan
+from results import fetch_page
+
+ROOT = Path(__file__).resolve().parent.parent
+UNBOUNDED = 10 ** 9
+
+
+def build(conversation, count, engine, questions):
+    """Append `count` user/assistant messages to the conversation, computing every payload afresh"""
+    for i in range(count // 2):
+        item = questions[i % len(questions)]
+        summary = load_summary(engine, item['sql'])
+        columns, rows, truncated = fetch_page(engine, item['sql'], 0)
+        conversation.append({'role': 'user', 'content': item['question'], 'resolved': None})
+        conversation.append({
+            'role': 'assistant', 'content': describe(summary), 'sql': item['sql'], 'db_id': None,
+            'plan': analyze_plan(engine, item['sql']), 'insight': summary,
+            'timings': {'ttft': 0.2, 'total': 0.4},
+            'results': {'page': 0, 'columns': columns, 'rows': rows, 'truncated': truncated},
+        })
+    return conversation
+
+
+def session_memory(count, engine, questions, verbatim_turns):
+    """(conversation, KiB held once the chat is built)"""
+    tracemalloc.start()
+    conversation = build(Conversation('Hello', verbatim_turns=verbatim_turns), count, engine, questions)
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return conversation, held / 1024
+
+
+def rerun_ms(conversation, window, reruns):
+    """Median wall time of one rerun of app.py with this conversation in session state"""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(str(ROOT / 'app.py'), default_timeout=120)
+    at.session_state['conversation'] = conversation
+    at.session_state['history_window'] = window
+    at.run()
+    for ti in at.text_input:
+        if ti.label == 'Groq API Key':
+            ti.set_value('gsk_benchmark')
+    timings = []
+    for _ in range(reruns + 1):
+        start = time.perf_counter()
+        at.run()
+        timings.append((time.perf_counter() - start) * 1000)
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+    # The first run builds the cached engine / agent; it is not a rerun
+    return statistics.median(timings[1:]), len(at.chat_message)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=600, help='messages in the simulated chat')
+    parser.add_argument('--reruns', type=int, default=3, help='timed reruns per configuration')
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore')
+
+    engine = create_engine(f"sqlite:///{ROOT / 'Chinook.db'}")
+    questions = load_questions()
+    results = {}
+    for name, turns, window in [('unbounded', UNBOUNDED, UNBOUNDED), ('bounded', VERBATIM_TURNS, RENDER_WINDOW)]:
+        conversation, kib = session_memory(args.messages, engine, questions, turns)
+        ms, drawn = rerun_ms(conversation, window, args.reruns)
+        results[name] = {
+            'messages': len(conversation), 'kept': len(conversation.messages), 'summary_lines': len(conversation.summary),
+            'drawn': drawn, 'session_kib': round(kib, 1), 'rerun_ms_p50': round(ms, 1),
+        }
+    print(json.dumps(results, indent=2))
+    before, after = results['unbounded'], results['bounded']
+    print(f"session memory {before['session_kib']:.0f} -> {after['session_kib']:.0f} KiB, "
+          f"rerun {before['rerun_ms_p50']:.0f} -> {after['rerun_ms_p50']:.0f} ms at {args.messages} messages")
+
+
+if __name__ == '__main__':
+    main()
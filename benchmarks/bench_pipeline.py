@@ -0,0 +1,219 @@
+"""Offline benchmark of the text-to-SQL pipeline on the Chinook question corpus.
+
+Answers every question with `SQLBot.answer`, the pipeline app.py and batch.py
+run (read-only SQLite engine, routing, catalog, fast SQL / agent with its
+fallback, guardrails), driven by a scripted fake LLM and a fresh answer cache,
+and reports per-stage costs. An answer counts as correct when the result
+summary the app renders for it (row count, totals, top-N) matches the one of
+the reference query. The JSON summary can be saved as a baseline and
+compared against in review:
+
+    python benchmarks/bench_pipeline.py --save benchmarks/baseline.json
+    python benchmarks/bench_pipeline.py --compare benchmarks/baseline.json
+
+`--mode fast` runs the single-shot SQL path instead of the ReAct agent (its
+baseline is benchmarks/baseline_fast.json); `--mode both` prints the two side by side.
+"""
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from async_runner import AsyncRunner
+from fake_llm import chinook_model, load_questions
+from insights import describe, load_summary
+from pipeline import LOCAL_DB_KEY, SQLBot, sqlite_database
+from query_cache import QueryCache
+from resource_cache import ResourceCache
+from tracing import Trace, instrument_engine, token_usage
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Metrics that must match the baseline exactly (deterministic with the fake LLM)
+EXACT_METRICS = ['questions', 'accuracy', 'llm_calls', 'agent_iterations', 'prompt_tokens',
+                 'completion_tokens', 'rows_returned']
+# Timing metrics may drift by machine; flag only large regressions
+TIMING_METRICS = ['connect_ms', 'catalog_ms', 'agent_build_ms', 'sql_ms_p50', 'e2e_ms_p50', 'e2e_ms_p95']
+TIMING_TOLERANCE = 2.0
+
+
+class StageRecorder(BaseCallbackHandler):
+    """Counts LLM calls/tokens and agent tool calls, and times SQL tool calls for one question"""
+
+    # Called on the runner's loop, like the app's tracer
+    run_inline = True
+
+    def __init__(self):
+        self.llm_calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.tool_calls = 0
+        self.sql_seconds = 0.0
+        self.llm_seconds = 0.0
+        self._tool_start = None
+        self._llm_start = None
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self._llm_start = time.perf_counter()
+
+    def on_llm_end(self, response, **kwargs):
+        if self._llm_start is not None:
+            self.llm_seconds += time.perf_counter() - self._llm_start
+            self._llm_start = None
+        self.llm_calls += 1
+        prompt, completion = token_usage(response)
+        self.prompt_tokens += prompt
+        self.completion_tokens += completion
+
+    def on_tool_start(self, serialized, input_str, **kwargs):
+        self.tool_calls += 1
+        self._tool_start = time.perf_counter() if serialized.get('name') == 'sql_db_query' else None
+
+    def on_tool_end(self, output, **kwargs):
+        if self._tool_start is not None:
+            self.sql_seconds += time.perf_counter() - self._tool_start
+            self._tool_start = None
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def rendered_summary(engine, sql, summary=None):
+    """The result summary the app shows for an answer's SQL (the fast path hands its own over)"""
+    summary = summary or load_summary(engine, sql)
+    return summary['rows'], describe(summary)
+
+
+def connect(llm, runner, cache_path):
+    """(bot, stage timings): the pipeline over Chinook.db as batch.py builds it, answering with `llm`"""
+    stages = {}
+    path = str(ROOT / 'Chinook.db')
+    start = time.perf_counter()
+    db = sqlite_database(path)
+    instrument_engine(db._engine)
+    stages['connect_ms'] = (time.perf_counter() - start) * 1000
+    bot = SQLBot(db, LOCAL_DB_KEY, 'fake', ResourceCache(), QueryCache(cache_path),
+                 runner, model_name='fake', llm=llm)
+
+    start = time.perf_counter()
+    bot.catalog()
+    stages['catalog_ms'] = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    bot.agent()
+    stages['agent_build_ms'] = (time.perf_counter() - start) * 1000
+    return bot, stages
+
+
+def answer(bot, question, mode, recorder):
+    """(answer text, meta, trace) for one question through SQLBot.answer"""
+    meta = {}
+    trace = Trace('bench_question', question=question[:200])
+    with trace.activate():
+        text = ''.join(bot.answer(question, meta, mode, inline_callbacks=[recorder], session_id='bench'))
+    trace.finish()
+    return text, meta, trace
+
+
+def run(latency, mode='agent'):
+    runner = AsyncRunner()
+    with tempfile.TemporaryDirectory() as tmp:
+        bot, stages = connect(chinook_model(latency=latency), runner, Path(tmp) / 'answers.db')
+        per_question = []
+        for item in load_questions():
+            recorder = StageRecorder()
+            start = time.perf_counter()
+            text, meta, trace = answer(bot, item['question'], mode, recorder)
+            e2e = time.perf_counter() - start
+            rows, shown = rendered_summary(bot.engine, meta['sql'], meta.get('summary')) if meta.get('sql') else (0, None)
+            per_question.append({
+                'question': item['question'],
+                'route': meta.get('route'),
+                'sql': meta.get('sql'),
+                'answer': text,
+                'correct': shown == rendered_summary(bot.engine, item['sql'])[1],
+                'agent_iterations': recorder.tool_calls,
+                'llm_calls': recorder.llm_calls,
+                'prompt_tokens': recorder.prompt_tokens,
+                'completion_tokens': recorder.completion_tokens,
+                'sql_ms': sum(s.duration_ms for s in trace.spans if s.kind == 'sql'),
+                'rows_returned': rows,
+                'e2e_ms': e2e * 1000,
+            })
+
+    e2e = [q['e2e_ms'] for q in per_question]
+    summary = {
+        'mode': mode,
+        'questions': len(per_question),
+        'accuracy': sum(q['correct'] for q in per_question) / len(per_question),
+        'llm_calls': sum(q['llm_calls'] for q in per_question),
+        'agent_iterations': sum(q['agent_iterations'] for q in per_question),
+        'prompt_tokens': sum(q['prompt_tokens'] for q in per_question),
+        'completion_tokens': sum(q['completion_tokens'] for q in per_question),
+        'rows_returned': sum(q['rows_returned'] for q in per_question),
+        'sql_ms_p50': statistics.median(q['sql_ms'] for q in per_question),
+        'e2e_ms_p50': statistics.median(e2e),
+        'e2e_ms_p95': percentile(e2e, 95),
+        **stages,
+    }
+    return summary, per_question
+
+
+def compare(summary, baseline):
+    """Return a list of human-readable regressions against a saved baseline"""
+    problems = []
+    for key in EXACT_METRICS:
+        if key in baseline and summary[key] != baseline[key]:
+            problems.append(f'{key}: {baseline[key]} -> {summary[key]}')
+    for key in TIMING_METRICS:
+        # Stages of a few milliseconds are mostly noise; compare with a 5 ms floor
+        if key in baseline and summary[key] > max(baseline[key], 5.0) * TIMING_TOLERANCE:
+            problems.append(f'{key}: {baseline[key]:.1f} ms -> {summary[key]:.1f} ms')
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--latency', type=float, default=0.0, help='fake LLM seconds per call')
+    parser.add_argument('--mode', choices=['agent', 'fast', 'both'], default='agent',
+                        help='answer with the ReAct agent, the single-shot SQL path, or compare both')
+    parser.add_argument('--save', help='write the JSON summary here')
+    parser.add_argument('--compare', help='baseline JSON to compare against; exits 1 on regression')
+    parser.add_argument('--verbose', action='store_true', help='print per-question results')
+    args = parser.parse_args()
+
+    if args.mode == 'both':
+        agent_summary, _ = run(args.latency, 'agent')
+        fast_summary, _ = run(args.latency, 'fast')
+        print(f"{'metric':<20}{'agent':>12}{'fast':>12}")
+        for key in EXACT_METRICS + TIMING_METRICS:
+            cells = [f'{v:>12}' if isinstance(v, int) else f'{v:>12.2f}' for v in (agent_summary[key], fast_summary[key])]
+            print(f'{key:<20}' + ''.join(cells))
+        return
+
+    summary, per_question = run(args.latency, args.mode)
+    if args.verbose:
+        for q in per_question:
+            print(json.dumps(q))
+    print(json.dumps(summary, indent=2))
+
+    if args.save:
+        Path(args.save).write_text(json.dumps(summary, indent=2) + '\n')
+    if args.compare:
+        problems = compare(summary, json.loads(Path(args.compare).read_text()))
+        for p in problems:
+            print(f'REGRESSION {p}')
+        sys.exit(1 if problems else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Exercise the shared connection pool with concurrent sessions against a SQLite stand-in.
+
+    python benchmarks/bench_pool.py [--sessions 20] [--queries 50] [--pool-size 3] [--overflow 2]
+"""
+import argparse
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import text
+
+from engines import shared_engine, pool_metrics
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=20)
+    parser.add_argument('--queries', type=int, default=50)
+    parser.add_argument('--pool-size', type=int, default=3)
+    parser.add_argument('--overflow', type=int, default=2)
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp())
+    db_path = workdir / 'Chinook.db'
+    shutil.copy(ROOT / 'Chinook.db', db_path)
+    url = f'sqlite:///{db_path}'
+    settings = dict(pool_size=args.pool_size, max_overflow=args.overflow, pool_recycle=60)
+
+    engines = []
+    peak = {'checked_out': 0}
+
+    def session():
+        # Each simulated session looks the engine up the way a Streamlit rerun would
+        engine = shared_engine(url, **settings)
+        engines.append(engine)
+        for _ in range(args.queries):
+            with engine.connect() as conn:
+                conn.execute(text(
+                    "SELECT c.Country, sum(i.Total) FROM Invoice i JOIN Customer c USING (CustomerId) "
+                    "GROUP BY c.Country"
+                )).fetchall()
+                peak['checked_out'] = max(peak['checked_out'], pool_metrics(engine)['checked_out'])
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=session) for _ in range(args.sessions)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    metrics = pool_metrics(engines[0])
+    print(f'distinct engines:  {len({id(e) for e in engines})} (for {args.sessions} sessions)')
+    print(f'queries:           {args.sessions * args.queries} in {elapsed:.2f}s')
+    print(f'peak checked out:  {peak["checked_out"]} (limit {args.pool_size + args.overflow})')
+    print(f'checkouts:         {metrics["checkouts"]}')
+    print(f'wait avg / max:    {metrics["avg_wait_ms"]:.2f} ms / {metrics["max_wait_ms"]:.2f} ms')
+
+    engines[0].dispose()
+    shutil.rmtree(workdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""How many broken SQL statements the local repairer fixes without another LLM turn.
+
+Breaks every query of the Chinook question corpus in a few mechanical ways
+(misspelled column, pluralized / lower-cased table, unterminated string) and
+adds MySQL-flavoured queries, then runs each through `check_sql` and compares
+the repaired query's rows with the original's.
+
+    python benchmarks/bench_repair.py [--verbose]
+"""
+import argparse
+import json
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import create_engine, text
+
+from fake_llm import load_questions
+from schema_catalog import SchemaCatalog
+from sql_repair import SQLRepairer, SQLValidationError, check_sql, repair_stats
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# (broken MySQL-style query, equivalent SQLite query)
+DIALECT_CASES = [
+    ("SELECT YEAR(InvoiceDate) AS y, count(*) FROM Invoice GROUP BY y ORDER BY y",
+     "SELECT CAST(strftime('%Y', InvoiceDate) AS INTEGER) AS y, count(*) FROM Invoice GROUP BY y ORDER BY y"),
+    ("SELECT CONCAT(FirstName, ' ', LastName) FROM Employee ORDER BY EmployeeId",
+     "SELECT FirstName || ' ' || LastName FROM Employee ORDER BY EmployeeId"),
+    ("SELECT DATE_FORMAT(InvoiceDate, '%Y-%m') AS m, sum(Total) FROM Invoice GROUP BY m ORDER BY m LIMIT 5",
+     "SELECT strftime('%Y-%m', InvoiceDate) AS m, sum(Total) FROM Invoice GROUP BY m ORDER BY m LIMIT 5"),
+    ("SELECT Name, IF(Milliseconds > 300000, 'long', 'short') FROM Track ORDER BY TrackId LIMIT 5",
+     "SELECT Name, CASE WHEN Milliseconds > 300000 THEN 'long' ELSE 'short' END FROM Track ORDER BY TrackId LIMIT 5"),
+]
+
+
+def word_sub(sql, old, new):
+    return re.sub(rf'\b{re.escape(old)}\b', new, sql, count=1)
+
+
+def mutations(sql, catalog):
+    """(kind, broken sql) variants of a working query"""
+    out = []
+    columns = sorted({c for info in catalog.tables.values() for c, _ in info['columns']}, key=len, reverse=True)
+    column = next((c for c in columns if len(c) > 4 and re.search(rf'\b{c}\b', sql)), None)
+    if column:
+        out.append(('misspelled column', word_sub(sql, column, column[:-2] + column[-1] + column[-2])))
+    table = next((t for t in sorted(catalog.tables, key=len, reverse=True) if re.search(rf'\bFROM {t}\b', sql)), None)
+    if table and not table.endswith('s'):
+        out.append(('pluralized table', word_sub(sql, table, table.lower() + 's')))
+    if "'" in sql:
+        out.append(('unterminated string', sql[:sql.rindex("'")] + sql[sql.rindex("'") + 1:]))
+    return out
+
+
+def rows(engine, sql):
+    with engine.connect() as conn:
+        return sorted(repr(tuple(r)) for r in conn.execute(text(sql)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--verbose', action='store_true', help='print every case')
+    args = parser.parse_args()
+
+    engine = create_engine(f"sqlite:///{ROOT / 'Chinook.db'}")
+    catalog = SchemaCatalog.build(engine)
+    repairer = SQLRepairer.from_catalog(catalog, engine.dialect.name)
+    cases = [(kind, broken, item['sql']) for item in load_questions() for kind, broken in mutations(item['sql'], catalog)]
+    cases += [('dialect function', broken, fixed) for broken, fixed in DIALECT_CASES]
+
+    by_kind, timings = {}, []
+    for kind, broken, original in cases:
+        start = time.perf_counter()
+        try:
+            repaired, fixes = check_sql(engine, broken, repairer)
+            correct = rows(engine, repaired) == rows(engine, original)
+        except SQLValidationError:
+            repaired, fixes, correct = None, [], False
+        timings.append((time.perf_counter() - start) * 1000)
+        entry = by_kind.setdefault(kind, {'cases': 0, 'repaired': 0})
+        entry['cases'] += 1
+        entry['repaired'] += correct
+        if args.verbose:
+            print(f"{'OK ' if correct else 'BAD'} {kind}: {broken}\n    -> {repaired} {fixes}")
+
+    print(json.dumps({
+        'cases': len(cases),
+        'repaired_correctly': sum(e['repaired'] for e in by_kind.values()),
+        'by_kind': by_kind,
+        'llm_retries_avoided': repair_stats['retries_avoided'],
+        'repair_ms_p50': round(statistics.median(timings), 2),
+        'repair_ms_max': round(max(timings), 2),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
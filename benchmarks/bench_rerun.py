@@ -0,0 +1,158 @@
+"""Per-rerun server time and bytes sent by app.py for typical interactions.
+
+With a `--messages` chat in session state (built as in bench_memory.py) and an
+API key set, times each interaction (the script run itself and AppTest's wall
+time, median of `--reruns`) and sums the ForwardMsgs the server would send for it:
+
+- full: a full rerun, as after changing a connection setting
+- chat: a greeting typed into the chat box (answered locally, no LLM call)
+- history: a click on a widget in the chat history ("⬆️ Show earlier messages")
+
+When the app draws the chat in an `st.fragment`, the chat and history
+interactions rerun only that fragment, as the browser would request. To
+compare with an older app.py, put a copy next to it and pass `--app`:
+
+    git show HEAD~1:app.py > app_before.py
+    python benchmarks/bench_rerun.py --app app_before.py [--messages 40] [--reruns 5]
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+import warnings
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import create_engine
+from streamlit.runtime.scriptrunner import ScriptRunnerEvent
+from streamlit.runtime.scriptrunner_utils.script_requests import RerunData, ScriptRequests
+from streamlit.testing.v1 import AppTest, app_test
+from streamlit.testing.v1.element_tree import parse_tree_from_messages
+from streamlit.testing.v1.local_script_runner import LocalScriptRunner, require_widgets_deltas
+
+from bench_memory import build
+from conversation import RENDER_WINDOW, Conversation
+from fake_llm import load_questions
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Shared with the runner AppTest creates for each run
+_scope = {'fragment': None, 'bytes': 0, 'messages': 0, 'script_ms': 0.0, 'started': 0.0, 'last_full': []}
+FINISHED = {
+    ScriptRunnerEvent.SCRIPT_STOPPED_WITH_SUCCESS, ScriptRunnerEvent.FRAGMENT_STOPPED_WITH_SUCCESS,
+    ScriptRunnerEvent.SCRIPT_STOPPED_WITH_COMPILE_ERROR,
+}
+
+
+class MeasuredScriptRunner(LocalScriptRunner):
+    """LocalScriptRunner that counts the bytes it sends and can rerun a single fragment"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.on_event.connect(self._count, weak=False)
+
+    def _count(self, sender, event, **kwargs):
+        if event == ScriptRunnerEvent.SCRIPT_STARTED:
+            _scope['started'] = time.perf_counter()
+        elif event in FINISHED:
+            _scope['script_ms'] = (time.perf_counter() - _scope['started']) * 1000
+        elif event == ScriptRunnerEvent.ENQUEUE_FORWARD_MSG:
+            _scope['bytes'] += kwargs['forward_msg'].ByteSize()
+            _scope['messages'] += 1
+
+    def run(self, widget_state=None, query_params=None, timeout=3, page_hash=''):
+        if _scope['fragment'] is None:
+            tree = super().run(widget_state, query_params, timeout, page_hash)
+            _scope['last_full'] = list(self.forward_msgs())
+            return tree
+        # Replace the full rerun queued at construction with the fragment-scoped one
+        self._requests = ScriptRequests()
+        self.request_rerun(RerunData(
+            widget_states=widget_state, page_script_hash=page_hash,
+            fragment_id_queue=[_scope['fragment']], is_fragment_scoped_rerun=True,
+        ))
+        try:
+            if not self._script_thread:
+                self.start()
+            require_widgets_deltas(self, timeout)
+        finally:
+            self.join()
+        # The browser keeps everything outside the fragment; so does the element tree
+        kept = [m for m in _scope['last_full'] if not (m.HasField('delta') and m.delta.fragment_id == _scope['fragment'])]
+        return parse_tree_from_messages(kept + self.forward_msgs())
+
+
+def chat_fragment():
+    """Fragment id of the chat input in the last full run, or None if the app has no chat fragment"""
+    for msg in _scope['last_full']:
+        if msg.HasField('delta') and msg.delta.new_element.WhichOneof('type') == 'chat_input':
+            return msg.delta.fragment_id or None
+    return None
+
+
+def measure(at, interact, reruns, fragment=None):
+    """Median script time, wall time (with AppTest's own overhead), bytes and messages sent per interaction"""
+    timings, script, sent = [], [], []
+    for _ in range(reruns):
+        interact(at)
+        _scope.update(fragment=fragment, bytes=0, messages=0)
+        start = time.perf_counter()
+        at.run()
+        timings.append((time.perf_counter() - start) * 1000)
+        script.append(_scope['script_ms'])
+        sent.append((_scope['bytes'], _scope['messages']))
+        _scope['fragment'] = None
+        if at.exception:
+            raise RuntimeError(at.exception[0].value)
+    return {
+        'script_ms_p50': round(statistics.median(script), 1),
+        'wall_ms_p50': round(statistics.median(timings), 1),
+        'bytes': int(statistics.median(b for b, _ in sent)),
+        'messages': int(statistics.median(m for _, m in sent)),
+        'scope': 'fragment' if fragment else 'full',
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--app', default=str(ROOT / 'app.py'), help='app script to measure')
+    parser.add_argument('--messages', type=int, default=40, help='messages in the chat history')
+    parser.add_argument('--reruns', type=int, default=5, help='timed reruns per interaction')
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore')
+    app_test.LocalScriptRunner = MeasuredScriptRunner
+
+    engine = create_engine(f"sqlite:///{ROOT / 'Chinook.db'}")
+    at = AppTest.from_file(args.app, default_timeout=120)
+    at.session_state['conversation'] = build(Conversation('Hello'), args.messages, engine, load_questions())
+    at.session_state['history_window'] = RENDER_WINDOW
+    at.run()
+    for ti in at.text_input:
+        if ti.label == 'Groq API Key':
+            ti.set_value('gsk_benchmark')
+    # Builds the cached engine / agent, which is not what a rerun costs
+    at.run()
+    fragment = chat_fragment()
+
+    def nothing(at):
+        pass
+
+    def greet(at):
+        at.chat_input[0].set_value('hello')
+
+    def show_earlier(at):
+        at.session_state['history_window'] = RENDER_WINDOW
+        at.button(key='show_earlier').click()
+
+    results = {
+        'full': measure(at, nothing, args.reruns),
+        'chat': measure(at, greet, args.reruns, fragment),
+        'history': measure(at, show_earlier, args.reruns, fragment),
+    }
+    print(json.dumps({'app': Path(args.app).name, 'messages': args.messages, 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Routing accuracy of the intent router vs. the old keyword check on a labeled question set.
+
+Each message in `benchmarks/intents.jsonl` is labeled greeting / chat / sql.
+Reports accuracy, the confusion matrix, agent runs avoided (non-data messages
+the keyword check sent to the agent) and data questions that lost DB access.
+
+    python benchmarks/bench_router.py [--verbose]
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import create_engine
+
+from schema_catalog import SchemaCatalog
+
+ROOT = Path(__file__).resolve().parent.parent
+INTENTS_PATH = Path(__file__).resolve().parent / 'intents.jsonl'
+LEGACY_KEYWORDS = ['select', 'from', 'table', 'column', 'data', 'where', 'join', 'count', 'sum', 'avg',
+                   'group by', 'order by']
+
+
+def legacy_route(question):
+    """The substring check the chat handler used before the router"""
+    return 'sql' if any(k in question.lower() for k in LEGACY_KEYWORDS) else 'chat'
+
+
+def evaluate(labeled, route):
+    confusion = Counter()
+    for item in labeled:
+        confusion[item['intent'], route(item['question'])] += 1
+    correct = sum(n for (label, got), n in confusion.items() if label == got)
+    return {
+        'accuracy': correct / len(labeled),
+        'agent_runs': sum(n for (_, got), n in confusion.items() if got == 'sql'),
+        'wasted_agent_runs': sum(n for (label, got), n in confusion.items() if got == 'sql' and label != 'sql'),
+        'missed_db_questions': sum(n for (label, got), n in confusion.items() if label == 'sql' and got != 'sql'),
+        'llm_calls_for_greetings': sum(n for (label, got), n in confusion.items() if label == 'greeting' and got != 'greeting'),
+        'confusion': {f'{label}->{got}': n for (label, got), n in sorted(confusion.items())},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--verbose', action='store_true', help='print every misrouted message')
+    args = parser.parse_args()
+
+    with open(INTENTS_PATH, encoding='utf-8') as f:
+        labeled = [json.loads(line) for line in f if line.strip()]
+    catalog = SchemaCatalog.build(create_engine(f"sqlite:///{ROOT / 'Chinook.db'}"))
+    start = time.perf_counter()
+    router = catalog.router()
+    build_ms = (time.perf_counter() - start) * 1000
+
+    timings = []
+    for item in labeled:
+        start = time.perf_counter()
+        router.route(item['question'])
+        timings.append((time.perf_counter() - start) * 1e6)
+
+    legacy = evaluate(labeled, legacy_route)
+    routed = evaluate(labeled, lambda q: router.route(q).intent)
+    print(json.dumps({
+        'questions': len(labeled),
+        'router_build_ms': round(build_ms, 2),
+        'route_us_p50': round(statistics.median(timings), 1),
+        'keyword_check': legacy,
+        'intent_router': routed,
+        'agent_runs_avoided': legacy['wasted_agent_runs'] - routed['wasted_agent_runs'],
+        'llm_calls_avoided': legacy['llm_calls_for_greetings'] - routed['llm_calls_for_greetings'],
+    }, indent=2))
+    if args.verbose:
+        for item in labeled:
+            route = router.route(item['question'])
+            if route.intent != item['intent']:
+                print(f"MISROUTED {item['intent']} -> {route.intent} ({route.reason}): {item['question']}")
+
+
+if __name__ == '__main__':
+    main()
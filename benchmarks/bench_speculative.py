@@ -0,0 +1,146 @@
+"""Speculative candidate SQL against the sequential agent (and the fast path) on ambiguous questions.
+
+Half of the Chinook question corpus is made ambiguous for the fake LLM: the
+model hands out a wrong reply for it first, either SQL that fails (the agent
+then retries, paying another round trip) or SQL that runs but answers a
+different reading of the question (the agent answers with it). The
+speculative path asks for `--candidates` queries at once, runs the valid ones
+in parallel and answers with the result most of them agree on. Every mode
+gets a fresh model with the same script, so the wrong replies come in the
+same order.
+
+Every question goes through `SQLBot.answer`, as in bench_pipeline.py, so the
+speculative mode falls back to the agent the way the app does. For each mode
+it reports accuracy (the rendered result summary equals the reference
+query's), LLM calls, prompt / completion tokens (estimated) and end-to-end
+latency with `--latency` seconds per LLM call standing in for network time:
+
+    python benchmarks/bench_speculative.py [--latency 0.3] [--candidates 3] [--verbose]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from async_runner import AsyncRunner
+from bench_pipeline import StageRecorder, answer, connect, percentile, rendered_summary
+from fake_llm import chinook_model, load_questions
+
+# question -> replies in the order the fake model hands them out; the reference query is in questions.jsonl
+AMBIGUOUS = {
+    # Fails: an invented table, then the intended query
+    "How many tracks are in the database?": [
+        "SELECT count(*) FROM Song",
+        "SELECT count(*) FROM Track",
+    ],
+    # Runs, but counts invoices instead of summing their totals
+    "Which 5 billing countries have the highest invoice totals?": [
+        "SELECT BillingCountry, count(*) AS total FROM Invoice GROUP BY BillingCountry ORDER BY total DESC LIMIT 5",
+        "SELECT BillingCountry, round(sum(Total), 2) AS total FROM Invoice GROUP BY BillingCountry ORDER BY total DESC LIMIT 5",
+        "SELECT BillingCountry, round(sum(Total), 2) AS total FROM Invoice GROUP BY 1 ORDER BY 2 DESC LIMIT 5",
+    ],
+    # Right first; one later reading filters on the wrong column
+    "List the customers from Canada": [
+        "SELECT FirstName, LastName FROM Customer WHERE Country = 'Canada'",
+        "SELECT FirstName, LastName FROM Customer WHERE State = 'Canada'",
+    ],
+    # Fails: invented column and join
+    "Total sales per support employee": [
+        "SELECT e.FullName, sum(i.Total) AS sales FROM Employee e JOIN Invoice i ON i.EmployeeId = e.EmployeeId "
+        "GROUP BY e.EmployeeId",
+        "SELECT e.FirstName, e.LastName, round(sum(i.Total), 2) AS sales FROM Employee e "
+        "JOIN Customer c ON c.SupportRepId = e.EmployeeId JOIN Invoice i ON i.CustomerId = c.CustomerId "
+        "GROUP BY e.EmployeeId ORDER BY sales DESC",
+    ],
+    # Runs, but in seconds
+    "What is the average track length in minutes?": [
+        "SELECT round(avg(Milliseconds) / 1000.0, 2) AS minutes FROM Track",
+        "SELECT round(avg(Milliseconds) / 60000.0, 2) AS minutes FROM Track",
+    ],
+    # Runs, but counts every customer
+    "How many customers work for a company?": [
+        "SELECT count(*) FROM Customer",
+        "SELECT count(*) FROM Customer WHERE Company IS NOT NULL",
+        "SELECT count(Company) FROM Customer",
+    ],
+}
+
+
+def run(mode, latency, candidates):
+    runner = AsyncRunner(max_llm_concurrency=max(4, candidates))
+    per_question = []
+    with tempfile.TemporaryDirectory() as tmp:
+        bot, _ = connect(chinook_model(latency=latency, variants=AMBIGUOUS), runner, Path(tmp) / 'answers.db')
+        for item in load_questions():
+            recorder = StageRecorder()
+            start = time.perf_counter()
+            _, meta, trace = answer(bot, item['question'], mode, recorder)
+            e2e = time.perf_counter() - start
+            shown = rendered_summary(bot.engine, meta['sql'], meta.get('summary'))[1] if meta.get('sql') else None
+            extra = {}
+            race = next((s for s in trace.spans if s.name == 'speculative_sql'), None)
+            if race is not None:
+                # No usable candidate: the pipeline let the agent answer
+                extra = ({'fallback': True} if 'fallback' in race.attrs else
+                         {k: race.attrs[k] for k in ('valid', 'votes', 'early')})
+            per_question.append({
+                'question': item['question'],
+                'ambiguous': item['question'] in AMBIGUOUS,
+                'sql': meta.get('sql'),
+                'correct': shown == rendered_summary(bot.engine, item['sql'])[1],
+                'llm_calls': recorder.llm_calls,
+                'prompt_tokens': recorder.prompt_tokens,
+                'completion_tokens': recorder.completion_tokens,
+                'e2e_ms': e2e * 1000,
+                **extra,
+            })
+
+    e2e = [q['e2e_ms'] for q in per_question]
+    ambiguous = [q for q in per_question if q['ambiguous']]
+    summary = {
+        'mode': mode,
+        'questions': len(per_question),
+        'accuracy': round(sum(q['correct'] for q in per_question) / len(per_question), 3),
+        'accuracy_ambiguous': round(sum(q['correct'] for q in ambiguous) / len(ambiguous), 3),
+        'llm_calls': sum(q['llm_calls'] for q in per_question),
+        'prompt_tokens': sum(q['prompt_tokens'] for q in per_question),
+        'completion_tokens': sum(q['completion_tokens'] for q in per_question),
+        'e2e_ms_p50': round(statistics.median(e2e), 1),
+        'e2e_ms_p95': round(percentile(e2e, 95), 1),
+        'e2e_ms_ambiguous_p50': round(statistics.median(q['e2e_ms'] for q in ambiguous), 1),
+    }
+    if mode == 'speculative':
+        summary['early_stops'] = sum(q.get('early', False) for q in per_question)
+        summary['fallbacks'] = sum(q.get('fallback', False) for q in per_question)
+    return summary, per_question
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--latency', type=float, default=0.3, help='fake LLM seconds per call')
+    parser.add_argument('--candidates', type=int, default=3, help='SQL candidates per question (speculative)')
+    parser.add_argument('--verbose', action='store_true', help='print per-question results')
+    args = parser.parse_args()
+    # Read when the pipeline first imports speculative_sql
+    os.environ['SQLBOT_SQL_CANDIDATES'] = str(args.candidates)
+
+    summaries = {}
+    for mode in ['agent', 'fast', 'speculative']:
+        summaries[mode], per_question = run(mode, args.latency, args.candidates)
+        if args.verbose:
+            for q in per_question:
+                print(json.dumps({'mode': mode, **q}))
+    keys = [k for k in summaries['speculative'] if k != 'mode']
+    print(f"{'metric':<24}" + ''.join(f'{mode:>14}' for mode in summaries))
+    for key in keys:
+        print(f'{key:<24}' + ''.join(f"{s.get(key, ''):>14}" for s in summaries.values()))
+
+
+if __name__ == '__main__':
+    main()
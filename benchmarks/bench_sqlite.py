@@ -0,0 +1,103 @@
+"""Default vs. tuned read-only SQLite engine on Chinook.db and on a scaled-up synthetic copy.
+
+The default profile is what app.py used before: `create_engine('sqlite:///...')`
+with SQLite's default pragmas. The tuned profile is `engines.sqlite_engine`
+(read-only URI, mmap, large page cache, query_only; `immutable` for uploads).
+Set SQLBOT_SQLITE_TEMP_STORE=MEMORY to compare in-memory temp B-trees. Each profile runs the Chinook question corpus from `--sessions`
+concurrent threads and reports the first pass on fresh connections, warm
+per-query latency and throughput.
+
+The large file is the scale-test fixture from `scale_data.py` at `--scale`
+(Customer, Track, Invoice and InvoiceLine multiplied); it is built once and reused.
+
+    python benchmarks/bench_sqlite.py [--scale 1000] [--sessions 4] [--rounds 5]
+"""
+import argparse
+import json
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import create_engine, text
+
+from engines import sqlite_engine
+from fake_llm import load_questions
+from scale_data import scaled_database
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Heavier than the corpus queries on a large file: full aggregations over the fact tables
+SCAN_QUERIES = [
+    "SELECT strftime('%Y', i.InvoiceDate) AS y, sum(il.UnitPrice * il.Quantity) FROM InvoiceLine il "
+    "JOIN Invoice i ON i.InvoiceId = il.InvoiceId GROUP BY y",
+    "SELECT t.GenreId, count(*) FROM InvoiceLine il JOIN Track t ON t.TrackId = il.TrackId GROUP BY t.GenreId",
+    "SELECT BillingCountry, avg(Total) FROM Invoice GROUP BY BillingCountry ORDER BY 2 DESC LIMIT 5",
+]
+
+
+def run_profile(engine, queries, sessions, rounds):
+    """First pass on fresh connections, then `rounds` warm passes; latencies in ms"""
+    first, warm = [], []
+    lock = threading.Lock()
+
+    def session():
+        for round_no in range(rounds + 1):
+            for sql in queries:
+                start = time.perf_counter()
+                with engine.connect() as conn:
+                    conn.execute(text(sql)).fetchall()
+                elapsed = (time.perf_counter() - start) * 1000
+                with lock:
+                    (first if round_no == 0 else warm).append(elapsed)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=session) for _ in range(sessions)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    warm.sort()
+    return {
+        'first_pass_ms': round(sum(first) / sessions, 1),
+        'warm_ms_p50': round(statistics.median(warm), 2),
+        'warm_ms_p95': round(warm[int(0.95 * (len(warm) - 1))], 2),
+        'queries_per_s': round(len(first + warm) / elapsed, 1),
+    }
+
+
+def bench(path, queries, sessions, rounds, immutable):
+    engines = {
+        'default': create_engine(f'sqlite:///{path}'),
+        'tuned': sqlite_engine(path, immutable=immutable),
+    }
+    results = {}
+    for name, engine in engines.items():
+        results[name] = run_profile(engine, queries, sessions, rounds)
+        engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', type=int, default=1000, help='scale factor of the large fixture (0 skips it)')
+    parser.add_argument('--sessions', type=int, default=4, help='concurrent sessions (threads)')
+    parser.add_argument('--rounds', type=int, default=5, help='warm passes over the queries per session')
+    args = parser.parse_args()
+
+    corpus = [q['sql'] for q in load_questions()]
+    report = {'chinook': bench(ROOT / 'Chinook.db', corpus + SCAN_QUERIES, args.sessions, args.rounds, False)}
+    if args.scale:
+        path = scaled_database(args.scale)
+        # Uploads are the immutable case, which is how a large file reaches the app
+        report[f'x{args.scale}_{path.stat().st_size // 2 ** 20}mb'] = bench(
+            path, SCAN_QUERIES, args.sessions, args.rounds, True)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
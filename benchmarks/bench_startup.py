@@ -0,0 +1,153 @@
+"""Cold start of app.py: per-module import time and time to first render.
+
+Each repeat starts a fresh interpreter under `python -X importtime` and runs
+app.py through Streamlit's AppTest, as a new server process would:
+
+- no_key: the first page a visitor sees (sidebar, API key prompt)
+- connect: the rerun after entering an API key, connecting to Chinook.db
+- greeting: a greeting typed into the chat (answered locally) once the
+  background warmup has finished, as it usually has by the time a user types
+
+For every run it reports the time from script start to the first element sent
+to the browser, the total script time, the slowest top-level imports the run
+triggered (cumulative ms, from the `-X importtime` log) and whether the heavy
+optional dependencies (MySQL driver, Groq client, LangChain agents, pandas) were
+loaded. Imports made by the app's background warmup thread count towards the
+run during which they happen. Streamlit's own import is reported separately;
+the app cannot avoid it.
+To compare with an older tree, check it out elsewhere and pass its app.py:
+
+    git worktree add /tmp/before HEAD~1
+    python benchmarks/bench_startup.py [--app /tmp/before/app.py] [--repeat 3] [--top 8]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+MARKER = 'bench_startup:'
+WATCHED = ['mysql.connector', 'langchain_groq', 'langchain.agents', 'langchain_core.callbacks', 'pandas', 'sqlalchemy']
+
+
+def child(app):
+    """Runs inside the measured interpreter: one JSON line per run on stdout, markers on stderr"""
+    import warnings
+    warnings.filterwarnings('ignore')
+    start = time.perf_counter()
+    from streamlit.runtime.scriptrunner import ScriptRunnerEvent
+    from streamlit.testing.v1 import AppTest, app_test
+    from streamlit.testing.v1.local_script_runner import LocalScriptRunner
+    streamlit_ms = (time.perf_counter() - start) * 1000
+    timing = {}
+
+    class TimedScriptRunner(LocalScriptRunner):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.on_event.connect(self._time, weak=False)
+
+        def _time(self, sender, event, **kwargs):
+            now = time.perf_counter()
+            if event == ScriptRunnerEvent.SCRIPT_STARTED:
+                timing.clear()
+                timing['started'] = now
+            elif event == ScriptRunnerEvent.ENQUEUE_FORWARD_MSG and 'first' not in timing:
+                if kwargs['forward_msg'].HasField('delta'):
+                    timing['first'] = now
+            elif event == ScriptRunnerEvent.SCRIPT_STOPPED_WITH_SUCCESS:
+                timing['stopped'] = now
+
+    app_test.LocalScriptRunner = TimedScriptRunner
+    at = AppTest.from_file(app, default_timeout=120)
+
+    def set_key(at):
+        for ti in at.text_input:
+            if ti.label == 'Groq API Key':
+                ti.set_value('gsk_benchmark')
+
+    def greet(at):
+        deadline = time.perf_counter() + 60
+        while time.perf_counter() < deadline and any(t.name == 'sqlbot-warmup' for t in threading.enumerate()):
+            time.sleep(0.05)
+        at.chat_input[0].set_value('hello')
+
+    for name, interact in [('no_key', None), ('connect', set_key), ('greeting', greet)]:
+        if interact is not None:
+            interact(at)
+        print(f'{MARKER}{name}', file=sys.stderr, flush=True)
+        at.run()
+        if at.exception:
+            raise RuntimeError(at.exception[0].value)
+        print(json.dumps({
+            'run': name,
+            'streamlit_import_ms': streamlit_ms,
+            'first_element_ms': (timing['first'] - timing['started']) * 1000,
+            'script_ms': (timing['stopped'] - timing['started']) * 1000,
+            'loaded': [m for m in WATCHED if m in sys.modules],
+        }), flush=True)
+
+
+def import_costs(log):
+    """Cumulative ms of the top-level imports in each run's slice of a -X importtime log"""
+    runs, current = {}, None
+    for line in log.splitlines():
+        if line.startswith(MARKER):
+            current = runs.setdefault(line[len(MARKER):], {})
+        elif current is not None and line.startswith('import time:') and '|' in line:
+            _, cumulative, name = line.split('|', 2)
+            # Nested imports are indented under the module that triggered them
+            if not name[1:].startswith(' ') and cumulative.strip().isdigit():
+                current[name.strip()] = current.get(name.strip(), 0) + int(cumulative) / 1000
+    return runs
+
+
+def measure(app, repeat):
+    """Median timings per run over `repeat` fresh interpreters, imports from the median-time one"""
+    samples = []
+    for _ in range(repeat):
+        proc = subprocess.run(
+            [sys.executable, '-X', 'importtime', __file__, '--child', '--app', app],
+            capture_output=True, text=True, cwd=Path(app).parent, env={**os.environ, 'PYTHONWARNINGS': 'ignore'},
+        )
+        if proc.returncode:
+            raise RuntimeError(proc.stderr[-2000:])
+        samples.append(([json.loads(line) for line in proc.stdout.splitlines() if line.startswith('{')],
+                        import_costs(proc.stderr)))
+    samples.sort(key=lambda s: sum(r['script_ms'] for r in s[0]))
+    runs, imports = samples[len(samples) // 2]
+    return [{
+        **run,
+        'streamlit_import_ms': round(statistics.median(s[0][0]['streamlit_import_ms'] for s in samples), 1),
+        'first_element_ms': round(statistics.median(s[0][i]['first_element_ms'] for s in samples), 1),
+        'script_ms': round(statistics.median(s[0][i]['script_ms'] for s in samples), 1),
+        'imports_ms': round(sum(imports.get(run['run'], {}).values()), 1),
+        'slowest_imports': imports.get(run['run'], {}),
+    } for i, run in enumerate(runs)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--app', default=str(ROOT / 'app.py'), help='app script to measure (absolute path)')
+    parser.add_argument('--repeat', type=int, default=3, help='fresh interpreters to start')
+    parser.add_argument('--top', type=int, default=8, help='slowest imports to list per run')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    app = str(Path(args.app).resolve())
+    if args.child:
+        child(app)
+        return
+
+    runs = measure(app, args.repeat)
+    for run in runs:
+        top = sorted(run['slowest_imports'].items(), key=lambda kv: kv[1], reverse=True)[:args.top]
+        run['slowest_imports'] = {name: round(ms, 1) for name, ms in top}
+    print(json.dumps({'app': app, 'repeat': args.repeat, 'runs': runs}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Benchmark the lexical table index on a synthetic 1,000-table schema.
+
+    python benchmarks/bench_table_index.py [--tables 1000] [--queries 500]
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from table_index import TableIndex
+
+DOMAINS = ['sales', 'billing', 'inventory', 'shipping', 'hr', 'payroll', 'marketing', 'support',
+           'finance', 'catalog', 'warehouse', 'crm', 'audit', 'procurement', 'analytics', 'legal']
+ENTITIES = ['customer', 'invoice', 'order', 'product', 'employee', 'vendor', 'shipment', 'ticket',
+            'campaign', 'account', 'payment', 'contract', 'region', 'store', 'supplier', 'refund',
+            'discount', 'budget', 'asset', 'lead', 'subscription', 'review', 'category', 'event']
+ATTRIBUTES = ['name', 'status', 'amount', 'created_at', 'updated_at', 'country', 'city', 'email',
+              'quantity', 'price', 'total', 'currency', 'notes', 'priority', 'score', 'due_date']
+
+
+def synthetic_schema(n_tables, seed=7):
+    """Catalog-shaped dict of n_tables tables with columns and FKs to earlier tables"""
+    rng = random.Random(seed)
+    tables = {}
+    names = []
+    while len(names) < n_tables:
+        name = f'{rng.choice(DOMAINS)}_{rng.choice(ENTITIES)}_{len(names)}'
+        cols = [(f'{name}_id', 'int')] + [(a, 'text') for a in rng.sample(ATTRIBUTES, 6)]
+        fks = []
+        for ref in rng.sample(names, min(len(names), rng.randint(0, 3))):
+            cols.append((f'{ref}_id', 'int'))
+            fks.append((f'{ref}_id', ref, f'{ref}_id'))
+        tables[name] = {'columns': cols, 'pk': [f'{name}_id'], 'fks': fks, 'rows': 0, 'samples': {}}
+        names.append(name)
+    return tables
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tables', type=int, default=1000)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--k', type=int, default=5)
+    args = parser.parse_args()
+
+    tables = synthetic_schema(args.tables)
+    start = time.perf_counter()
+    index = TableIndex(tables)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    rng = random.Random(11)
+    targets = rng.choices(list(tables), k=args.queries)
+    latencies, recalled, selected_sizes = [], 0, []
+    for target in targets:
+        domain, entity, _ = target.split('_', 2)
+        attr = rng.choice([c for c, _ in tables[target]['columns'] if not c.endswith('_id')])
+        question = f'what is the total {attr} of {entity}s in {domain}'
+        start = time.perf_counter()
+        selected = index.select(question, k=args.k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        recalled += target in selected
+        selected_sizes.append(len(selected))
+
+    latencies.sort()
+    print(f'tables:          {args.tables}')
+    print(f'index build:     {build_ms:.1f} ms')
+    print(f'query p50:       {statistics.median(latencies):.3f} ms')
+    print(f'query p95:       {latencies[int(len(latencies) * 0.95) - 1]:.3f} ms')
+    print(f'recall@select:   {recalled / len(targets):.1%}')
+    print(f'tables selected: {statistics.mean(selected_sizes):.1f} avg (of {args.tables})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""Deterministic chat models for running the SQLBOT pipeline offline (no Groq key, no network)."""
+import asyncio
+import json
+import threading
+import time
+from pathlib import Path
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+QUESTIONS_PATH = Path(__file__).resolve().parent / 'questions.jsonl'
+_attempts_lock = threading.Lock()
+
+
+def load_questions(path=QUESTIONS_PATH):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token), good enough for relative comparisons"""
+    return max(1, len(text) // 4)
+
+
+class ScriptedSQLChatModel(BaseChatModel):
+    """Plays the ReAct SQL agent's part from a question -> SQL script.
+
+    On the first turn for a scripted question it calls sql_db_query with the
+    scripted SQL; once an observation is in the prompt it returns a final
+    answer quoting it (or a one-line caption when the prompt asks for one).
+    Single-shot prompts (asking for a ```sql block) get the scripted SQL in a
+    code block. Prompts without a ReAct question get a canned chat reply. Each call sleeps `latency` seconds to stand in for network time.
+
+    `variants` makes questions ambiguous: question -> SQL replies handed out in
+    turn (cycling) for every SQL the model writes for it, and the agent writes
+    the next one after an error observation instead of giving up.
+    """
+
+    script: dict = {}
+    variants: dict = {}
+    attempts: dict = {}
+    latency: float = 0.0
+    streaming: bool = False
+    calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+    @property
+    def _llm_type(self):
+        return 'scripted-sql'
+
+    def _reply(self, messages):
+        prompt = '\n'.join(str(m.content) for m in messages)
+        self.calls += 1
+        self.prompt_tokens += estimate_tokens(prompt)
+        if 'Question:' not in prompt:
+            reply = "Hello! I'm SQLBOT. Ask me anything about your database."
+        else:
+            tail = prompt.rsplit('Question:', 1)[1]
+            question = next((q for q in self.script if q.lower() in tail.lower()), None)
+            observation = tail.rsplit('Observation:', 1)[1].split('\nThought:', 1)[0].strip() if 'Observation:' in tail else None
+            if question is not None and '```sql' in prompt:
+                reply = f"```sql\n{self._sql(question)}\n```"
+            elif question is None:
+                reply = "Thought: This is not about the database.\nFinal Answer: I don't know"
+            elif observation is None:
+                reply = f"Thought: The schema is provided, I can query directly.\nAction: sql_db_query\nAction Input: {self._sql(question)}"
+            elif observation.startswith('Error') and question in self.variants:
+                reply = f"Thought: That query failed, I will try another one.\nAction: sql_db_query\nAction Input: {self._sql(question)}"
+            else:
+                if 'caption' in prompt:
+                    reply = "Thought: I now know the final answer\nFinal Answer: Here is what the query returned."
+                else:
+                    reply = f"Thought: I now know the final answer\nFinal Answer: The result is {observation[:300]}"
+        self.completion_tokens += estimate_tokens(reply)
+        return reply, estimate_tokens(prompt)
+
+    def _sql(self, question):
+        """The scripted SQL for a question, or its next variant"""
+        if question not in self.variants:
+            return self.script[question]
+        with _attempts_lock:
+            attempt = self.attempts.get(question, 0)
+            self.attempts[question] = attempt + 1
+        replies = self.variants[question]
+        return replies[attempt % len(replies)]
+
+    @staticmethod
+    def _usage(reply, prompt_tokens):
+        return {'input_tokens': prompt_tokens, 'output_tokens': estimate_tokens(reply),
+                'total_tokens': prompt_tokens + estimate_tokens(reply)}
+
+    def _chunks(self, reply, prompt_tokens):
+        words = reply.split(' ')
+        for i, word in enumerate(words):
+            last = i == len(words) - 1
+            yield ChatGenerationChunk(message=AIMessageChunk(
+                content=word if last else word + ' ',
+                usage_metadata=self._usage(reply, prompt_tokens) if last else None,
+            ))
+
+    def _result(self, reply, prompt_tokens):
+        usage = self._usage(reply, prompt_tokens)
+        message = AIMessage(content=reply, usage_metadata=usage)
+        return ChatResult(
+            generations=[ChatGeneration(message=message)],
+            llm_output={'token_usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': usage['output_tokens']}},
+        )
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        return self._result(*self._reply(messages))
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        return self._result(*self._reply(messages))
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        for chunk in self._chunks(*self._reply(messages)):
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        for chunk in self._chunks(*self._reply(messages)):
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+
+def chinook_model(latency=0.0, streaming=False, variants=None):
+    """ScriptedSQLChatModel loaded with the Chinook question corpus"""
+    script = {q['question']: q['sql'] for q in load_questions()}
+    return ScriptedSQLChatModel(script=script, latency=latency, streaming=streaming, variants=variants or {})
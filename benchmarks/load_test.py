@@ -0,0 +1,111 @@
+"""Load-test the agent execution path with N concurrent simulated sessions.
+
+Runs every session against Chinook.db with a fake LLM that sleeps `--latency`
+seconds per call, on the app's pipeline (SQLBot over the read-only SQLite
+engine, shared resource cache), once with the agent's blocking `invoke` on one
+thread per session (the old script-thread model) and once with
+`SQLBot.answer` on the AsyncRunner, whose `--max-llm` slots are taken per LLM
+call, not per agent run. Threads have no LLM limit, so `--max-llm` at least
+`--sessions` compares like with like. Each session has its own answer cache,
+so its questions are answered, not served from another session's cache.
+
+    python benchmarks/load_test.py [--sessions 16] [--questions 3] [--latency 0.2]
+"""
+import argparse
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from async_runner import AsyncRunner
+from fake_llm import chinook_model, load_questions
+from pipeline import AGENT, LOCAL_DB_KEY, SQLBot, sqlite_database
+from query_cache import QueryCache
+from resource_cache import ResourceCache
+from schema_catalog import with_schema
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def build_bots(latency, runner, sessions, cache_dir):
+    """One SQLBot per session over one shared database, LLM and resource cache, like app sessions"""
+    path = str(ROOT / 'Chinook.db')
+    conn_key = LOCAL_DB_KEY
+    resources = ResourceCache()
+    db = resources.get_or_create(conn_key, lambda: sqlite_database(path))
+    llm = chinook_model(latency=latency)
+    return [SQLBot(db, conn_key, 'fake', resources, QueryCache(Path(cache_dir) / f'session-{i}.db'), runner,
+                   model_name='fake', llm=llm) for i in range(sessions)]
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def report(name, latencies, elapsed):
+    print(f'{name:<8} requests={len(latencies):<4} '
+          f'p50={statistics.median(latencies) * 1000:7.1f} ms  '
+          f'p95={percentile(latencies, 95) * 1000:7.1f} ms  '
+          f'throughput={len(latencies) / elapsed:6.2f} q/s  wall={elapsed:.2f}s')
+
+
+def run_sessions(bots, questions, ask):
+    latencies = []
+    lock = threading.Lock()
+
+    def session(i):
+        for j in range(len(questions)):
+            q = questions[(i + j) % len(questions)]
+            start = time.perf_counter()
+            ask(bots[i], q, f'session-{i}')
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(len(bots))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies, time.perf_counter() - start
+
+
+def ask_blocking(bot, question, session_id):
+    """The agent's blocking invoke on the calling thread, as the script threads used to run it"""
+    _, catalog = bot.catalog()
+    block = catalog.prompt_block(catalog.relevant_tables(question))
+    bot.agent().invoke({'input': with_schema(question, block)})
+
+
+def ask_async(bot, question, session_id):
+    ''.join(bot.answer(question, {}, AGENT, session_id=session_id))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=16)
+    parser.add_argument('--questions', type=int, default=3, help='questions per session')
+    parser.add_argument('--latency', type=float, default=0.2, help='fake LLM seconds per call')
+    parser.add_argument('--max-llm', type=int, default=8, help='AsyncRunner LLM concurrency limit')
+    parser.add_argument('--db-workers', type=int, default=4)
+    args = parser.parse_args()
+
+    questions = [q['question'] for q in load_questions()][:args.questions]
+    print(f'{args.sessions} sessions x {len(questions)} questions, fake LLM latency {args.latency}s/call')
+
+    runner = AsyncRunner(db_workers=args.db_workers, max_llm_concurrency=args.max_llm)
+    with tempfile.TemporaryDirectory() as tmp:
+        report('threads', *run_sessions(build_bots(args.latency, runner, args.sessions, Path(tmp) / 'threads'),
+                                        questions, ask_blocking))
+        report('async', *run_sessions(build_bots(args.latency, runner, args.sessions, Path(tmp) / 'async'),
+                                      questions, ask_async))
+    print(f'async runner: {runner.stats()}')
+
+
+if __name__ == '__main__':
+    main()
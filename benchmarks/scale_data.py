@@ -0,0 +1,333 @@
+"""Inflate Chinook.db to production-sized volumes for performance testing.
+
+Builds a new SQLite file with Chinook's schema and indexes in which Customer,
+Track, Invoice and InvoiceLine hold `--scale` times their rows (10, 1000 and
+100000 are the standard sizes). The reference tables (Artist, Album, Genre,
+MediaType, Employee, Playlist, PlaylistTrack) are copied as they are. Every
+synthetic row is derived from a template row of the original table, so
+foreign keys resolve, customers keep real addresses and invoice totals are
+the sum of their lines. `--wide-tables N` adds N extension tables keyed to
+Customer / Track for wide-schema reflection and table selection.
+
+Rows go in with `executemany` batches inside large transactions, with
+indexes created after the load. The .db file is the SQLite fixture;
+`--sqlite-dump` / `--mysql-dump` also write a SQL script (gzip if the name
+ends in .gz) loadable with `sqlite3 new.db < dump.sql` or `mysql db < dump.sql`.
+
+    python benchmarks/scale_data.py --scale 1000 [--wide-tables 300] [--mysql-dump chinook_x1000.sql.gz]
+"""
+import argparse
+import datetime as dt
+import gzip
+import json
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import MetaData, create_engine
+from sqlalchemy.dialects import mysql
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from bench_table_index import ATTRIBUTES, DOMAINS, ENTITIES
+
+ROOT = Path(__file__).resolve().parent.parent
+SOURCE = ROOT / 'Chinook.db'
+FIXTURE_DIR = Path(tempfile.gettempdir()) / 'sqlbot_bench'
+SCALED_TABLES = ['Customer', 'Track', 'Invoice', 'InvoiceLine']
+BATCH_ROWS = 50000
+COMMIT_ROWS = 2000000
+DUMP_ROWS = 1000
+FIRST_DATE = dt.date(2009, 1, 1)
+DATE_SPAN_DAYS = 5 * 365
+NUMERIC_ATTRIBUTES = {'amount', 'quantity', 'price', 'total', 'score'}
+DATE_ATTRIBUTES = {'created_at', 'updated_at', 'due_date'}
+
+
+def _log(message):
+    print(message, file=sys.stderr)
+
+
+def fixture_path(scale, wide_tables=0):
+    suffix = f'_w{wide_tables}' if wide_tables else ''
+    return FIXTURE_DIR / f'chinook_x{scale}{suffix}.db'
+
+
+def _templates(source, table):
+    return source.execute(f'SELECT * FROM [{table}] ORDER BY 1').fetchall()
+
+
+def _customers(templates, count, employees, rng):
+    n = len(templates)
+    for cid in range(1, count + 1):
+        row = list(templates[(cid - 1) % n])
+        copy = (cid - 1) // n
+        row[0] = cid
+        if copy:
+            # Unique e-mail per synthetic customer; name, address and rep are shuffled per copy
+            local, _, domain = row[11].partition('@')
+            row[11] = f'{local}.{copy}@{domain}'
+            row[1] = templates[rng.randrange(n)][1]
+            row[12] = rng.choice(employees)
+        yield row
+
+
+def _tracks(templates, count, rng):
+    n = len(templates)
+    for tid in range(1, count + 1):
+        row = list(templates[(tid - 1) % n])
+        copy = (tid - 1) // n
+        row[0] = tid
+        if copy:
+            row[1] = f'{row[1]} ({copy})'
+            row[6] = max(1000, int(row[6] * rng.uniform(0.5, 1.5)))
+            row[7] = int(row[7] * row[6] / templates[(tid - 1) % n][6])
+        yield row
+
+
+def _invoices(invoice_templates, lines_per_invoice, customer_templates, n_customers, track_prices, n_tracks, count,
+              rng):
+    """(invoice rows, their line rows) in batches; billing fields come from the customer's template"""
+    n = len(invoice_templates)
+    line_id = 0
+    invoices, lines = [], []
+    for iid in range(1, count + 1):
+        template = invoice_templates[(iid - 1) % n]
+        if iid <= n:
+            customer_id, date = template[1], template[2]
+        else:
+            customer_id = rng.randint(1, n_customers)
+            date = f'{FIRST_DATE + dt.timedelta(days=rng.randrange(DATE_SPAN_DAYS))} 00:00:00'
+        customer = customer_templates[(customer_id - 1) % len(customer_templates)]
+        total = 0.0
+        for _ in range(lines_per_invoice[template[0]]):
+            line_id += 1
+            track_id = rng.randint(1, n_tracks)
+            price = track_prices[(track_id - 1) % len(track_prices)]
+            lines.append((line_id, iid, track_id, price, 1))
+            total += price
+        invoices.append((iid, customer_id, date, customer[4], customer[5], customer[6], customer[7], customer[8],
+                         round(total, 2)))
+        if len(lines) >= BATCH_ROWS:
+            yield invoices, lines
+            invoices, lines = [], []
+    if invoices:
+        yield invoices, lines
+
+
+def _batches(rows, size=BATCH_ROWS):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class _Loader:
+    """executemany in BATCH_ROWS batches, committing every COMMIT_ROWS rows"""
+
+    def __init__(self, conn, log):
+        self.conn = conn
+        self.log = log
+        self.pending = 0
+        self.counts = {}
+
+    def insert(self, table, batch):
+        if not batch:
+            return
+        marks = ', '.join('?' * len(batch[0]))
+        self.conn.executemany(f'INSERT INTO [{table}] VALUES ({marks})', batch)
+        self.counts[table] = self.counts.get(table, 0) + len(batch)
+        self.pending += len(batch)
+        if self.pending >= COMMIT_ROWS:
+            self.conn.commit()
+            self.pending = 0
+            self.log(f'  {table}: {self.counts[table]:,} rows')
+
+    def close(self):
+        self.conn.commit()
+
+
+def _wide_tables(count, n_customers, n_tracks, rows, seed):
+    """(name, DDL, row generator) for `count` extension tables keyed to Customer or Track"""
+    rng = random.Random(seed)
+    for i in range(count):
+        name = f'{rng.choice(DOMAINS)}_{rng.choice(ENTITIES)}_{i}'
+        parent, parent_rows = rng.choice([('Customer', n_customers), ('Track', n_tracks)])
+        attributes = rng.sample(ATTRIBUTES, 6)
+        columns = [f'[{name}_id] INTEGER NOT NULL', f'[{parent}Id] INTEGER NOT NULL']
+        for a in attributes:
+            kind = 'NUMERIC(10,2)' if a in NUMERIC_ATTRIBUTES else 'DATETIME' if a in DATE_ATTRIBUTES else 'NVARCHAR(40)'
+            columns.append(f'[{a}] {kind}')
+        ddl = (f'CREATE TABLE [{name}] ({", ".join(columns)}, PRIMARY KEY ([{name}_id]), '
+               f'FOREIGN KEY ([{parent}Id]) REFERENCES [{parent}] ([{parent}Id]))')
+
+        def generate(rng=random.Random(seed + i), parent_rows=parent_rows, attributes=attributes):
+            for rid in range(1, rows + 1):
+                values = [rid, rng.randint(1, parent_rows)]
+                for a in attributes:
+                    if a in NUMERIC_ATTRIBUTES:
+                        values.append(round(rng.uniform(0, 1000), 2))
+                    elif a in DATE_ATTRIBUTES:
+                        values.append(f'{FIRST_DATE + dt.timedelta(days=rng.randrange(DATE_SPAN_DAYS))} 00:00:00')
+                    else:
+                        values.append(f'{a}_{rng.randrange(50)}')
+                yield values
+
+        yield name, ddl, generate()
+
+
+def generate(out, scale, wide_tables=0, wide_rows=100, seed=0, source=SOURCE, log=_log):
+    """Write the scaled database to `out`; returns {table: rows}"""
+    out = Path(out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    building = out.with_suffix('.tmp')
+    building.unlink(missing_ok=True)
+    rng = random.Random(seed)
+    src = sqlite3.connect(f'file:{source}?mode=ro', uri=True)
+    conn = sqlite3.connect(str(building))
+    conn.executescript('PRAGMA journal_mode = OFF; PRAGMA synchronous = OFF; PRAGMA cache_size = -262144;')
+
+    schema = src.execute("SELECT type, name, sql FROM sqlite_master WHERE sql IS NOT NULL").fetchall()
+    for kind, _, sql in schema:
+        if kind == 'table':
+            conn.execute(sql)
+    loader = _Loader(conn, log)
+    for (name,) in src.execute("SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY name"):
+        if name not in SCALED_TABLES:
+            for batch in _batches(src.execute(f'SELECT * FROM [{name}]')):
+                loader.insert(name, batch)
+
+    customers, tracks = _templates(src, 'Customer'), _templates(src, 'Track')
+    invoice_templates = _templates(src, 'Invoice')
+    lines_per_invoice = dict(src.execute('SELECT InvoiceId, count(*) FROM InvoiceLine GROUP BY InvoiceId'))
+    employees = [r[0] for r in src.execute('SELECT EmployeeId FROM Employee')]
+    n_customers, n_tracks = len(customers) * scale, len(tracks) * scale
+
+    for batch in _batches(_customers(customers, n_customers, employees, rng)):
+        loader.insert('Customer', batch)
+    for batch in _batches(_tracks(tracks, n_tracks, rng)):
+        loader.insert('Track', batch)
+    for invoices, lines in _invoices(invoice_templates, lines_per_invoice, customers, n_customers,
+                                     [t[8] for t in tracks], n_tracks, len(invoice_templates) * scale, rng):
+        loader.insert('Invoice', invoices)
+        loader.insert('InvoiceLine', lines)
+    for name, ddl, rows in _wide_tables(wide_tables, n_customers, n_tracks, wide_rows, seed):
+        conn.execute(ddl)
+        for batch in _batches(rows):
+            loader.insert(name, batch)
+    loader.close()
+
+    log('  creating indexes')
+    for kind, _, sql in schema:
+        if kind == 'index':
+            conn.execute(sql)
+    conn.execute('ANALYZE')
+    conn.commit()
+    conn.close()
+    src.close()
+    building.replace(out)
+    return loader.counts
+
+
+def scaled_database(scale, wide_tables=0, log=_log):
+    """Path of the cached fixture for this scale, generating it on first use"""
+    path = fixture_path(scale, wide_tables)
+    if not path.exists():
+        generate(path, scale, wide_tables=wide_tables, log=log)
+    return path
+
+
+def _open(path):
+    path = Path(path)
+    return gzip.open(path, 'wt', encoding='utf-8') if path.suffix == '.gz' else path.open('w', encoding='utf-8')
+
+
+def dump_sqlite(db_path, out):
+    """Plain SQL script of the whole database (sqlite3 `.dump` format)"""
+    conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+    with _open(out) as f:
+        for statement in conn.iterdump():
+            f.write(f'{statement}\n')
+    conn.close()
+
+
+def _mysql_literal(value):
+    if value is None:
+        return 'NULL'
+    if isinstance(value, (int, float)):
+        return repr(value)
+    escaped = str(value).replace('\\', '\\\\').replace("'", "\\'").replace('\n', '\\n')
+    return f"'{escaped}'"
+
+
+def dump_mysql(db_path, out):
+    """MySQL script: DDL compiled from the reflected schema, then multi-row INSERTs in dependency order"""
+    engine = create_engine(f'sqlite:///{db_path}')
+    metadata = MetaData()
+    metadata.reflect(bind=engine)
+    dialect = mysql.dialect()
+    quote = dialect.identifier_preparer.quote
+    conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+    with _open(out) as f:
+        f.write('SET NAMES utf8mb4;\nSET FOREIGN_KEY_CHECKS = 0;\nSET UNIQUE_CHECKS = 0;\n')
+        for table in metadata.sorted_tables:
+            f.write(f'DROP TABLE IF EXISTS {quote(table.name)};\n')
+            f.write(f'{str(CreateTable(table).compile(dialect=dialect)).strip()};\n')
+            for index in table.indexes:
+                f.write(f'{str(CreateIndex(index).compile(dialect=dialect)).strip()};\n')
+        for table in metadata.sorted_tables:
+            columns = ', '.join(quote(c.name) for c in table.columns)
+            cursor = conn.execute(f'SELECT * FROM [{table.name}]')
+            f.write('START TRANSACTION;\n')
+            while rows := cursor.fetchmany(DUMP_ROWS):
+                values = ',\n'.join(f"({', '.join(_mysql_literal(v) for v in row)})" for row in rows)
+                f.write(f'INSERT INTO {quote(table.name)} ({columns}) VALUES\n{values};\n')
+            f.write('COMMIT;\n')
+        f.write('SET UNIQUE_CHECKS = 1;\nSET FOREIGN_KEY_CHECKS = 1;\n')
+    conn.close()
+    engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', type=int, default=10, help='row multiplier for Customer, Track, Invoice, InvoiceLine')
+    parser.add_argument('--wide-tables', type=int, default=0, help='extension tables to add (wide-schema tests)')
+    parser.add_argument('--wide-rows', type=int, default=100, help='rows per extension table')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', help=f'output .db (default {FIXTURE_DIR}/chinook_x<scale>[_w<tables>].db)')
+    parser.add_argument('--force', action='store_true', help='regenerate even if the output exists')
+    parser.add_argument('--sqlite-dump', help='also write a SQLite SQL script (.sql or .sql.gz)')
+    parser.add_argument('--mysql-dump', help='also write a MySQL-loadable SQL script (.sql or .sql.gz)')
+    args = parser.parse_args()
+
+    out = Path(args.out) if args.out else fixture_path(args.scale, args.wide_tables)
+    report = {'path': str(out)}
+    if args.force or not out.exists():
+        start = time.perf_counter()
+        counts = generate(out, args.scale, args.wide_tables, args.wide_rows, args.seed)
+        elapsed = time.perf_counter() - start
+        report.update({
+            'rows': {t: counts[t] for t in SCALED_TABLES}, 'tables': len(counts),
+            'total_rows': sum(counts.values()), 'seconds': round(elapsed, 1),
+            'rows_per_s': round(sum(counts.values()) / elapsed),
+        })
+    report['size_mb'] = round(out.stat().st_size / 2 ** 20, 1)
+    for flag, dump in [('sqlite_dump', dump_sqlite), ('mysql_dump', dump_mysql)]:
+        target = getattr(args, flag)
+        if target:
+            start = time.perf_counter()
+            dump(out, target)
+            report[flag] = {'path': target, 'seconds': round(time.perf_counter() - start, 1)}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
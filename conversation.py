@@ -0,0 +1,144 @@
+import re
+from collections import deque
+
+VERBATIM_TURNS = 20
+SUMMARY_LINES = 100
+RENDER_WINDOW = 20
+CONTEXT_CHARS = 1500
+SNIPPET_CHARS = 90
+
+# Openings that only make sense relative to the previous answer ("what about Canada?", "sort them by total")
+FOLLOW_UP = re.compile(
+    r"^\s*(same|instead|what about|how about|what if|ok(ay)?,? (now|and|but)|"
+    r"sort (it|them|that|this|by)|break (it|that|this) down|split (it|that|this))\b",
+    re.IGNORECASE
+)
+# Openings that narrow the previous answer ("now only for 2013", "exclude Brazil") but also start new
+# requests ("Include a list of all albums by AC/DC"): a follow-up only when short or referring back
+NARROWING = re.compile(
+    r"^\s*(and|now|but|also|only|just|then|exclude|include|without|except|excluding|including)\b",
+    re.IGNORECASE
+)
+REFERENCE = re.compile(
+    r"\b(those|these|them|the same|previous|above|instead|again|as well|that (one|list|result|query)|"
+    r"the results?)\b",
+    re.IGNORECASE
+)
+FOLLOW_UP_MAX_WORDS = 12
+NARROWING_MAX_WORDS = 6
+_TABLE_REF = re.compile(r'\b(?:from|join)\s+[`"\[]?([A-Za-z_][\w$]*)', re.IGNORECASE)
+
+
+def sql_tables(sql):
+    """Table names a query reads (FROM / JOIN targets, CTE names included)"""
+    tables = []
+    for name in _TABLE_REF.findall(sql or ''):
+        if name.lower() != 'select' and name not in tables:
+            tables.append(name)
+    return tables
+
+
+def _snippet(text, limit=SNIPPET_CHARS):
+    line = ' '.join(str(text or '').split())
+    return line if len(line) <= limit else line[:limit - 1] + '…'
+
+
+class Conversation:
+    """Chat history for one session, bounded no matter how long the chat runs.
+
+    - The last `verbatim_turns` turns (user + assistant message pairs) are kept
+      as-is, with their result summaries and plans, for rendering.
+    - Older turns are rolled into a one-line-per-turn summary (at most
+      `summary_lines` lines) and their payloads are dropped.
+    - Resolved entities (last question, SQL and tables) survive the roll-up,
+      so follow-ups like "now only for 2013" can be rewritten into a
+      self-contained question.
+    """
+
+    def __init__(self, greeting, verbatim_turns=VERBATIM_TURNS, summary_lines=SUMMARY_LINES):
+        self.verbatim_turns = verbatim_turns
+        self.messages = []
+        self.summary = deque(maxlen=summary_lines)
+        self.rolled = 0
+        self.entities = {}
+        self._next_id = 0
+        self._last_question = None
+        self._pending_question = None
+        self.append({'role': 'assistant', 'content': greeting})
+
+    def __len__(self):
+        return self.rolled + len(self.messages)
+
+    @property
+    def next_id(self):
+        """Stable id the next appended message gets (widget keys must not shift as turns roll off)"""
+        return self._next_id
+
+    def append(self, message):
+        message.setdefault('id', self._next_id)
+        self._next_id = message['id'] + 1
+        self.messages.append(message)
+        if message['role'] == 'assistant' and message.get('sql'):
+            self.entities.update(question=self._last_question, sql=message['sql'], tables=sql_tables(message['sql']))
+        elif message['role'] == 'user':
+            self._last_question = message.get('resolved') or message['content']
+        # Keep whole turns verbatim, so roll older messages off in pairs
+        while len(self.messages) > 2 * self.verbatim_turns:
+            self._roll(self.messages.pop(0))
+
+    def _roll(self, message):
+        self.rolled += 1
+        if message['role'] == 'user':
+            self._pending_question = message['content']
+            return
+        question, self._pending_question = self._pending_question, None
+        if question is None:
+            return
+        tables = f" [SQL on {', '.join(sql_tables(message['sql']))}]" if message.get('sql') else ''
+        self.summary.append(f"Q: {_snippet(question)} → A: {_snippet(message['content'])}{tables}")
+
+    def window(self, size=RENDER_WINDOW):
+        """The last `size` verbatim messages, plus how many kept messages are hidden above them"""
+        hidden = max(0, len(self.messages) - size)
+        return self.messages[hidden:], hidden
+
+    # ── Follow-ups ──
+    def is_follow_up(self, question):
+        if not self.entities.get('sql'):
+            return False
+        words = len(question.split())
+        if FOLLOW_UP.match(question):
+            return True
+        reference = REFERENCE.search(question) is not None
+        if NARROWING.match(question):
+            return reference or words <= NARROWING_MAX_WORDS
+        return reference and words <= FOLLOW_UP_MAX_WORDS
+
+    def resolve(self, question):
+        """Self-contained rewrite of a follow-up question (None if it stands on its own).
+
+        The rewrite carries the previous question and SQL, so the SQL writer edits
+        that query, table selection sees its tables, and the cache key is unique.
+        """
+        if not self.is_follow_up(question):
+            return None
+        return (f"{question}\n(Follow-up to the previous question \"{self.entities.get('question')}\", "
+                f"answered with: {' '.join(self.entities['sql'].split())})")
+
+    # ── Context for plain chat ──
+    def context(self, max_chars=CONTEXT_CHARS, skip_last=False):
+        """Summary plus recent turns, trimmed to max_chars by dropping the oldest lines first"""
+        recent = [m for m in (self.messages[:-1] if skip_last else self.messages) if m['id']]
+        lines = list(self.summary) + [f"{m['role']}: {_snippet(m['content'], 200)}" for m in recent]
+        kept, size = [], 0
+        for line in reversed(lines):
+            size += len(line) + 1
+            if size > max_chars:
+                break
+            kept.append(line)
+        return '\n'.join(reversed(kept))
+
+    def chat_prompt(self, question):
+        """Prompt for a plain chat reply to the latest user message, with the conversation so far"""
+        context = self.context(skip_last=True)
+        return f"Conversation so far:\n{context}\n\nuser: {question}" if context else question
@@ -0,0 +1,155 @@
+import os
+import threading
+import time
+
+from pathlib import Path
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import QueuePool
+
+POOL_SETTINGS = {
+    'pool_size': int(os.environ.get('SQLBOT_POOL_SIZE', '5')),
+    'max_overflow': int(os.environ.get('SQLBOT_POOL_OVERFLOW', '10')),
+    'pool_timeout': float(os.environ.get('SQLBOT_POOL_TIMEOUT', '30')),
+    # Below MySQL's default wait_timeout so idle connections are replaced before the server drops them
+    'pool_recycle': int(os.environ.get('SQLBOT_POOL_RECYCLE', '1800')),
+    'pool_pre_ping': True,
+}
+
+# Read-optimized SQLite connections: memory-mapped I/O, a large page cache, and query_only so
+# nothing can write through the app's engine. temp_store stays on the default (file) unless
+# overridden: in-memory temp B-trees made large GROUP BY / ORDER BY sorts slower (bench_sqlite.py)
+SQLITE_PRAGMAS = {
+    'mmap_size': int(os.environ.get('SQLBOT_SQLITE_MMAP_MB', '1024')) * 1024 * 1024,
+    'cache_size': -int(os.environ.get('SQLBOT_SQLITE_CACHE_MB', '64')) * 1024,
+    'temp_store': os.environ.get('SQLBOT_SQLITE_TEMP_STORE', 'DEFAULT'),
+    'query_only': 'ON',
+}
+# Server sessions are opened read-only unless SQLBOT_READ_ONLY=0; SQLite files are always opened
+# mode=ro with query_only, so nothing the model writes can change data even if it got past the checks
+READ_ONLY = os.environ.get('SQLBOT_READ_ONLY', '1') != '0'
+READ_ONLY_SESSION = {
+    'mysql': 'SET SESSION TRANSACTION READ ONLY',
+}
+SQLITE_POOL_SETTINGS = {
+    'pool_size': int(os.environ.get('SQLBOT_SQLITE_POOL_SIZE', '4')),
+    'max_overflow': int(os.environ.get('SQLBOT_SQLITE_POOL_OVERFLOW', '4')),
+    'pool_timeout': float(os.environ.get('SQLBOT_POOL_TIMEOUT', '30')),
+}
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long callers wait to check a connection out"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._stats_lock = threading.Lock()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - start
+            with self._stats_lock:
+                self.checkouts += 1
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+
+    def recreate(self):
+        # dispose() swaps in a fresh pool; keep the running totals across it
+        new_pool = super().recreate()
+        new_pool.checkouts, new_pool.wait_total, new_pool.wait_max = self.checkouts, self.wait_total, self.wait_max
+        return new_pool
+
+
+def shared_engine(url, **overrides):
+    """One pooled, health-checked engine per DSN for the whole process.
+
+    Every Streamlit session asking for the same database gets the same engine,
+    so the number of server connections is bounded by pool_size + max_overflow.
+    """
+    key = url.render_as_string(hide_password=False) if hasattr(url, 'render_as_string') else str(url)
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            settings = {**POOL_SETTINGS, **overrides}
+            engine = create_engine(url, poolclass=TimedQueuePool, **settings)
+            if READ_ONLY and engine.dialect.name in READ_ONLY_SESSION:
+                run_on_connect(engine, [READ_ONLY_SESSION[engine.dialect.name]])
+            _engines[key] = engine
+        return engine
+
+
+def is_shared(engine):
+    """Whether the engine is one of the process-wide ones above; those live (pool and all) as long as the process"""
+    with _engines_lock:
+        return any(e is engine for e in _engines.values())
+
+
+def sqlite_readonly_url(path, immutable=False):
+    """URI opening a SQLite file read-only; `immutable` also skips locking and change detection,
+    which is only safe for files nothing else writes to (content-addressed uploads)"""
+    flags = 'mode=ro&immutable=1' if immutable else 'mode=ro'
+    return f'sqlite:///file:{Path(path).absolute()}?{flags}&uri=true'
+
+
+def run_on_connect(engine, statements):
+    """Run the statements on every new DBAPI connection of the engine"""
+    @event.listens_for(engine, 'connect')
+    def _setup(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
+    return engine
+
+
+def apply_pragmas(engine, pragmas):
+    """Run `PRAGMA name = value` on every new DBAPI connection of the engine"""
+    return run_on_connect(engine, [f'PRAGMA {name} = {value}' for name, value in pragmas.items()])
+
+
+def sqlite_engine(path, immutable=False, **overrides):
+    """One tuned, read-only engine per SQLite file for the whole process.
+
+    Sessions reading the same file share a pool of connections that keep their
+    page cache and memory map warm between questions, instead of each session
+    opening cold connections with default pragmas.
+    """
+    url = sqlite_readonly_url(path, immutable)
+    pragmas = {**SQLITE_PRAGMAS, **overrides.pop('pragmas', {})}
+    with _engines_lock:
+        engine = _engines.get(url)
+        if engine is None:
+            settings = {**SQLITE_POOL_SETTINGS, **overrides}
+            engine = create_engine(url, poolclass=TimedQueuePool, connect_args={'check_same_thread': False},
+                                   **settings)
+            _engines[url] = apply_pragmas(engine, pragmas)
+        return engine
+
+
+def pool_metrics(engine):
+    """Snapshot of pool usage for display; empty for engines without a QueuePool"""
+    pool = engine.pool
+    if not isinstance(pool, QueuePool):
+        return {}
+    metrics = {
+        'size': pool.size(),
+        'checked_out': pool.checkedout(),
+        'checked_in': pool.checkedin(),
+        'overflow': max(pool.overflow(), 0),
+    }
+    if isinstance(pool, TimedQueuePool):
+        metrics['checkouts'] = pool.checkouts
+        metrics['avg_wait_ms'] = pool.wait_total / pool.checkouts * 1000 if pool.checkouts else 0.0
+        metrics['max_wait_ms'] = pool.wait_max * 1000
+    return metrics
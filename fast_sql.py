@@ -0,0 +1,46 @@
+import re
+
+from insights import describe, summarize_result
+from results import AGENT_MAX_ROWS, fetch_page
+from sql_repair import check_sql, strip_sql
+
+FAST_SQL_PROMPT = """You translate questions about a {dialect} database into SQL.
+Schema, as Table(column type [PK] [>ReferencedTable.column], ...) followed by example values:
+{schema}
+
+Write ONE read-only {dialect} query that answers the question.
+Unless the question asks for a specific number of rows, return at most {top_k} rows.
+Reply with only the query in a ```sql code block.
+
+Question: {question}"""
+
+_CODE_FENCE = re.compile(r'```(?:sql)?\s*(.*?)```', re.IGNORECASE | re.DOTALL)
+
+
+def extract_sql(reply):
+    """The SQL statement inside a model reply (fenced block, or the bare reply)"""
+    match = _CODE_FENCE.search(reply)
+    sql = match.group(1) if match else reply
+    sql = re.sub(r'^\s*(sql|query)\s*:\s*', '', sql.strip(), flags=re.IGNORECASE)
+    return strip_sql(sql)
+
+
+def fast_answer(llm, engine, question, schema_block, top_k=AGENT_MAX_ROWS, runner=None, session_id=None,
+                callbacks=None, repairer=None):
+    """Answer with one LLM call: generate SQL from the schema block, validate (and repair) it, run it.
+
+    Raises SQLValidationError or the driver's error so callers can fall back to the agent.
+    """
+    prompt = FAST_SQL_PROMPT.format(dialect=engine.dialect.name, schema=schema_block, top_k=top_k,
+                                    question=question)
+    config = {'callbacks': list(callbacks or [])}
+    if runner is None:
+        message = llm.invoke(prompt, config)
+    else:
+        message = runner.run(lambda: llm.ainvoke(prompt, config), session_id)
+    sql, fixes = check_sql(engine, extract_sql(message.content), repairer)
+    columns, rows, truncated = fetch_page(engine, sql, 0, page_size=top_k)
+    # The answer is built from the result itself, so no second LLM call narrates it
+    summary = summarize_result(engine, sql, columns, rows, truncated)
+    return {'sql': sql, 'columns': columns, 'rows': rows, 'truncated': truncated, 'fixes': fixes,
+            'summary': summary, 'output': describe(summary)}
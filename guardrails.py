@@ -0,0 +1,122 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from sqlalchemy.exc import DBAPIError
+
+import tracing
+from sql_repair import SQLValidationError, check_read_only
+
+STATEMENT_TIMEOUT_S = float(os.environ.get('SQLBOT_STATEMENT_TIMEOUT_S', '15'))
+# Exports stream whole results to disk, so they get longer than a question's query
+EXPORT_TIMEOUT_S = float(os.environ.get('SQLBOT_EXPORT_TIMEOUT_S', '120'))
+MAX_RESULT_BYTES = int(os.environ.get('SQLBOT_MAX_RESULT_MB', '8')) * 2 ** 20
+# SQLite VM instructions between two deadline checks (well under a millisecond of work)
+PROGRESS_STEPS = 10000
+# ER_QUERY_TIMEOUT (MAX_EXECUTION_TIME exceeded) and ER_QUERY_INTERRUPTED
+MYSQL_TIMEOUT_ERRORS = {3024, 1317}
+
+guard_stats = {'statements': 0, 'rejected': 0, 'timeouts': 0, 'row_capped': 0, 'byte_capped': 0}
+_stats_lock = threading.Lock()
+
+
+class StatementTimeout(RuntimeError):
+    """A generated query stopped because it ran longer than the statement timeout"""
+
+
+def _count(key):
+    with _stats_lock:
+        guard_stats[key] += 1
+
+
+def _notice(key, note, **attrs):
+    """Count a guardrail event and record it on the current trace, where the chat picks it up"""
+    _count(key)
+    tracing.record(key, 'guard', note=note, **attrs)
+
+
+def guard_notices(trace):
+    """Notes (each once) of the queries rejected, stopped or capped while answering a traced message"""
+    if trace is None:
+        return []
+    return list(dict.fromkeys(s.attrs['note'] for s in trace.spans if s.kind == 'guard'))
+
+
+def check_statement(sql, dialect=None):
+    """The statement, cleaned up, if it may run at all: a single read-only SELECT (lexed as `dialect` would)"""
+    _count('statements')
+    try:
+        return check_read_only(sql, dialect)
+    except SQLValidationError as e:
+        _notice('rejected', f"🛡️ A statement was rejected: {e}", statement=sql[:tracing.MAX_STATEMENT_CHARS])
+        raise
+
+
+def _timed_out(error):
+    errno = getattr(error.orig, 'errno', None) or (error.orig.args[0] if error.orig.args else None)
+    return errno in MYSQL_TIMEOUT_ERRORS or 'interrupted' in str(error.orig).lower()
+
+
+@contextmanager
+def statement_timeout(conn, seconds=STATEMENT_TIMEOUT_S, cancel=None):
+    """Stop statements on this connection that run longer than `seconds`, raising StatementTimeout.
+
+    SQLite gets a progress handler that interrupts the statement (execution and
+    fetching) once the deadline has passed, or as soon as the `cancel` event is
+    set (the driver's error is raised then); MySQL gets the session's
+    MAX_EXECUTION_TIME for the duration of the block. Other dialects run unbounded.
+    """
+    dialect = conn.dialect.name
+    if not seconds or dialect not in ('sqlite', 'mysql'):
+        yield
+        return
+    if dialect == 'sqlite':
+        raw = conn.connection.driver_connection
+        deadline = time.monotonic() + seconds
+        raw.set_progress_handler(
+            lambda: time.monotonic() > deadline or (cancel is not None and cancel.is_set()), PROGRESS_STEPS
+        )
+    else:
+        conn.exec_driver_sql(f'SET SESSION MAX_EXECUTION_TIME = {int(seconds * 1000)}')
+    try:
+        yield
+    except DBAPIError as e:
+        if not _timed_out(e) or (cancel is not None and cancel.is_set()):
+            raise
+        _notice('timeouts', f"⏱️ A query was stopped after {seconds:g} s (statement timeout)")
+        raise StatementTimeout(f"query stopped after {seconds:g} s (statement timeout)") from e
+    finally:
+        if dialect == 'sqlite':
+            raw.set_progress_handler(None, 0)
+        elif not conn.invalidated:
+            conn.exec_driver_sql('SET SESSION MAX_EXECUTION_TIME = DEFAULT')
+
+
+def _row_bytes(row):
+    return sum(len(v) if isinstance(v, (str, bytes)) else 8 for v in row)
+
+
+def fetch_capped(result, max_rows, max_bytes=MAX_RESULT_BYTES, row_notice=True):
+    """(rows, truncated): at most max_rows rows and max_bytes of values from a result.
+
+    `truncated` is 'rows' if the result has more rows (the query should be
+    bounded to max_rows + 1), 'bytes' if the byte cap stopped the fetch, else None.
+    Pass row_notice=False where more rows are expected (a page of a longer result).
+    """
+    rows, size, truncated = [], 0, None
+    for row in result:
+        if len(rows) == max_rows:
+            truncated = 'rows'
+            break
+        size += _row_bytes(row)
+        if size > max_bytes:
+            truncated = 'bytes'
+            break
+        rows.append(list(row))
+    if truncated == 'rows' and row_notice:
+        _notice('row_capped', f"✂️ A result was capped at {max_rows:,} rows", rows=max_rows)
+    elif truncated == 'bytes':
+        _notice('byte_capped', f"✂️ A result was cut at {max_bytes / 2 ** 20:g} MB ({len(rows):,} rows)",
+                rows=len(rows))
+    return rows, truncated
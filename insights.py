@@ -0,0 +1,217 @@
+import numbers
+import re
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from guardrails import check_statement, statement_timeout
+from results import derived_table, fetch_page
+
+CHART_ROWS = 1000
+TOP_N = 5
+MAX_BAR_CATEGORIES = 30
+
+_IDENTIFIER = re.compile(r'(?i:^id$|_id$)|(?<=[a-z])Id$')
+_TEMPORAL = re.compile(r'(date|time|year|month|day|week|quarter|period)', re.IGNORECASE)
+
+
+def to_frame(columns, rows):
+    """Columnar result frame; Decimal/str-typed numbers from the driver become real numeric columns"""
+    frame = pd.DataFrame(rows, columns=columns)
+    for col in frame.columns[frame.dtypes == object]:
+        values = frame[col].dropna()
+        if len(values) and values.map(lambda v: isinstance(v, numbers.Number) and not isinstance(v, bool)).all():
+            frame[col] = pd.to_numeric(frame[col])
+    return frame
+
+
+def load_summary(engine, sql, max_rows=CHART_ROWS):
+    """Summary of a query's result, charted from its first max_rows rows (see summarize_result)"""
+    return summarize_result(engine, sql, *fetch_page(engine, sql, 0, page_size=max_rows))
+
+
+def _roles(frame):
+    """(labels, measures): text/date columns to group by, numeric non-identifier columns to aggregate"""
+    labels, measures = [], []
+    for col in frame.columns:
+        numeric = pd.api.types.is_numeric_dtype(frame[col]) and not pd.api.types.is_bool_dtype(frame[col])
+        if numeric and not _IDENTIFIER.search(str(col)):
+            measures.append(col)
+        elif not numeric:
+            labels.append(col)
+    return labels, measures
+
+
+def _temporal(frame, col):
+    if pd.api.types.is_datetime64_any_dtype(frame[col]):
+        return True
+    if not _TEMPORAL.search(str(col)):
+        return False
+    parsed = pd.to_datetime(frame[col].astype(str), errors='coerce', format='mixed')
+    return parsed.notna().mean() > 0.9
+
+
+def summarize(frame, top_n=TOP_N):
+    """Totals, top-N and group-by computed on the frame itself instead of by the LLM.
+
+    Returns {'rows', 'sampled' (rows charted when they are not all), 'partial', 'measures': {col: {total, mean, min, max}}, 'label', 'measure',
+    'grouped' (group count when repeated labels were summed), 'top': [(label, value), ...],
+    'series': frame to chart, 'chart': 'metric' / 'bar' / 'line' / 'scatter' or None}.
+    """
+    labels, measures = _roles(frame)
+    summary = {
+        'rows': len(frame),
+        'sampled': None,
+        'partial': False,
+        'measures': {},
+        'label': labels[0] if labels else None,
+        'measure': measures[0] if measures else None,
+        'grouped': False,
+        'top': [],
+        'series': None,
+        'chart': None,
+    }
+    if not len(frame):
+        return summary
+    # One pass over a float matrix instead of a pandas aggregation per column and statistic
+    values = np.column_stack([frame[m].to_numpy(dtype=float, na_value=np.nan) for m in measures]) if measures else None
+    if measures and not np.isnan(values).all():
+        stats = zip(np.nansum(values, 0), np.nanmean(values, 0), np.nanmin(values, 0), np.nanmax(values, 0))
+        summary['measures'] = {m: dict(zip(('total', 'mean', 'min', 'max'), map(float, s))) for m, s in zip(measures, stats)}
+    label, measure = summary['label'], summary['measure']
+
+    if len(frame) == 1 and measures and not labels:
+        summary['chart'] = 'metric'
+    elif label is not None and measure is not None:
+        grouped = frame[label].duplicated().any()
+        # Repeated labels mean the rows are details, so aggregate them per label before ranking
+        series = frame.groupby(label, sort=False, as_index=False)[measures].sum() if grouped else frame[[label, *measures]]
+        summary['grouped'] = len(series) if grouped else False
+        top = series.nlargest(top_n, measure)
+        summary['top'] = list(zip(top[label].tolist(), top[measure].tolist()))
+        if _temporal(frame, label):
+            summary['series'] = series.sort_values(label)
+            summary['chart'] = 'line'
+        elif len(series) <= MAX_BAR_CATEGORIES:
+            summary['series'] = series
+            summary['chart'] = 'bar'
+    elif len(measures) >= 2 and len(frame) > 1:
+        summary['series'] = frame[measures[:2]]
+        summary['chart'] = 'scatter'
+    return summary
+
+
+def summarize_result(engine, sql, columns, rows, truncated=None, top_n=TOP_N):
+    """summarize() for the first rows of a query's result, with `truncated` as returned by fetch_page.
+
+    When the result goes on past those rows, its row count, totals and top-N
+    are computed in SQL over the whole result (only aggregates leave the
+    database); if that fails, the summary is marked partial and gives none.
+    """
+    frame = to_frame(columns, rows)
+    summary = summarize(frame, top_n)
+    if truncated:
+        summary['sampled'] = len(frame)
+        try:
+            _summarize_in_sql(engine, sql, frame, summary, top_n)
+        except Exception:
+            summary['partial'] = True
+    return summary
+
+
+def _number(value):
+    return float('nan') if value is None else float(value)
+
+
+def _summarize_in_sql(engine, sql, frame, summary, top_n):
+    """Replace the row count, measure statistics and top-N of a summary with those of the whole result"""
+    if frame.columns.duplicated().any():
+        raise ValueError('result columns must have distinct names to be aggregated by name')
+    quote = engine.dialect.identifier_preparer.quote
+    _, measures = _roles(frame)
+    label, measure = summary['label'], summary['measure']
+    whole = derived_table(check_statement(sql, engine.dialect.name), 'whole_result')
+    select = ['count(*)'] + [f'{fn}({quote(m)})' for m in measures for fn in ('sum', 'avg', 'min', 'max')]
+    if label is not None:
+        select.append(f'count(DISTINCT {quote(label)})')
+    with engine.connect() as conn, statement_timeout(conn):
+        stats = list(conn.execute(text(f"SELECT {', '.join(select)} FROM {whole}")).one())
+        top = []
+        if summary['top']:
+            top = conn.execute(text(
+                f'SELECT {quote(label)}, sum({quote(measure)}) AS ranked FROM {whole} '
+                f'WHERE {quote(label)} IS NOT NULL GROUP BY {quote(label)} ORDER BY ranked DESC LIMIT {int(top_n)}'
+            )).all()
+    summary['rows'] = stats[0]
+    summary['measures'] = {
+        m: dict(zip(('total', 'mean', 'min', 'max'), map(_number, stats[1 + 4 * i:5 + 4 * i])))
+        for i, m in enumerate(measures) if stats[1 + 4 * i] is not None
+    }
+    if label is not None:
+        groups = stats[-1]
+        summary['grouped'] = groups if groups < summary['rows'] else False
+    if summary['top']:
+        summary['top'] = [(key, _number(value)) for key, value in top]
+
+
+def _field(name):
+    """Vega-Lite field reference; dots and brackets would otherwise address nested data"""
+    return re.sub(r'([.\[\]\\])', r'\\\1', str(name))
+
+
+def chart_spec(summary):
+    """Vega-Lite spec for the summary's bar / line / scatter chart, None otherwise.
+
+    A plain spec skips the Altair objects and schema validation st.bar_chart
+    and friends build on every call, which dominated redrawing a chat history
+    full of charts.
+    """
+    chart, series = summary['chart'], summary['series']
+    if chart == 'bar':
+        x, y, mark, x_type = summary['label'], summary['measure'], 'bar', 'nominal'
+    elif chart == 'line':
+        x, y, mark, x_type = summary['label'], summary['measure'], 'line', 'temporal'
+    elif chart == 'scatter':
+        (x, y), mark, x_type = series.columns[:2], 'point', 'quantitative'
+    else:
+        return None
+    return {
+        'mark': {'type': mark, 'tooltip': True},
+        'encoding': {
+            'x': {'field': _field(x), 'type': x_type, 'title': str(x)},
+            'y': {'field': _field(y), 'type': 'quantitative', 'title': str(y)},
+        },
+    }
+
+
+def format_value(value):
+    if isinstance(value, numbers.Integral) or (isinstance(value, float) and value.is_integer() and abs(value) < 1e15):
+        return f'{int(value):,}'
+    if isinstance(value, numbers.Real):
+        return f'{value:,.2f}'
+    return str(value)
+
+
+def describe(summary):
+    """Short markdown answer built from the local summary, so the LLM never narrates numbers"""
+    rows = summary['rows']
+    if not rows:
+        return 'The query returned no rows.'
+    if summary['partial']:
+        return f'The first {rows:,} rows are shown; the result has more, so no totals are given.'
+    measure, measures = summary['measure'], summary['measures']
+    if summary['chart'] == 'metric':
+        return '\n'.join(f'**{m}:** {format_value(s["total"])}' for m, s in measures.items())
+    grouped = f', summed into {summary["grouped"]:,} {summary["label"]} groups' if summary['grouped'] else ''
+    sampled = f' The chart shows the first {summary["sampled"]:,}.' if summary['sampled'] and summary['chart'] else ''
+    lines = [f'{rows:,} row{"s" if rows != 1 else ""}{grouped}.{sampled}']
+    if summary['top']:
+        best, value = summary['top'][0]
+        lines.append(f'- Highest **{measure}**: {best} ({format_value(value)})')
+        if len(summary['top']) > 1:
+            lines.append(f'- Top {len(summary["top"])}: ' + ', '.join(str(k) for k, _ in summary['top']))
+    for name, stats in list(measures.items())[:3]:
+        lines.append(f'- **{name}**: total {format_value(stats["total"])}, average {format_value(stats["mean"])}, '
+                     f'range {format_value(stats["min"])}–{format_value(stats["max"])}')
+    return '\n'.join(lines)
@@ -0,0 +1,127 @@
+import re
+from collections import namedtuple
+
+from table_index import STOPWORDS, stem, tokenize
+
+TABLE_WEIGHT = 2.0
+COLUMN_WEIGHT = 1.0
+VALUE_WEIGHT = 1.0
+CUE_WEIGHT = 1.0
+SQL_THRESHOLD = 2.0
+
+Route = namedtuple('Route', ['intent', 'score', 'reason'])
+
+# Whole-message small talk; anything longer than this is not "just a greeting"
+GREETING = re.compile(
+    r"^\s*(hi+|hello+|hey+|hiya|yo|howdy|greetings|good (morning|afternoon|evening|day)|"
+    r"thanks?( you)?( so much| a lot)?|thank you|thx|ty|cheers|bye|goodbye|see you|"
+    r"how are you( doing)?|what'?s up|sup|ok(ay)?|cool|great|nice|awesome)"
+    r"( there)?( sqlbot| bot)?\s*[!.?,:)]*\s*$",
+    re.IGNORECASE
+)
+# Questions about SQL or the assistant itself rather than about the data
+CONCEPT = re.compile(
+    r"^\s*(what is|what's|what are|what does|explain|define|describe how|difference between|"
+    r"how do i write|how to write|why (is|does|do)|can you explain|tell me (a joke|about yourself)|"
+    r"who are you|what can you do|write (a|me a) (poem|story|joke))\b",
+    re.IGNORECASE
+)
+# Phrases that only make sense against data
+DATA_CUES = {
+    'count', 'number', 'total', 'sum', 'average', 'avg', 'mean', 'max', 'maximum', 'min', 'minimum',
+    'top', 'bottom', 'highest', 'lowest', 'largest', 'smallest', 'most', 'least', 'best', 'worst',
+    'many', 'much', 'list', 'show', 'find', 'rank', 'per', 'each', 'every', 'between', 'longest',
+    'shortest', 'sale', 'revenue', 'spent', 'spend', 'sold', 'bought', 'purchase', 'order', 'record',
+    'row', 'distinct', 'unique', 'percentage', 'share', 'trend', 'latest', 'oldest', 'newest', 'first',
+    'long',
+}
+# A year, or a grouping such as "sales by country" (but not SQL's GROUP BY / ORDER BY), is a data cue too
+YEAR = re.compile(r"\b(1[89]|20)\d\d\b")
+GROUPING = re.compile(r"(?<!group )(?<!order )\bby\s+\w", re.IGNORECASE)
+# Explicit SQL vocabulary; decisive unless the message is a concept question
+SQL_SYNTAX = {'select', 'join', 'group', 'sql', 'query', 'table', 'column', 'schema', 'database'}
+
+GREETING_REPLIES = [
+    (re.compile(r'\b(thanks?|thank you|thx|ty|cheers)\b', re.IGNORECASE),
+     "You're welcome! 😊 Ask me anything else about your data."),
+    (re.compile(r'\b(bye|goodbye|see you)\b', re.IGNORECASE),
+     "Goodbye! 👋 Your chat history stays here when you come back."),
+    (re.compile(r'\bhow are you\b', re.IGNORECASE),
+     "Doing great and ready to query! 🚀 What would you like to know about your database?"),
+]
+DEFAULT_GREETING = (
+    "Hi! 👋 I'm SQLBOT. Ask me a question about your data — e.g. *how many customers are there "
+    "per country?* — and I'll write and run the SQL for you."
+)
+
+
+def small_talk(question):
+    """Greeting route for whole-message small talk, else None; needs no schema"""
+    return Route('greeting', 0.0, 'small talk') if GREETING.match(question) else None
+
+
+def greeting_reply(question):
+    """Canned reply for small talk, so a 'hi' never costs an LLM call"""
+    for pattern, reply in GREETING_REPLIES:
+        if pattern.search(question):
+            return reply
+    return DEFAULT_GREETING
+
+
+class IntentRouter:
+    """Local, rule-based router that decides which path a chat message takes.
+
+    - `greeting`: whole-message small talk, answered from a canned reply.
+    - `sql`: the message refers to the schema (table and column names, sampled
+      values) together with data-question cues, or uses explicit SQL vocabulary.
+      Sampled values and columns alone need a data cue ("I love rock music"
+      names a genre but asks for no data); a table name or enough cues do not.
+    - `chat`: everything else, answered by a single LLM call. Concept
+      questions ("what is a left join?") go here unless they score on the
+      schema or on data cues ("what is the total revenue in 2010?").
+
+    The vocabulary comes from the schema catalog, so the router costs a few
+    dictionary lookups per message and no network round trip.
+    """
+
+    def __init__(self, tables):
+        self.vocabulary = {}
+        for name, info in tables.items():
+            self._add(tokenize(name), TABLE_WEIGHT)
+            for col, _ in info.get('columns', []):
+                self._add(tokenize(col), COLUMN_WEIGHT)
+            for values in (info.get('samples') or {}).values():
+                for value in values:
+                    self._add(tokenize(str(value)), VALUE_WEIGHT)
+
+    def _add(self, tokens, weight):
+        for token in tokens:
+            if token in STOPWORDS or token.isdigit() or len(token) < 3:
+                continue
+            term = stem(token)
+            self.vocabulary[term] = max(self.vocabulary.get(term, 0.0), weight)
+
+    def route(self, question):
+        greeting = small_talk(question)
+        if greeting is not None:
+            return greeting
+        tokens = tokenize(question)
+        terms = {stem(t) for t in tokens}
+        schema_hits = sorted(t for t in terms if t in self.vocabulary)
+        schema_score = sum(self.vocabulary[t] for t in schema_hits)
+        cues = sorted(terms & DATA_CUES)
+        cues += [m.group(0) for m in (YEAR.search(question), GROUPING.search(question)) if m]
+        cue_score = CUE_WEIGHT * len(cues)
+        syntax = terms & SQL_SYNTAX
+        concept = CONCEPT.match(question) is not None
+
+        if concept and not schema_hits and not cues:
+            return Route('chat', 0.0, 'concept question')
+        if syntax and not concept:
+            return Route('sql', schema_score + cue_score, f"sql terms: {', '.join(sorted(syntax))}")
+        score = schema_score + cue_score
+        names_table = any(self.vocabulary[t] >= TABLE_WEIGHT for t in schema_hits)
+        if score >= SQL_THRESHOLD and (cues or names_table):
+            reason = f"schema terms: {', '.join(schema_hits)}" if schema_hits else f"data cues: {', '.join(cues)}"
+            return Route('sql', score, reason)
+        return Route('chat', score, 'no schema match' if not schema_hits else 'weak schema match')
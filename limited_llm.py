@@ -0,0 +1,41 @@
+from typing import Any
+
+from langchain_core.language_models.chat_models import BaseChatModel
+
+
+class LimitedChatModel(BaseChatModel):
+    """A chat model whose async calls each take one of an AsyncRunner's LLM slots.
+
+    The slot is held for one generation (or one stream) only, so an agent
+    waiting on its SQL tools between turns does not keep other sessions'
+    LLM calls queued. Sync calls go straight to the wrapped model.
+    """
+
+    model: BaseChatModel
+    runner: Any
+
+    @property
+    def _llm_type(self):
+        return self.model._llm_type
+
+    @property
+    def _identifying_params(self):
+        return self.model._identifying_params
+
+    def _should_stream(self, *, async_api, run_manager=None, **kwargs):
+        return self.model._should_stream(async_api=async_api, run_manager=run_manager, **kwargs)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        return self.model._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        yield from self.model._stream(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        async with self.runner.llm_slot():
+            return await self.model._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        async with self.runner.llm_slot():
+            async for chunk in self.model._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                yield chunk
@@ -0,0 +1,276 @@
+import importlib
+from pathlib import Path
+
+from sqlalchemy.exc import SQLAlchemyError
+from langchain_community.utilities import SQLDatabase
+
+import tracing
+from engines import shared_engine, sqlite_engine
+from intent_router import Route, greeting_reply, small_talk
+from query_cache import final_sql, result_recorder, run_sql_cached, schema_fingerprint
+from resource_cache import agent_key, connection_key, fingerprint
+from results import PAGE_SIZE
+from schema_catalog import CATALOG_PREFIX, SchemaCatalog, with_schema
+from sql_repair import SQLRepairer, SQLValidationError
+from warmup import Warmup, reflect_database, stats_path
+
+MODEL_NAME = 'Llama3-8b-8192'
+LOCAL_DB_PATH = Path(__file__).parent / 'Chinook.db'
+# The app's connection key for LOCAL_DB_PATH (its 'USE_LOCALDB' mode); other callers use it for that
+# file too, so they share its cached answers, catalog and statistics
+LOCAL_DB_KEY = connection_key('USE_LOCALDB')
+
+# Query engines: one LLM call that writes checked SQL, several concurrent candidates that vote,
+# or the multi-step ReAct agent
+FAST = 'fast'
+SPECULATIVE = 'speculative'
+AGENT = 'agent'
+
+# Third-party packages the answer path imports lazily; the warmup loads them while the user types
+# the first question (app modules are left alone: the app directory is only on sys.path during a run)
+ANSWER_PACKAGES = [
+    'pandas', 'langchain_groq', 'langchain.agents.agent_types',
+    'langchain_community.agent_toolkits.sql.base', 'langchain_community.agent_toolkits.sql.toolkit',
+    'langchain_community.callbacks.streamlit',
+]
+
+
+def sqlite_database(path, immutable=False):
+    """SQLDatabase over a local SQLite file, opened read-only (immutable for uploaded copies)"""
+    if not Path(path).exists():
+        raise FileNotFoundError(f"{Path(path).name} not found. Please ensure the database file exists.")
+    return SQLDatabase(sqlite_engine(path, immutable=immutable), lazy_table_reflection=True)
+
+
+def mysql_database(host, user, password, database):
+    """SQLDatabase over the shared pooled engine for a MySQL server ("host" or "host:port")"""
+    if not (host and user and password and database):
+        raise ValueError("Please complete all MySQL connection details.")
+    # Only MySQL connections need the driver; SQLAlchemy imports it when the engine is created
+    from sqlalchemy.engine import URL
+    host, _, port = host.partition(':')
+    url = URL.create(
+        'mysql+mysqlconnector', username=user, password=password,
+        host=host, port=int(port) if port else None, database=database
+    )
+    return SQLDatabase(shared_engine(url), lazy_table_reflection=True)
+
+
+def upload_database(path, immutable=True):
+    """SQLDatabase over an uploaded SQLite file, checked to contain at least one table"""
+    if path is None:
+        raise ValueError("Please upload a database file to continue.")
+    # Uploads are content-addressed copies nothing else writes to, so they can be opened immutable;
+    # a session's private copy (which gets indexes added) must not be
+    db = sqlite_database(path, immutable=immutable)
+    if not db.get_usable_table_names():
+        raise ValueError("The uploaded file appears to be empty or invalid.")
+    return db
+
+
+class SQLBot:
+    """Answers questions about one connected database: routing, cached answers, fast SQL and the agent.
+
+    The LLM, SQL agents and schema catalog live in the shared ResourceCache and
+    answers in the shared QueryCache, so every SQLBot built for the same
+    connection (one per Streamlit rerun, or one per batch run shared by its
+    workers) reuses them. LLM and agent calls run on `runner` (an AsyncRunner).
+    Pass `llm` to use a given chat model instead of Groq.
+    """
+
+    def __init__(self, db, conn_key, api_key, resources, answers, runner, model_name=MODEL_NAME, llm=None):
+        self.db = db
+        self.conn_key = conn_key
+        self.api_key = api_key
+        self.resources = resources
+        self.answers = answers
+        self.runner = runner
+        self.model_name = model_name
+        self.db_id = fingerprint(repr(conn_key))
+        self._llm = llm if llm is None or runner is None else runner.limit(llm)
+
+    @property
+    def engine(self):
+        return self.db._engine
+
+    def start_warmup(self):
+        """Reflection, schema catalog, answer-path packages and statistics, built once per connection in the background"""
+        return self.resources.get_or_create(('warmup', self.conn_key), lambda: Warmup.start(
+            self.engine,
+            stats_path(self.db_id),
+            prepare=[
+                lambda: reflect_database(self.db),
+                lambda: self.resources.get_or_create(('catalog', self.conn_key), lambda: SchemaCatalog.build(self.engine)),
+                lambda: [importlib.import_module(name) for name in ANSWER_PACKAGES],
+            ]
+        ))
+
+    def llm(self):
+        """The chat model, created (and langchain_groq imported) on first use; its calls share the runner's LLM slots"""
+        if self._llm is not None:
+            return self._llm
+
+        def build():
+            from langchain_groq import ChatGroq
+            llm = ChatGroq(groq_api_key=self.api_key, model_name=self.model_name, streaming=True)
+            return llm if self.runner is None else self.runner.limit(llm)
+        return self.resources.get_or_create(('llm', fingerprint(self.api_key), self.model_name), build)
+
+    def agent(self, tables=None):
+        """SQL agent for this connection, or for a subset of its tables on wide schemas; built on first use"""
+        return self.resources.get_or_create(
+            agent_key(self.conn_key, self.api_key, self.model_name, tables),
+            lambda: self._build_agent(self.db if tables is None else SQLDatabase(self.engine, include_tables=tables))
+        )
+
+    def _build_agent(self, db):
+        from langchain.agents.agent_types import AgentType
+        from langchain_community.agent_toolkits.sql.base import create_sql_agent
+        from agent_tools import BoundedSQLDatabaseToolkit
+        llm = self.llm()
+        return create_sql_agent(
+            llm=llm,
+            toolkit=BoundedSQLDatabaseToolkit(db=db, llm=llm,
+                                              on_result=result_recorder(self.answers, self.db_id, self.engine)),
+            handle_parsing_errors=True,
+            verbose=False,
+            agent_type=AgentType.ZERO_SHOT_REACT_DESCRIPTION,
+            prefix=CATALOG_PREFIX,
+            agent_executor_kwargs={'return_intermediate_steps': True}
+        )
+
+    def catalog(self):
+        """(schema fingerprint, catalog) for the connected database, refreshed if the schema changed"""
+        with tracing.span('schema_fingerprint', 'db'):
+            schema_fp = schema_fingerprint(self.engine)
+        catalog = self.resources.get_or_create(('catalog', self.conn_key), lambda: SchemaCatalog.build(self.engine))
+        if catalog.fingerprint != schema_fp:
+            with tracing.span('catalog_refresh', 'db'):
+                catalog.refresh(self.engine, schema_fp)
+        return schema_fp, catalog
+
+    def result_rows(self, sql, rows):
+        """(columns, rows, truncated) for the first `rows` rows of a query, from the result cache when it has them"""
+        return run_sql_cached(self.answers, self.db_id, schema_fingerprint(self.engine), self.engine, sql, rows)
+
+    def result_page(self, sql, page, page_size=PAGE_SIZE):
+        """(columns, rows, truncated) for one page of a query's result, as fetch_page returns it"""
+        columns, rows, truncated = self.result_rows(sql, (page + 1) * page_size)
+        return columns, rows[page * page_size:], truncated
+
+    def result_summary(self, sql):
+        """Summary of a query's result (see insights.load_summary), charted from the cached rows when there are some"""
+        from insights import CHART_ROWS, summarize_result
+        return summarize_result(self.engine, sql, *self.result_rows(sql, CHART_ROWS))
+
+    def route(self, question, follow_up=False):
+        """(Route, (schema fingerprint, catalog) or None): small talk, a data question or plain chat.
+
+        Greetings are recognized before touching the database at all; follow-ups
+        to a previous query always go to SQL.
+        """
+        route, schema = small_talk(question), None
+        if route is None:
+            schema = self.catalog()
+        with tracing.span('intent_routing', 'internal') as routing:
+            route = route or (Route('sql', 0.0, 'follow-up') if follow_up else schema[1].router().route(question))
+            if routing is not None:
+                routing.attrs.update(intent=route.intent, score=route.score, reason=route.reason)
+        return route, schema
+
+    def answer_sql(self, question, meta, schema, mode=FAST, callbacks=(), inline_callbacks=(), session_id=None):
+        """Stream the answer: from the question cache when possible, from the LLM only on a miss.
+
+        The SQL behind the answer is reported through `meta['sql']` (and the
+        result summary of a fast or refreshed answer through `meta['summary']`).
+        """
+        schema_fp, catalog = schema
+        cached = self.answers.get_answer(self.db_id, schema_fp, question)
+        if cached is not None:
+            sql, answer, fresh = cached
+            meta['sql'] = sql
+            meta['cached'] = True
+            if fresh:
+                yield f"{answer}\n\n_⚡ Answered from cache_"
+                return
+            # Known SQL but stale data: re-run the query instead of asking the LLM again, and answer
+            # from a summary of the fresh result, which also becomes the cached answer
+            from insights import describe
+            with tracing.span('refresh_answer', 'internal'):
+                summary = self.result_summary(sql)
+            answer = describe(summary)
+            self.answers.put_answer(self.db_id, schema_fp, question, sql, answer)
+            meta['summary'] = summary
+            yield f"{answer}\n\n_🔄 Re-ran the cached query with current data_"
+            return
+
+        self.answers.purge(self.db_id, schema_fp)
+        with tracing.span('table_selection', 'internal') as selection:
+            tables = catalog.relevant_tables(question)
+            schema_block = catalog.prompt_block(tables)
+            if selection is not None:
+                selection.attrs.update(tables=len(tables), schema_chars=len(schema_block))
+        if mode in (FAST, SPECULATIVE):
+            # One LLM call (or one race of candidates) writes the SQL; the agent only runs if none is usable
+            if mode == FAST:
+                from fast_sql import fast_answer as generate
+            else:
+                from speculative_sql import speculative_answer as generate
+            with tracing.span(f'{mode}_sql', 'internal') as sql_span:
+                try:
+                    result = generate(self.llm(), self.engine, question, schema_block, runner=self.runner,
+                                      session_id=session_id, callbacks=inline_callbacks,
+                                      repairer=SQLRepairer.from_catalog(catalog, self.db.dialect))
+                except (SQLValidationError, SQLAlchemyError) as e:
+                    result = None
+                    if sql_span is not None:
+                        sql_span.attrs['fallback'] = str(e)[:200]
+                if result is not None and sql_span is not None and mode == SPECULATIVE:
+                    sql_span.attrs.update(candidates=result['candidates'], valid=result['valid'],
+                                           votes=result['votes'], early=result['early'])
+            if result is not None:
+                self.answers.put_result(self.db_id, schema_fp, result['sql'], result['columns'], result['rows'],
+                                        result['truncated'])
+                meta['sql'] = result['sql']
+                meta['summary'] = result['summary']
+                self.answers.put_answer(self.db_id, schema_fp, question, result['sql'], result['output'])
+                yield result['output']
+                return
+
+        from streaming import stream_agent
+        # Wide schema: give the agent a toolkit that only sees the selected tables
+        wide = tables and len(tables) < len(catalog.tables)
+        result = yield from stream_agent(
+            self.agent(tables if wide else None),
+            {'input': with_schema(question, schema_block)},
+            callbacks,
+            runner=self.runner,
+            session_id=session_id,
+            inline_callbacks=inline_callbacks
+        )
+        sql = final_sql(result.get('intermediate_steps'))
+        meta['sql'] = sql
+        if sql:
+            self.answers.put_answer(self.db_id, schema_fp, question, sql, result['output'])
+
+    def chat(self, prompt, inline_callbacks=(), session_id=None):
+        """Stream a plain chat reply from the LLM"""
+        from streaming import stream_llm
+        return stream_llm(self.llm(), prompt, runner=self.runner, session_id=session_id,
+                          inline_callbacks=inline_callbacks)
+
+    def answer(self, question, meta, mode=FAST, chat_prompt=None, follow_up=False, callbacks=(),
+               inline_callbacks=(), session_id=None):
+        """Route the question and stream the reply; `meta['route']` gets the intent.
+
+        `chat_prompt` replaces the question for plain chat (e.g. with the
+        conversation so far). For callers that draw nothing per route; the app
+        routes first so that greetings never load LangChain's UI callbacks.
+        """
+        route, schema = self.route(question, follow_up)
+        meta['route'] = route.intent
+        if route.intent == 'greeting':
+            return iter([greeting_reply(question)])
+        if route.intent == 'sql':
+            return self.answer_sql(question, meta, schema, mode, callbacks, inline_callbacks, session_id)
+        return self.chat(chat_prompt or question, inline_callbacks, session_id)
@@ -0,0 +1,248 @@
+import re
+import sqlite3
+import statistics
+import time
+
+from sqlalchemy import inspect, text
+
+from guardrails import statement_timeout
+from results import enforce_limit
+from sql_repair import KEYWORDS, tokenize_sql
+
+MAX_INDEX_COLUMNS = 5
+# Names of the indexes created from suggestions; left out of the schema fingerprint
+INDEX_PREFIX = 'sqlbot_idx_'
+ROLES = ('eq', 'join', 'range', 'group', 'order', 'other')
+TIMING_RUNS = 3
+
+_CLAUSES = {'select', 'from', 'where', 'on', 'group', 'order', 'having', 'limit'}
+_RANGE_OPS = {'<', '>', '<=', '>=', 'between', 'like', 'in'}
+_AUTOMATIC_INDEX = re.compile(r'^SEARCH (\S+) USING AUTOMATIC (?:PARTIAL )?(?:COVERING )?INDEX \((.*)\)')
+
+
+def explain(engine, sql):
+    """Raw plan rows: EXPLAIN QUERY PLAN detail strings on SQLite, EXPLAIN rows as dicts on MySQL"""
+    dialect = engine.dialect.name
+    with engine.connect() as conn:
+        if dialect == 'sqlite':
+            return [row[-1] for row in conn.execute(text(f'EXPLAIN QUERY PLAN {sql}'))]
+        if dialect == 'mysql':
+            return [dict(row._mapping) for row in conn.execute(text(f'EXPLAIN {sql}'))]
+    return []
+
+
+def _aliases(tokens, tables):
+    """alias (lower-case) -> table for every table the query reads"""
+    aliases, in_from, expect = {}, False, False
+    significant = [(k, v) for k, v in tokens if k != 'space']
+    for i, (kind, value) in enumerate(significant):
+        lowered = value.lower()
+        if lowered in ('from', 'join'):
+            in_from = expect = True
+            continue
+        if lowered in _CLAUSES:
+            in_from = expect = False
+            continue
+        if value == ',' and in_from:
+            expect = True
+            continue
+        if expect and kind in ('word', 'ident'):
+            expect = False
+            table = tables.get(value.strip('"`').lower())
+            if table is None:
+                continue
+            aliases[table.lower()] = table
+            following = significant[i + 1:i + 3]
+            if following and following[0][1].lower() == 'as':
+                following = following[1:]
+            if following and following[0][0] in ('word', 'ident') and following[0][1].lower() not in KEYWORDS:
+                aliases[following[0][1].strip('"`').lower()] = table
+    return aliases
+
+
+def _predicate_role(significant, i, before, after):
+    """eq for `col = literal`, join for `col = other_col`, range for inequalities / LIKE / IN"""
+    if after in _RANGE_OPS or before in _RANGE_OPS:
+        return 'range'
+    if '=' not in (after, before):
+        return 'other'
+    j = i + 2 if after == '=' else i - 2
+    other = significant[j] if 0 <= j < len(significant) else ('', '')
+    return 'eq' if other[0] in ('string', 'number') else 'join'
+
+
+def column_usage(sql, schema):
+    """(aliases, usage): usage maps table -> role -> referenced columns, with roles
+    eq (compared to a literal), join, range, group, order and other"""
+    tokens = tokenize_sql(sql)
+    tables = {t.lower(): t for t in schema}
+    aliases = _aliases(tokens, tables)
+    read = set(aliases.values())
+    significant = [(k, v) for k, v in tokens if k != 'space']
+    usage = {t: {role: [] for role in ROLES} for t in read}
+    clause = None
+    for i, (kind, value) in enumerate(significant):
+        lowered = value.lower()
+        if kind == 'word' and lowered in _CLAUSES:
+            clause = lowered
+            continue
+        if kind not in ('word', 'ident') or lowered in KEYWORDS:
+            continue
+        name = value.strip('"`')
+        prev = significant[i - 1][1] if i else ''
+        nxt = significant[i + 1][1].lower() if i + 1 < len(significant) else ''
+        if nxt == '.' or nxt == '(':
+            continue
+        if prev == '.':
+            table = aliases.get(significant[i - 2][1].strip('"`').lower())
+            candidates = [table] if table else []
+        else:
+            candidates = [t for t in read if name.lower() in {c.lower() for c in schema[t]}]
+        if len(candidates) != 1:
+            continue
+        table = candidates[0]
+        column = next(c for c in schema[table] if c.lower() == name.lower())
+        if clause == 'on':
+            role = 'join'
+        elif clause in ('where', 'having'):
+            role = _predicate_role(significant, i, prev.lower(), nxt)
+        elif clause in ('group', 'order'):
+            role = clause
+        else:
+            role = 'other'
+        if column not in usage[table][role]:
+            usage[table][role].append(column)
+    return aliases, usage
+
+
+def _index_columns(usage, leading=()):
+    """Key columns (equality filters, join keys, range, grouping, ordering), plus the other
+    referenced columns when that keeps the index small enough to be covering"""
+    key = []
+    for column in [*leading, *(c for role in ROLES[:-1] for c in usage[role])]:
+        if column not in key:
+            key.append(column)
+    covering = key + [c for c in usage['other'] if c not in key]
+    return (covering if len(covering) <= MAX_INDEX_COLUMNS else key)[:MAX_INDEX_COLUMNS]
+
+
+def _index_statement(table, columns, quote):
+    name = f"{INDEX_PREFIX}{table}_{'_'.join(columns)}".lower()[:60]
+    return f"CREATE INDEX IF NOT EXISTS {quote(name)} ON {quote(table)} ({', '.join(quote(c) for c in columns)})"
+
+
+def query_schema(engine, sql, catalog=None):
+    """table -> column names for the tables a query names, from the SchemaCatalog when there is one.
+
+    Without a catalog only the named tables are reflected, not the whole database.
+    """
+    named = {value.strip('"`').lower() for kind, value in tokenize_sql(sql) if kind in ('word', 'ident')}
+    if catalog is not None:
+        return {t: [c for c, _ in info['columns']] for t, info in catalog.tables.items() if t.lower() in named}
+    inspector = inspect(engine)
+    return {t: [c['name'] for c in inspector.get_columns(t)] for t in inspector.get_table_names() if t.lower() in named}
+
+
+def analyze_plan(engine, sql, catalog=None):
+    """Flag full scans and temp B-trees in a query's plan and suggest indexes that avoid them.
+
+    Columns come from `catalog` (a SchemaCatalog) when given, so a plan review
+    costs the EXPLAIN plus index lookups for the tables it suggests indexes on.
+    Returns {'plan': [...], 'issues': [{'kind', 'table', 'detail'}], 'suggestions': [CREATE INDEX ...]}.
+    """
+    dialect = engine.dialect.name
+    aliases, usage = column_usage(sql, query_schema(engine, sql, catalog))
+    rows = explain(engine, sql)
+    issues, wanted = [], {}
+
+    if dialect == 'sqlite':
+        plan = [str(r) for r in rows]
+        scanned = []
+        for detail in plan:
+            if detail.startswith('SCAN ') and ' INDEX ' not in detail:
+                table = aliases.get(detail.split()[1].lower())
+                scanned.append(table)
+                issues.append({'kind': 'full scan', 'table': table, 'detail': detail})
+                # Outer-loop scans without filters read every row anyway; inner or filtered scans do not have to
+                if table and (usage[table]['eq'] or usage[table]['range'] or len(scanned) > 1):
+                    wanted[table] = _index_columns(usage[table])
+            elif (match := _AUTOMATIC_INDEX.match(detail)):
+                table = aliases.get(match.group(1).lower())
+                issues.append({'kind': 'automatic index', 'table': table, 'detail': detail})
+                if table:
+                    wanted[table] = [c.split('=')[0].strip() for c in match.group(2).split(' AND ')]
+            elif detail.startswith('USE TEMP B-TREE'):
+                issues.append({'kind': 'temp b-tree', 'table': None, 'detail': detail})
+                # Reading the only scanned table in GROUP BY / ORDER BY order makes the sort unnecessary
+                role = 'group' if 'GROUP BY' in detail else 'order' if 'ORDER BY' in detail else None
+                sort_tables = [t for t in usage if role and usage[t][role]]
+                if len(sort_tables) == 1 and sort_tables[0] in scanned:
+                    table = sort_tables[0]
+                    wanted[table] = _index_columns(usage[table], leading=usage[table]['eq'] + usage[table][role])
+    elif dialect == 'mysql':
+        plan = [' '.join(f'{k}={v}' for k, v in r.items() if v is not None) for r in rows]
+        for r in rows:
+            table = aliases.get(str(r.get('table', '')).lower())
+            extra = str(r.get('Extra') or '')
+            if r.get('type') == 'ALL':
+                issues.append({'kind': 'full scan', 'table': table, 'detail': f"{r.get('table')}: type=ALL rows={r.get('rows')}"})
+                if table and (usage[table]['eq'] or usage[table]['range'] or usage[table]['join']):
+                    wanted[table] = _index_columns(usage[table])
+            for flag in ('Using temporary', 'Using filesort'):
+                if flag in extra:
+                    issues.append({'kind': flag.lower(), 'table': table, 'detail': f"{r.get('table')}: {extra}"})
+    else:
+        plan = [str(r) for r in rows]
+
+    quote = engine.dialect.identifier_preparer.quote
+    suggestions = []
+    inspector = inspect(engine) if wanted else None
+    for table, columns in wanted.items():
+        pk = tuple(inspector.get_pk_constraint(table).get('constrained_columns') or [])
+        covered = any(tuple(ix['column_names'][:len(columns)]) == tuple(columns) for ix in inspector.get_indexes(table))
+        # Rows are already found (and ordered) by the primary key
+        if not columns or covered or (pk and tuple(columns[:len(pk)]) == pk):
+            continue
+        suggestions.append(_index_statement(table, columns, quote))
+    return {'plan': plan, 'issues': issues, 'suggestions': suggestions}
+
+
+def time_query(engine, sql, runs=TIMING_RUNS):
+    """Median wall time (ms) of running the bounded query and fetching its rows"""
+    bounded = text(enforce_limit(sql))
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        with engine.connect() as conn, statement_timeout(conn):
+            conn.execute(bounded).fetchall()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def apply_indexes(path, statements):
+    """Create indexes in a private SQLite copy through its own writable connection"""
+    conn = sqlite3.connect(str(path))
+    try:
+        with conn:
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute('ANALYZE')
+    finally:
+        conn.close()
+
+
+def index_and_time(engine, path, sql, statements):
+    """Apply suggested indexes to a session's private copy and time the query before and after.
+
+    The engine must not be opened immutable: its connections would not notice
+    the new indexes, and SQLite does not support changing an immutable file.
+    """
+    if 'immutable=1' in str(engine.url):
+        raise ValueError('indexes can only be added to a private, non-immutable copy')
+    before = time_query(engine, sql)
+    apply_indexes(path, statements)
+    # Queries see the new indexes on any connection, but cached EXPLAIN statements (which never read
+    # the file, so never notice the schema change) would keep reporting the old plan
+    engine.dispose()
+    after = time_query(engine, sql)
+    return {'before_ms': before, 'after_ms': after, 'applied': list(statements)}
@@ -0,0 +1,199 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from sqlalchemy import text
+
+import tracing
+from plan_analyzer import INDEX_PREFIX
+from results import MAX_RESULT_ROWS, fetch_page
+from sql_repair import REPAIRED_PREFIX
+
+CACHE_PATH = Path(os.environ.get('SQLBOT_CACHE_PATH', Path(__file__).parent / '.sqlbot_cache' / 'query_cache.db'))
+DATA_TTL_SECONDS = int(os.environ.get('SQLBOT_DATA_TTL', '900'))
+# Result rows are shown as they are, so they go stale sooner than an answer's SQL
+RESULT_TTL_SECONDS = int(os.environ.get('SQLBOT_RESULT_TTL', '300'))
+
+SCHEMA_QUERIES = {
+    # Indexes the app added itself do not change what a query returns, so they keep cached answers
+    'sqlite': (
+        "SELECT type, name, tbl_name, sql FROM sqlite_master WHERE name NOT LIKE 'sqlite_%' "
+        f"AND name NOT LIKE '{INDEX_PREFIX.replace('_', '!_')}%' ESCAPE '!' ORDER BY type, name"
+    ),
+    'mysql': (
+        "SELECT table_name, column_name, column_type, column_key FROM information_schema.columns "
+        "WHERE table_schema = DATABASE() ORDER BY table_name, ordinal_position"
+    ),
+}
+
+
+def normalize_question(question):
+    """Case/whitespace/punctuation-insensitive form of a question, used as the cache key"""
+    question = re.sub(r'\s+', ' ', question.strip().lower())
+    return question.rstrip(' ?!.')
+
+
+def schema_fingerprint(engine):
+    """Hash of the schema DDL; changes whenever a table, column or index changes"""
+    query = SCHEMA_QUERIES.get(engine.dialect.name)
+    digest = hashlib.sha256(engine.dialect.name.encode())
+    if query is None:
+        from sqlalchemy import inspect
+        inspector = inspect(engine)
+        for table in sorted(inspector.get_table_names()):
+            digest.update(table.encode())
+            for column in inspector.get_columns(table):
+                digest.update(f"{column['name']}:{column['type']}".encode())
+        return digest.hexdigest()[:16]
+    with engine.connect() as conn:
+        for row in conn.execute(text(query)):
+            digest.update(repr(tuple(row)).encode())
+    return digest.hexdigest()[:16]
+
+
+def _sql_key(sql):
+    return hashlib.sha256(' '.join(sql.split()).encode()).hexdigest()
+
+
+class QueryCache:
+    """Persistent two-tier cache for the text-to-SQL pipeline.
+
+    Tier 1 maps (database, schema fingerprint, normalized question) to the final
+    SQL and answer the agent produced; answers older than `data_ttl` are
+    refreshed by re-running the known SQL instead of calling the LLM. Tier 2
+    maps (database, schema fingerprint, SQL text) to the first rows the query
+    returned, written wherever the SQL runs (fast path, agent tool) and read by
+    the result pages and charts, for `result_ttl` seconds.
+    """
+
+    def __init__(self, path=CACHE_PATH, data_ttl=DATA_TTL_SECONDS, result_ttl=RESULT_TTL_SECONDS):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.data_ttl = data_ttl
+        self.result_ttl = result_ttl
+        self.stats = {'answer_hits': 0, 'answer_misses': 0, 'result_hits': 0, 'result_misses': 0}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS answers (
+                db_id TEXT, schema_fp TEXT, question TEXT,
+                sql TEXT, answer TEXT, created_at REAL,
+                PRIMARY KEY (db_id, schema_fp, question)
+            );
+            CREATE TABLE IF NOT EXISTS results (
+                db_id TEXT, schema_fp TEXT, sql_key TEXT,
+                sql TEXT, rows TEXT, created_at REAL,
+                PRIMARY KEY (db_id, schema_fp, sql_key)
+            );
+        """)
+
+    @staticmethod
+    def _fresh(created_at, ttl):
+        return not ttl or time.time() - created_at < ttl
+
+    def get_answer(self, db_id, schema_fp, question):
+        """Return (sql, answer, fresh) for a previously answered question, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sql, answer, created_at FROM answers WHERE db_id=? AND schema_fp=? AND question=?",
+                (db_id, schema_fp, normalize_question(question))
+            ).fetchone()
+            self.stats['answer_hits' if row else 'answer_misses'] += 1
+        tracing.record('answer_cache', 'cache', hit=row is not None)
+        if row is None:
+            return None
+        sql, answer, created_at = row
+        return sql, answer, self._fresh(created_at, self.data_ttl)
+
+    def put_answer(self, db_id, schema_fp, question, sql, answer):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?, ?)",
+                (db_id, schema_fp, normalize_question(question), sql, answer, time.time())
+            )
+
+    def get_result(self, db_id, schema_fp, sql, rows=0):
+        """(columns, rows, truncated) cached for this exact SQL, or None.
+
+        Hits only within the result TTL and when the entry holds at least `rows`
+        rows or the whole result. `truncated` is as fetch_capped reported it.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT rows, created_at FROM results WHERE db_id=? AND schema_fp=? AND sql_key=?",
+                (db_id, schema_fp, _sql_key(sql))
+            ).fetchone()
+            entry = json.loads(row[0]) if row is not None and self._fresh(row[1], self.result_ttl) else None
+            # Entries written before column names were kept are bare row lists
+            hit = isinstance(entry, dict) and (len(entry['rows']) >= rows or entry['truncated'] is None)
+            self.stats['result_hits' if hit else 'result_misses'] += 1
+        tracing.record('result_cache', 'cache', hit=hit)
+        return (entry['columns'], entry['rows'], entry['truncated']) if hit else None
+
+    def put_result(self, db_id, schema_fp, sql, columns, rows, truncated):
+        """Keep the first rows of a query's result (`truncated` as fetch_capped reported it)"""
+        result = {'columns': columns, 'rows': rows, 'truncated': truncated}
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)",
+                (db_id, schema_fp, _sql_key(sql), sql, json.dumps(result, default=str), time.time())
+            )
+
+    def purge(self, db_id, schema_fp):
+        """Drop entries for this database that were recorded under an older schema"""
+        with self._lock, self._conn:
+            for table in ('answers', 'results'):
+                self._conn.execute(f"DELETE FROM {table} WHERE db_id=? AND schema_fp<>?", (db_id, schema_fp))
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM answers")
+            self._conn.execute("DELETE FROM results")
+
+    def hit_rates(self):
+        answer_total = self.stats['answer_hits'] + self.stats['answer_misses']
+        result_total = self.stats['result_hits'] + self.stats['result_misses']
+        return {
+            'answer': self.stats['answer_hits'] / answer_total if answer_total else 0.0,
+            'result': self.stats['result_hits'] / result_total if result_total else 0.0,
+        }
+
+
+def final_sql(intermediate_steps, tool_name='sql_db_query'):
+    """The last SQL statement the agent actually executed, taken from its intermediate steps"""
+    for action, observation in reversed(intermediate_steps or []):
+        if getattr(action, 'tool', None) == tool_name:
+            # The query tool reports when it ran a locally repaired statement instead
+            if isinstance(observation, str) and observation.startswith(REPAIRED_PREFIX):
+                return observation[len(REPAIRED_PREFIX):].split('\n', 1)[0].strip()
+            tool_input = action.tool_input
+            if isinstance(tool_input, dict):
+                tool_input = tool_input.get('query', '')
+            return str(tool_input).strip()
+    return None
+
+
+def run_sql_cached(cache, db_id, schema_fp, engine, sql, rows=MAX_RESULT_ROWS):
+    """(columns, rows, truncated) for the first `rows` rows of SQL, through the tier-2 result cache.
+
+    `truncated` is 'rows' when the result goes on after them, as for fetch_page.
+    """
+    cached = cache.get_result(db_id, schema_fp, sql, rows)
+    if cached is None:
+        cached = fetch_page(engine, sql, 0, page_size=rows)
+        cache.put_result(db_id, schema_fp, sql, *cached)
+    columns, head, truncated = cached
+    return columns, head[:rows], 'rows' if len(head) > rows else truncated
+
+
+def result_recorder(cache, db_id, engine):
+    """A callback(sql, columns, rows, truncated) that keeps rows a query returned in the result cache"""
+    def record(sql, columns, rows, truncated):
+        cache.put_result(db_id, schema_fingerprint(engine), sql, columns, rows, truncated)
+    return record
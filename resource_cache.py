@@ -0,0 +1,123 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import tracing
+from engines import is_shared
+
+
+def fingerprint(value):
+    """Short, non-reversible digest used to put secrets and file contents into cache keys"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.encode('utf-8')
+    return hashlib.sha256(value).hexdigest()[:16]
+
+
+def connection_key(mode, host=None, user=None, password=None, db_name=None, upload_hash=None):
+    """Identity of a database connection: same key means same engine/SQLDatabase can be reused"""
+    return ('db', mode, host, user, fingerprint(password), db_name, upload_hash)
+
+
+def agent_key(conn_key, api_key, model_name, tables=None):
+    """Identity of an LLM + toolkit + agent bound to a given connection (and optional table subset)"""
+    return ('agent', conn_key, fingerprint(api_key), model_name, tuple(sorted(tables)) if tables else None)
+
+
+def dispose_resource(value):
+    """Release whatever a cached value holds on to (SQLAlchemy engines, pools, ...).
+
+    Process-wide engines (engines.shared_engine / sqlite_engine) are left alone:
+    other sessions on the same DSN still use their warm connections.
+    """
+    engine = getattr(value, '_engine', None) or getattr(value, 'engine', None)
+    if engine is None and hasattr(value, 'dispose'):
+        engine = value
+    if engine is not None and hasattr(engine, 'dispose') and not is_shared(engine):
+        try:
+            engine.dispose()
+        except Exception:
+            pass
+
+
+class ResourceCache:
+    """Thread-safe LRU/TTL cache for expensive per-connection objects.
+
+    Streamlit reruns the whole script on every widget interaction, so engines,
+    reflected SQLDatabase objects and agents are kept here (one instance per
+    process) instead of being rebuilt on each rerun.
+    """
+
+    def __init__(self, max_entries=8, ttl=3600, on_evict=dispose_resource):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get_or_create(self, key, factory):
+        """Return the cached value for key, building it with factory() on a miss"""
+        with self._lock:
+            self._expire()
+            if key in self._entries:
+                value, _ = self._entries.pop(key)
+                self._entries[key] = (value, time.monotonic())
+                self.hits += 1
+                tracing.record('resource_cache', 'cache', resource=str(key[0]), hit=True)
+                return value
+            self.misses += 1
+        tracing.record('resource_cache', 'cache', resource=str(key[0]), hit=False)
+
+        # Build outside the lock so one slow reflection does not block other sessions
+        with tracing.span(f'build {key[0]}', 'build'):
+            value = factory()
+
+        with self._lock:
+            if key in self._entries:
+                # Another session built it meanwhile; keep theirs and drop ours
+                if self.on_evict is not None:
+                    self.on_evict(value)
+                value, _ = self._entries.pop(key)
+            self._entries[key] = (value, time.monotonic())
+            while len(self._entries) > self.max_entries:
+                _, (old_value, _) = self._entries.popitem(last=False)
+                self._evict_value(old_value)
+            return value
+
+    def invalidate(self, key=None):
+        """Drop one entry (or everything when key is None), disposing evicted values"""
+        with self._lock:
+            keys = list(self._entries) if key is None else [key]
+            for k in keys:
+                if k in self._entries:
+                    value, _ = self._entries.pop(k)
+                    self._evict_value(value)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+    def _expire(self):
+        if not self.ttl:
+            return
+        cutoff = time.monotonic() - self.ttl
+        for k in [k for k, (_, used) in self._entries.items() if used < cutoff]:
+            value, _ = self._entries.pop(k)
+            self._evict_value(value)
+
+    def _evict_value(self, value):
+        self.evictions += 1
+        if self.on_evict is not None:
+            self.on_evict(value)
@@ -0,0 +1,104 @@
+import csv
+import re
+from pathlib import Path
+
+from sqlalchemy import text
+
+import tracing
+from guardrails import EXPORT_TIMEOUT_S, check_statement, fetch_capped, statement_timeout
+from sql_repair import is_select, strip_sql
+
+MAX_RESULT_ROWS = 10000
+AGENT_MAX_ROWS = 50
+PAGE_SIZE = 50
+BATCH_SIZE = 1000
+
+_TRAILING_LIMIT = re.compile(r'\blimit\s+(\d+)(\s*(,|offset)\s*\d+)?\s*;?\s*$', re.IGNORECASE)
+
+
+def derived_table(sql, alias):
+    """The query as a derived table; its own lines keep a trailing `--` or `#` comment from eating the paren"""
+    return f'(\n{sql}\n) AS {alias}'
+
+
+def enforce_limit(sql, max_rows=MAX_RESULT_ROWS):
+    """Return the query with an outer row LIMIT no larger than max_rows"""
+    sql = strip_sql(sql)
+    if not is_select(sql):
+        return sql
+    match = _TRAILING_LIMIT.search(sql)
+    if match and not match.group(2) and int(match.group(1)) <= max_rows:
+        return sql
+    # Wrapping works for both SQLite and MySQL (derived tables need an alias)
+    return f"SELECT * FROM {derived_table(sql, 'bounded_result')} LIMIT {int(max_rows)}"
+
+
+def fetch_page(engine, sql, page, page_size=PAGE_SIZE, max_rows=MAX_RESULT_ROWS, cancel=None):
+    """(columns, rows, truncated) for one page of a (bounded) query; only that page leaves the database.
+
+    `truncated` is 'rows' when the result goes on after this page and 'bytes'
+    when the byte cap cut the page short (see fetch_capped), else None.
+    Setting the `cancel` event stops the query early where the dialect allows it (see statement_timeout).
+    """
+    offset = page * page_size
+    limit = max(0, min(page_size, max_rows - offset))
+    # One row more than the page tells whether the result goes on
+    bounded = enforce_limit(check_statement(sql, engine.dialect.name), max_rows)
+    paged = f"SELECT * FROM {derived_table(bounded, 'page_result')} LIMIT {limit + 1} OFFSET {offset}"
+    with engine.connect() as conn, statement_timeout(conn, cancel=cancel):
+        result = conn.execute(text(paged))
+        columns = list(result.keys())
+        rows, truncated = fetch_capped(result, limit, row_notice=False)
+    tracing.annotate_sql(rows=len(rows))
+    return columns, rows, truncated
+
+
+def iter_batches(engine, sql, batch_size=BATCH_SIZE, max_rows=MAX_RESULT_ROWS):
+    """Yield (columns, rows) batches from a server-side cursor instead of materializing the result"""
+    sql = check_statement(sql, engine.dialect.name)
+    with engine.connect() as conn, statement_timeout(conn, EXPORT_TIMEOUT_S):
+        result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(
+            text(enforce_limit(sql, max_rows) if max_rows else sql)
+        )
+        columns = list(result.keys())
+        for partition in result.partitions():
+            yield columns, [list(r) for r in partition]
+
+
+def export_csv(engine, sql, path, max_rows=None):
+    """Stream a query result to a CSV file batch by batch; return the number of rows written"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    written = 0
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        header_done = False
+        for columns, rows in iter_batches(engine, sql, max_rows=max_rows):
+            if not header_done:
+                writer.writerow(columns)
+                header_done = True
+            writer.writerows(rows)
+            written += len(rows)
+    return written
+
+
+def export_parquet(engine, sql, path, max_rows=None):
+    """Stream a query result to a Parquet file, one row group per batch; return rows written"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    writer = None
+    written = 0
+    try:
+        for columns, rows in iter_batches(engine, sql, max_rows=max_rows):
+            table = pa.Table.from_pylist([dict(zip(columns, r)) for r in rows])
+            if writer is None:
+                writer = pq.ParquetWriter(str(path), table.schema)
+            writer.write_table(table.cast(writer.schema))
+            written += len(rows)
+    finally:
+        if writer is not None:
+            writer.close()
+    return written
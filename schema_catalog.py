@@ -0,0 +1,221 @@
+import hashlib
+import threading
+
+from sqlalchemy import inspect, text
+
+from intent_router import IntentRouter
+from table_index import TableIndex
+
+SAMPLE_VALUES = 3
+SAMPLE_COLUMNS = 3
+MAX_VALUE_LEN = 20
+SMALL_SCHEMA_TABLES = 25
+
+SIGNATURE_QUERIES = {
+    'sqlite': (
+        "SELECT tbl_name, group_concat(coalesce(sql, ''), ';') FROM "
+        "(SELECT tbl_name, sql FROM sqlite_master WHERE tbl_name NOT LIKE 'sqlite_%' ORDER BY type, name) "
+        "GROUP BY tbl_name"
+    ),
+    'mysql': (
+        "SELECT table_name, group_concat(concat(column_name, ':', column_type, ':', column_key) "
+        "ORDER BY ordinal_position SEPARATOR ',') FROM information_schema.columns "
+        "WHERE table_schema = DATABASE() GROUP BY table_name"
+    ),
+}
+
+TYPE_ABBREVIATIONS = [
+    ('INT', 'int'), ('CHAR', 'text'), ('TEXT', 'text'), ('CLOB', 'text'),
+    ('REAL', 'float'), ('FLOA', 'float'), ('DOUB', 'float'), ('NUMERIC', 'num'), ('DECIMAL', 'num'),
+    ('DATETIME', 'datetime'), ('TIMESTAMP', 'datetime'), ('DATE', 'date'), ('TIME', 'time'),
+    ('BOOL', 'bool'), ('BLOB', 'blob'), ('BINARY', 'blob'),
+]
+
+
+def short_type(sql_type):
+    name = str(sql_type).upper()
+    for needle, abbrev in TYPE_ABBREVIATIONS:
+        if needle in name:
+            return abbrev
+    return name.split('(')[0].lower() or 'any'
+
+
+def table_signatures(engine):
+    """Per-table DDL hash, fetched in one query, used to rebuild only tables that changed"""
+    query = SIGNATURE_QUERIES.get(engine.dialect.name)
+    if query is None:
+        return {name: None for name in inspect(engine).get_table_names()}
+    with engine.connect() as conn:
+        return {
+            name: hashlib.sha1((ddl or '').encode()).hexdigest()
+            for name, ddl in conn.execute(text(query))
+        }
+
+
+class SchemaCatalog:
+    """Compact, precomputed description of a database schema.
+
+    Each table entry holds its columns and short types, primary key, foreign
+    keys, an estimated row count and a few sample values for text columns.
+    `prompt_block()` renders the relevant part as a few terse lines so the
+    agent does not need list-tables / schema tool calls before writing SQL.
+    """
+
+    def __init__(self, include_tables=None):
+        self.include_tables = set(include_tables) if include_tables else None
+        self.tables = {}
+        self.signatures = {}
+        self.fingerprint = None
+        self._index = None
+        self._router = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def build(cls, engine, include_tables=None):
+        catalog = cls(include_tables)
+        catalog.refresh(engine)
+        return catalog
+
+    def refresh(self, engine, fingerprint=None):
+        """Re-describe only the tables whose DDL changed since the last build; return their names"""
+        with self._lock:
+            signatures = table_signatures(engine)
+            if self.include_tables is not None:
+                signatures = {t: s for t, s in signatures.items() if t in self.include_tables}
+            changed = [t for t, sig in signatures.items() if sig is None or self.signatures.get(t) != sig]
+            for name in set(self.tables) - set(signatures):
+                del self.tables[name]
+            if changed:
+                # One connection for reflection and samples: a second checkout per build can exhaust
+                # the pool when many sessions build their catalogs at once
+                with engine.connect() as conn:
+                    inspector = inspect(conn)
+                    for name in changed:
+                        self.tables[name] = self._describe(inspector, conn, engine.dialect.name, name)
+            self.signatures = signatures
+            self.fingerprint = fingerprint
+            if changed:
+                self._index = None
+                self._router = None
+            return changed
+
+    def _describe(self, inspector, conn, dialect, name):
+        columns = inspector.get_columns(name)
+        pk = inspector.get_pk_constraint(name).get('constrained_columns') or []
+        fks = [
+            (col, fk['referred_table'], ref_col)
+            for fk in inspector.get_foreign_keys(name)
+            for col, ref_col in zip(fk['constrained_columns'], fk['referred_columns'])
+        ]
+        try:
+            comment = inspector.get_table_comment(name).get('text')
+        except NotImplementedError:
+            comment = None
+        quoted = conn.dialect.identifier_preparer.quote
+        table = quoted(name)
+        try:
+            if dialect == 'sqlite':
+                # max(rowid) is an index lookup; count(*) would scan the whole table
+                row_count = conn.execute(text(f"SELECT max(rowid) FROM {table}")).scalar() or 0
+            elif dialect == 'mysql':
+                row_count = conn.execute(text(
+                    "SELECT table_rows FROM information_schema.tables "
+                    "WHERE table_schema = DATABASE() AND table_name = :name"
+                ), {'name': name}).scalar() or 0
+            else:
+                row_count = conn.execute(text(f"SELECT count(*) FROM {table}")).scalar() or 0
+        except Exception:
+            row_count = None
+
+        samples = {}
+        text_columns = [c['name'] for c in columns if short_type(c['type']) == 'text']
+        if text_columns:
+            try:
+                rows = conn.execute(text(
+                    f"SELECT {', '.join(quoted(c) for c in text_columns)} FROM {table} LIMIT 50"
+                )).fetchall()
+                # Prefer categorical-looking columns (many repeats) over free text like emails
+                ranked = sorted(
+                    range(len(text_columns)),
+                    key=lambda i: len({row[i] for row in rows}) / max(len(rows), 1)
+                )
+                for i in ranked[:SAMPLE_COLUMNS]:
+                    values = []
+                    for row in rows:
+                        value = row[i]
+                        if value is not None and str(value)[:MAX_VALUE_LEN] not in values:
+                            values.append(str(value)[:MAX_VALUE_LEN])
+                        if len(values) == SAMPLE_VALUES:
+                            break
+                    if values:
+                        samples[text_columns[i]] = values
+            except Exception:
+                pass
+
+        return {
+            'columns': [(c['name'], short_type(c['type'])) for c in columns],
+            'pk': pk,
+            'fks': fks,
+            'rows': row_count,
+            'samples': samples,
+            'comment': comment,
+        }
+
+    def index(self):
+        """Lexical table index, built lazily and dropped whenever tables change"""
+        if self._index is None:
+            self._index = TableIndex(self.tables)
+        return self._index
+
+    def router(self):
+        """Intent router over this schema's vocabulary, built lazily like the index"""
+        if self._router is None:
+            self._router = IntentRouter(self.tables)
+        return self._router
+
+    def relevant_tables(self, question, k=5, max_tables=12):
+        """Every table for small schemas; otherwise the top-k matches plus their join neighbors"""
+        if len(self.tables) <= SMALL_SCHEMA_TABLES:
+            return sorted(self.tables)
+        return self.index().select(question, k=k, max_tables=max_tables)
+
+    def prompt_block(self, tables=None):
+        """Token-efficient schema text: one line per table, one indented line of sample values"""
+        lines = []
+        for name in tables if tables is not None else sorted(self.tables):
+            info = self.tables.get(name)
+            if info is None:
+                continue
+            fk_map = {col: f'{ref}.{ref_col}' for col, ref, ref_col in info['fks']}
+            cols = []
+            for col, col_type in info['columns']:
+                col_text = f'{col} {col_type}'
+                if col in info['pk']:
+                    col_text += ' PK'
+                if col in fk_map:
+                    col_text += f'>{fk_map[col]}'
+                cols.append(col_text)
+            rows = f" ~{info['rows']} rows" if info['rows'] is not None else ''
+            lines.append(f"{name}({', '.join(cols)}){rows}")
+            if info['samples']:
+                sample_text = '; '.join(f"{col}: {', '.join(vals)}" for col, vals in info['samples'].items())
+                lines.append(f'  e.g. {sample_text}')
+        return '\n'.join(lines)
+
+
+CATALOG_PREFIX = """You are an agent designed to interact with a {dialect} SQL database.
+The relevant part of the database schema is included with each question, in the form
+Table(column type [PK] [>ReferencedTable.column], ...) followed by example values.
+Do NOT call sql_db_list_tables or sql_db_schema unless a table you need is missing from it.
+Write a syntactically correct {dialect} query and run it with sql_db_query, then give the answer.
+The user is shown the query result as a table and chart with its totals computed for them, so the final
+answer is ONE short caption sentence: do not list the rows or repeat their numbers.
+Unless the user asks for a specific number of examples, limit your query to at most {top_k} results.
+Only select the columns relevant to the question. Never run INSERT, UPDATE, DELETE, DROP or other DML/DDL statements.
+If the question does not seem related to the database, just return "I don't know" as the answer.
+"""
+
+
+def with_schema(question, block):
+    """Agent input carrying the schema slice alongside the user's question"""
+    return f"{question}\n\nRelevant schema:\n{block}"
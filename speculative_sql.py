@@ -0,0 +1,129 @@
+import contextvars
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, CancelledError, ThreadPoolExecutor, wait
+
+import tracing
+from fast_sql import FAST_SQL_PROMPT, extract_sql
+from guardrails import StatementTimeout
+from insights import describe, summarize_result
+from results import AGENT_MAX_ROWS, fetch_page
+from sql_repair import check_sql
+
+CANDIDATES = int(os.environ.get('SQLBOT_SQL_CANDIDATES', '3'))
+# Budget for the whole race (LLM replies and queries); candidates still running then are abandoned
+RACE_TIMEOUT_S = float(os.environ.get('SQLBOT_SPECULATIVE_TIMEOUT_S', '30'))
+
+# Added to the single-shot prompt so that the candidates differ; the first one is the fast path's prompt
+CANDIDATE_HINTS = [
+    '',
+    'Decide which tables hold the answer before joining, and join only those.',
+    'If the question is ambiguous, answer its most common reading; aggregate when it asks for counts or totals.',
+    'Prefer the simplest query that answers the question; avoid subqueries unless they are needed.',
+    'Check that every filter value matches the example values shown in the schema.',
+]
+
+
+def candidate_prompts(prompt, candidates=CANDIDATES):
+    """One single-shot prompt per candidate (at most one per hint), each with its own hint before the question"""
+    head, sep, question = prompt.rpartition('\n\nQuestion: ')
+    return [f"{head}\n{hint}{sep}{question}" if hint else prompt for hint in CANDIDATE_HINTS[:max(1, candidates)]]
+
+
+def result_key(columns, rows):
+    """Fingerprint of a result that ignores row order and column names, so equivalent queries vote together"""
+    digest = hashlib.sha1(str(len(columns)).encode())
+    for row in sorted(repr(tuple(r)) for r in rows):
+        digest.update(row.encode())
+    return digest.hexdigest()
+
+
+def speculative_answer(llm, engine, question, schema_block, candidates=CANDIDATES, quorum=None,
+                       top_k=AGENT_MAX_ROWS, runner=None, session_id=None, callbacks=None, repairer=None,
+                       timeout=RACE_TIMEOUT_S):
+    """Answer with several SQL candidates written concurrently; the result most of them agree on wins.
+
+    Each reply is validated (and repaired) locally and run on its own pooled
+    connection as soon as it arrives. Once `quorum` candidates (default: a
+    majority) return the same rows, that result is returned and the rest is
+    cancelled: queued LLM calls are dropped and running SQLite queries
+    interrupted. Otherwise the result with the most votes wins, ties going to
+    the one with the earliest prompt; `quorum=1` returns the first valid result.
+    A winning result is answered with the SQL of its earliest prompt, so the
+    outcome does not depend on which thread finished first.
+
+    Raises the first candidate's error (SQLValidationError or the driver's)
+    when none is usable, so callers can fall back to the agent.
+    """
+    prompt = FAST_SQL_PROMPT.format(dialect=engine.dialect.name, schema=schema_block, top_k=top_k,
+                                    question=question)
+    prompts = candidate_prompts(prompt, candidates)
+    quorum = quorum or len(prompts) // 2 + 1
+    config = {'callbacks': list(callbacks or [])}
+    cancel = threading.Event()
+    pool = ThreadPoolExecutor(2 * len(prompts), thread_name_prefix='sqlbot-candidate')
+
+    def in_pool(fn, *args):
+        # Each task gets its own copy of the caller's context, so its SQL spans land on the active trace
+        return pool.submit(contextvars.copy_context().run, fn, *args)
+
+    def run_candidate(reply):
+        sql, fixes = check_sql(engine, extract_sql(reply), repairer)
+        columns, rows, truncated = fetch_page(engine, sql, 0, page_size=top_k, cancel=cancel)
+        return sql, fixes, columns, rows, truncated
+
+    pending = {}
+    for index, candidate_prompt in enumerate(prompts):
+        if runner is None:
+            future = in_pool(llm.invoke, candidate_prompt, config)
+        else:
+            future = runner.submit(lambda p=candidate_prompt: llm.ainvoke(p, config), session_id)
+        pending[future] = ('llm', index)
+
+    votes, errors, winner = {}, [], None
+    deadline = time.monotonic() + timeout
+    try:
+        while pending and winner is None:
+            done, _ = wait(pending, timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                stage, index = pending.pop(future)
+                try:
+                    value = future.result()
+                except CancelledError:
+                    # Only the user stopping the session cancels these before the race is decided
+                    raise
+                except Exception as e:
+                    errors.append(e)
+                    tracing.record('sql_candidate', 'internal', candidate=index, error=str(e)[:200])
+                    continue
+                if stage == 'llm':
+                    pending[in_pool(run_candidate, value.content)] = ('sql', index)
+                    continue
+                key = result_key(value[2], value[3])
+                votes.setdefault(key, []).append((index, value))
+                tracing.record('sql_candidate', 'internal', candidate=index, rows=len(value[3]),
+                               votes=len(votes[key]))
+                if len(votes[key]) >= quorum:
+                    winner = votes[key]
+                    break
+    finally:
+        cancel.set()
+        for future in pending:
+            future.cancel()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    if winner is None and votes:
+        winner = max(votes.values(), key=lambda group: (len(group), -min(i for i, _ in group)))
+    if winner is None:
+        if errors:
+            raise errors[0]
+        raise StatementTimeout(f"no candidate query finished within {timeout:g} s")
+    sql, fixes, columns, rows, truncated = min(winner, key=lambda vote: vote[0])[1]
+    summary = summarize_result(engine, sql, columns, rows, truncated)
+    return {'sql': sql, 'columns': columns, 'rows': rows, 'truncated': truncated, 'fixes': fixes,
+            'summary': summary, 'output': describe(summary), 'candidates': len(prompts),
+            'valid': sum(len(v) for v in votes.values()), 'votes': len(winner), 'early': bool(pending)}
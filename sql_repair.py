@@ -0,0 +1,377 @@
+import difflib
+import re
+import threading
+
+from sqlalchemy import inspect, text
+
+import tracing
+
+FUZZY_CUTOFF = 0.75
+REPAIRED_PREFIX = 'Auto-corrected query: '
+
+# Dialects whose EXPLAIN plans a statement without running it
+EXPLAIN_PREFIX = {'sqlite': 'EXPLAIN QUERY PLAN', 'mysql': 'EXPLAIN'}
+
+KEYWORDS = {
+    'select', 'from', 'where', 'and', 'or', 'not', 'in', 'is', 'null', 'like', 'glob', 'between', 'group', 'by',
+    'order', 'having', 'limit', 'offset', 'as', 'on', 'join', 'inner', 'left', 'right', 'outer', 'full',
+    'cross', 'natural', 'using', 'distinct', 'all', 'union', 'intersect', 'except', 'case', 'when', 'then',
+    'else', 'end', 'asc', 'desc', 'with', 'recursive', 'exists', 'cast', 'integer', 'int', 'real', 'text',
+    'varchar', 'char', 'date', 'datetime', 'decimal', 'numeric', 'float', 'signed', 'unsigned', 'true',
+    'false', 'collate', 'nocase', 'escape', 'interval', 'day', 'month', 'year', 'hour', 'minute', 'second',
+    'over', 'partition', 'rows', 'range', 'preceding', 'following', 'unbounded', 'current', 'row', 'filter',
+    'regexp', 'current_date', 'current_time', 'current_timestamp', 'rowid', 'nulls', 'first', 'last',
+}
+# Keywords that end the table list of a FROM / JOIN
+_CLAUSE_END = {'where', 'group', 'order', 'having', 'limit', 'on', 'using', 'union', 'intersect', 'except',
+               'select', 'join', 'inner', 'left', 'right', 'outer', 'full', 'cross', 'natural', 'window'}
+_COMPARISON = {'=', '<>', '!=', 'like'}
+
+_TOKEN = re.compile(r"""
+    (?P<string>'(?:[^']|'')*'?)
+  | (?P<ident>"(?:[^"]|"")*"|`[^`]*`)
+  | (?P<number>\d+(?:\.\d+)?)
+  | (?P<word>[A-Za-z_][A-Za-z0-9_$]*)
+  | (?P<space>\s+)
+  | (?P<op><>|!=|<=|>=|\|\||.)
+""", re.VERBOSE | re.DOTALL)
+
+# Quoted text and comments, lexed the way the server will. MySQL escapes quotes with backslashes
+# (unless NO_BACKSLASH_ESCAPES), reads "..." as an identifier under ANSI_QUOTES, starts comments
+# with '#' and '-- ' and runs /*! ... */ as code; SQLite also quotes identifiers in [...]
+def _lexer(mysql, escaped):
+    strings = '|'.join(rf"{q}(?:[^{q}\\]|\\.|{q}{q})*{q}" if q in escaped else rf"{q}(?:[^{q}]|{q}{q})*{q}"
+                       for q in '\'"')
+    if mysql:
+        rest = r"|(?P<code>/\*!\d*)|(?P<comment>(?:#|--(?=\s|$))[^\n]*|/\*.*?\*/)|(?P<open>['\"`]|/\*)"
+    else:
+        strings += r"|\[[^\]]*\]"
+        rest = r"|(?P<comment>--[^\n]*|/\*.*?\*/)|(?P<open>['\"`\[]|/\*)"
+    return re.compile(rf"(?P<literal>{strings}|`(?:[^`]|``)*`){rest}", re.DOTALL)
+
+
+# (mysql, quotes that backslashes escape) -> lexer, for every way a dialect may lex a statement
+_LEXERS = {key: _lexer(*key) for key in [(False, ''), (True, '\'"'), (True, "'"), (True, '')]}
+_LEXINGS = {'sqlite': [(False, '')], 'mysql': [(True, '\'"'), (True, "'"), (True, '')]}
+# What a single statement starting with SELECT / WITH can still do besides reading: data-modifying
+# CTEs, writing files, taking row locks, stalling or locking the server through functions
+_WRITES = re.compile(
+    r'\b(insert|update|delete|merge)\b|\breplace\s+into\b|\binto\s+(outfile|dumpfile)\b'
+    r'|\bfor\s+(update|share)\b|\block\s+in\s+share\s+mode\b|\b(sleep|benchmark|get_lock|load_file)\s*\(',
+    re.IGNORECASE,
+)
+
+_stats_lock = threading.Lock()
+repair_stats = {'checked': 0, 'retries_avoided': 0, 'failed': 0}
+
+
+def _count(key):
+    with _stats_lock:
+        repair_stats[key] += 1
+
+
+class SQLValidationError(ValueError):
+    """Generated SQL that must not be run as-is"""
+
+
+def strip_sql(sql):
+    return sql.strip().rstrip(';').strip()
+
+
+def is_select(sql):
+    return re.match(r'^\s*(\(\s*)*(select|with)\b', sql, re.IGNORECASE) is not None
+
+
+def _bare(sql, lexing):
+    """The statement's code: literals emptied, comments blanked (MySQL's /*! ... */ kept as code)"""
+    def blank(match):
+        if match.lastgroup == 'open':
+            raise SQLValidationError('unterminated quote or comment')
+        return {'literal': "''", 'code': ' ', 'comment': ' '}[match.lastgroup]
+    return _LEXERS[lexing].sub(blank, sql)
+
+
+def check_read_only(sql, dialect=None):
+    """The statement, cleaned up, if it is a single read-only SELECT; SQLValidationError otherwise.
+
+    Quotes and comments are lexed as `dialect` does, in each of its SQL modes
+    (MySQL with and without backslash escapes and ANSI_QUOTES); with no
+    dialect, every lexing must pass.
+    """
+    sql = strip_sql(sql)
+    if not sql:
+        raise SQLValidationError('the model returned no SQL')
+    for lexing in _LEXINGS.get(dialect, list(_LEXERS)):
+        bare = _bare(sql, lexing)
+        if ';' in bare:
+            raise SQLValidationError('only a single statement is allowed')
+        if not is_select(bare) or _WRITES.search(bare):
+            raise SQLValidationError('only SELECT queries are allowed')
+    return sql
+
+
+def validate_sql(engine, sql):
+    """Check a statement locally and with an EXPLAIN dry run; return it cleaned up"""
+    sql = check_read_only(sql, engine.dialect.name)
+    prefix = EXPLAIN_PREFIX.get(engine.dialect.name)
+    if prefix is not None:
+        try:
+            with engine.connect() as conn:
+                conn.execute(text(f'{prefix} {sql}')).fetchall()
+        except Exception as e:
+            raise SQLValidationError(f'EXPLAIN failed: {e}') from e
+    return sql
+
+
+def tokenize_sql(sql):
+    return [(m.lastgroup, m.group()) for m in _TOKEN.finditer(sql)]
+
+
+def _significant(tokens, start, step):
+    i = start + step
+    while 0 <= i < len(tokens) and tokens[i][0] == 'space':
+        i += step
+    return i if 0 <= i < len(tokens) else None
+
+
+def _split_args(tokens):
+    """Top-level comma-separated arguments of a token slice, as SQL text"""
+    args, depth, current = [], 0, []
+    for kind, value in tokens:
+        if value == '(':
+            depth += 1
+        elif value == ')':
+            depth -= 1
+        if value == ',' and depth == 0:
+            args.append(''.join(v for _, v in current).strip())
+            current = []
+        else:
+            current.append((kind, value))
+    tail = ''.join(v for _, v in current).strip()
+    return args + [tail] if tail or args else args
+
+
+def _strftime_part(fmt):
+    return lambda a: f"CAST(strftime('{fmt}', {a[0]}) AS INTEGER)" if len(a) == 1 else None
+
+
+# Function rewrites into each dialect: name -> f(args) -> SQL text, or None to leave the call alone
+TRANSPILE = {
+    'sqlite': {
+        'year': _strftime_part('%Y'),
+        'month': _strftime_part('%m'),
+        'day': _strftime_part('%d'),
+        'dayofmonth': _strftime_part('%d'),
+        'now': lambda a: "datetime('now')" if not a else None,
+        'curdate': lambda a: "date('now')" if not a else None,
+        'concat': lambda a: '(' + ' || '.join(a) + ')' if a else None,
+        'date_format': lambda a: f'strftime({a[1]}, {a[0]})' if len(a) == 2 else None,
+        'rand': lambda a: 'RANDOM()' if not a else None,
+        'if': lambda a: f"IIF({', '.join(a)})" if len(a) == 3 else None,
+        'left': lambda a: f'substr({a[0]}, 1, {a[1]})' if len(a) == 2 else None,
+    },
+    'mysql': {
+        'strftime': lambda a: f'DATE_FORMAT({a[1]}, {a[0]})' if len(a) == 2 and a[1].lower() != "'now'" else None,
+        'date': lambda a: 'CURDATE()' if len(a) == 1 and a[0].lower() == "'now'" else None,
+        'datetime': lambda a: 'NOW()' if len(a) == 1 and a[0].lower() == "'now'" else None,
+        'random': lambda a: 'RAND()' if not a else None,
+        'iif': lambda a: f"IF({', '.join(a)})" if len(a) == 3 else None,
+    },
+}
+
+
+def transpile(sql, dialect):
+    """Rewrite functions from the other supported dialect (e.g. YEAR() on SQLite); return (sql, fixes)"""
+    rules = TRANSPILE.get(dialect)
+    if not rules:
+        return sql, []
+    tokens = tokenize_sql(sql)
+    out, fixes, i = [], [], 0
+    while i < len(tokens):
+        kind, value = tokens[i]
+        rule = rules.get(value.lower()) if kind == 'word' else None
+        open_at = _significant(tokens, i, 1) if rule else None
+        if open_at is not None and tokens[open_at][1] == '(':
+            depth, j = 0, open_at
+            while j < len(tokens):
+                depth += tokens[j][1] == '('
+                depth -= tokens[j][1] == ')'
+                if depth == 0:
+                    break
+                j += 1
+            if j < len(tokens):
+                args = [transpile(a, dialect)[0] for a in _split_args(tokens[open_at + 1:j])]
+                rewritten = rule(args)
+                if rewritten is not None:
+                    fixes.append(f'{value}() -> {dialect} equivalent')
+                    out.append(rewritten)
+                    i = j + 1
+                    continue
+        out.append(value)
+        i += 1
+    return ''.join(out), fixes
+
+
+class SQLRepairer:
+    """Mechanical repairs of generated SQL against the known schema, with no LLM call.
+
+    - closes an unterminated string literal
+    - rewrites functions from the other dialect (MySQL <-> SQLite)
+    - fixes identifier case and misspelled table / column names by fuzzy match
+      (preferring columns of the tables the query actually reads)
+    - quotes a bare word compared to a column (`Country = Canada`)
+    """
+
+    def __init__(self, schema, dialect):
+        self.schema = {table: list(columns) for table, columns in schema.items()}
+        self.dialect = dialect
+        self.tables = {t.lower(): t for t in self.schema}
+        self.columns = {c.lower(): c for cols in self.schema.values() for c in cols}
+
+    @classmethod
+    def from_catalog(cls, catalog, dialect):
+        return cls({name: [c for c, _ in info['columns']] for name, info in catalog.tables.items()}, dialect)
+
+    @classmethod
+    def from_database(cls, db):
+        """From a langchain SQLDatabase; inspects the tables directly until its metadata is reflected"""
+        tables = db._metadata.sorted_tables
+        if tables:
+            schema = {table.name: [c.name for c in table.columns] for table in tables}
+        else:
+            inspector = inspect(db._engine)
+            schema = {name: [c['name'] for c in inspector.get_columns(name)] for name in db.get_usable_table_names()}
+        return cls(schema, db.dialect)
+
+    def _quote(self, name):
+        return f'`{name}`' if self.dialect == 'mysql' else f'"{name}"'
+
+    def _match(self, name, candidates):
+        lowered = name.lower()
+        if lowered in candidates:
+            return candidates[lowered]
+        close = difflib.get_close_matches(lowered, list(candidates), n=1, cutoff=FUZZY_CUTOFF)
+        return candidates[close[0]] if close else None
+
+    def _aliases(self, tokens):
+        """Names the query defines itself (alias -> table or None), its CTE names, and the tables it reads"""
+        aliases, ctes, read, in_from, expect_table = {}, set(), set(), False, False
+        last_table = None
+        for i, (kind, value) in enumerate(tokens):
+            lowered = value.lower()
+            if kind == 'space':
+                continue
+            if kind == 'word' and lowered in ('from', 'join'):
+                in_from, expect_table, last_table = True, True, None
+                continue
+            if kind == 'word' and lowered in _CLAUSE_END:
+                in_from = expect_table = False
+                continue
+            if value == ',' and in_from:
+                expect_table = True
+                continue
+            prev = _significant(tokens, i, -1)
+            nxt = _significant(tokens, i, 1)
+            if kind in ('word', 'ident') and prev is not None and tokens[prev][1].lower() == 'as':
+                aliases[value.strip('"`').lower()] = last_table
+                continue
+            if kind == 'word' and nxt is not None and tokens[nxt][1].lower() == 'as':
+                after = _significant(tokens, nxt, 1)
+                if after is not None and tokens[after][1] == '(':
+                    ctes.add(lowered)
+                    continue
+            if kind in ('word', 'ident') and in_from and lowered not in KEYWORDS:
+                name = value.strip('"`')
+                if expect_table and lowered in ctes:
+                    expect_table = False
+                elif expect_table:
+                    table = self._match(name, self.tables)
+                    last_table = table
+                    if table:
+                        read.add(table)
+                    expect_table = False
+                elif prev is not None and tokens[prev][0] in ('word', 'ident'):
+                    aliases[name.lower()] = last_table
+        return aliases, ctes, read
+
+    def repair(self, sql):
+        """Return (repaired sql, list of fixes); an empty list means nothing could be fixed"""
+        fixes = []
+        tokens = tokenize_sql(sql)
+        if tokens and tokens[-1][0] == 'string' and (len(tokens[-1][1]) == 1 or not tokens[-1][1].endswith("'")):
+            sql += "'"
+            fixes.append('closed an unterminated string')
+        sql, transpiled = transpile(sql, self.dialect)
+        fixes += transpiled
+
+        tokens = tokenize_sql(sql)
+        aliases, ctes, read = self._aliases(tokens)
+        scoped = {c.lower(): c for t in read for c in self.schema.get(t, [])} or self.columns
+        out = []
+        for i, (kind, value) in enumerate(tokens):
+            if kind not in ('word', 'ident'):
+                out.append(value)
+                continue
+            name = value.strip('"`') if kind == 'ident' else value
+            lowered = name.lower()
+            prev = _significant(tokens, i, -1)
+            nxt = _significant(tokens, i, 1)
+            prev_value = tokens[prev][1].lower() if prev is not None else ''
+            next_value = tokens[nxt][1] if nxt is not None else ''
+            if kind == 'word' and (lowered in KEYWORDS or next_value == '('):
+                out.append(value)
+                continue
+            table_position = prev_value in ('from', 'join')
+            if lowered in ctes or (lowered in aliases and prev_value != '.' and not table_position):
+                out.append(value)
+                continue
+            if next_value == '.' or table_position:
+                candidates = self.tables
+            elif prev_value == '.':
+                qualifier = tokens[_significant(tokens, prev, -1)][1].strip('"`').lower()
+                table = aliases.get(qualifier) or self.tables.get(qualifier)
+                candidates = {c.lower(): c for c in self.schema.get(table, [])} or self.columns
+            else:
+                candidates = {**self.tables, **scoped}
+            match = self._match(name, candidates)
+            if match is None and lowered not in self.columns and prev_value in _COMPARISON and kind == 'word':
+                out.append(f"'{name}'")
+                fixes.append(f'quoted {name} as a string')
+                continue
+            if match is None and prev_value != '.' and candidates is not self.columns:
+                match = self._match(name, self.columns)
+            if match is None or match == name:
+                out.append(value)
+                continue
+            fixes.append(f'{name} -> {match}')
+            out.append(self._quote(match) if kind == 'ident' or not re.fullmatch(r'[A-Za-z_]\w*', match) else match)
+        return ''.join(out), fixes
+
+
+def check_sql(engine, sql, repairer=None):
+    """Validate SQL, repairing it locally when the dry run fails; return (sql, fixes).
+
+    Raises SQLValidationError when the statement is invalid and no local repair helps,
+    which is the only case that should cost another LLM turn.
+    """
+    _count('checked')
+    try:
+        return validate_sql(engine, sql), []
+    except SQLValidationError as error:
+        if repairer is None:
+            _count('failed')
+            raise
+        original = error
+    repaired, fixes = repairer.repair(strip_sql(sql))
+    try:
+        repaired = validate_sql(engine, repaired) if fixes else None
+    except SQLValidationError:
+        repaired = None
+    if repaired is None:
+        _count('failed')
+        tracing.record('sql_repair', 'internal', repaired=False)
+        raise original
+    # A locally repaired query is one LLM retry the agent does not have to make
+    _count('retries_avoided')
+    tracing.record('sql_repair', 'internal', repaired=True, fixes='; '.join(fixes))
+    return repaired, fixes
@@ -0,0 +1,192 @@
+import queue
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from tracing import MAX_STATEMENT_CHARS, token_usage
+
+FINAL_ANSWER_PREFIX = 'Final Answer:'
+_DONE = object()
+
+
+class FinalAnswerStreamHandler(BaseCallbackHandler):
+    """Forward LLM tokens to a queue once the ReAct agent starts its "Final Answer:".
+
+    Every agent turn streams tokens, but only the text after the final-answer
+    marker is meant for the user; thoughts and tool calls are buffered and
+    dropped when the next LLM call starts.
+    """
+
+    # Keep token order when the agent runs asynchronously
+    run_inline = True
+
+    def __init__(self, token_queue, prefix=FINAL_ANSWER_PREFIX):
+        self.queue = token_queue
+        self.prefix = prefix
+        self.streamed = False
+        self._buffer = ''
+        self._answering = False
+
+    def on_llm_start(self, *args, **kwargs):
+        self._buffer = ''
+        self._answering = False
+
+    def on_chat_model_start(self, *args, **kwargs):
+        self.on_llm_start()
+
+    def on_llm_new_token(self, token, **kwargs):
+        if self._answering:
+            self._emit(token)
+            return
+        self._buffer += token
+        if self.prefix in self._buffer:
+            self._answering = True
+            self._emit(self._buffer.split(self.prefix, 1)[1])
+
+    def _emit(self, text):
+        if not self.streamed:
+            text = text.lstrip()
+        if text:
+            self.streamed = True
+            self.queue.put(text)
+
+
+RELAYED_EVENTS = [
+    'on_llm_start', 'on_chat_model_start', 'on_llm_new_token', 'on_llm_end', 'on_llm_error',
+    'on_chain_start', 'on_chain_end', 'on_chain_error', 'on_tool_start', 'on_tool_end', 'on_tool_error',
+    'on_text', 'on_agent_action', 'on_agent_finish', 'on_retry',
+]
+
+
+class CallbackRelay(BaseCallbackHandler):
+    """Stand-in for a UI callback handler while the agent runs on the async loop.
+
+    Events are queued and replayed on the consuming (script) thread, which is
+    the only thread allowed to draw into that session's Streamlit page.
+    """
+
+    run_inline = True
+
+    def __init__(self, target, event_queue):
+        self.target = target
+        self.queue = event_queue
+
+    def __getattribute__(self, name):
+        if name in RELAYED_EVENTS:
+            target = object.__getattribute__(self, 'target')
+            if getattr(type(target), name) is getattr(BaseCallbackHandler, name):
+                # Not implemented by the target: let LangChain fall back (e.g. chat -> llm start)
+                return getattr(target, name)
+            event_queue = object.__getattribute__(self, 'queue')
+            return lambda *args, **kwargs: event_queue.put((target, name, args, kwargs))
+        return object.__getattribute__(self, name)
+
+
+class TraceCallbackHandler(BaseCallbackHandler):
+    """Turns LangChain chain / LLM / tool callbacks into spans on a Trace"""
+
+    run_inline = True
+
+    def __init__(self, trace):
+        self.trace = trace
+        self._spans = {}
+
+    def _start(self, run_id, parent_run_id, name, kind, **attrs):
+        parent = self._spans.get(parent_run_id)
+        self._spans[run_id] = self.trace.start_span(name, kind, parent.span_id if parent else None, **attrs)
+
+    def _end(self, run_id, error=None, **attrs):
+        span = self._spans.pop(run_id, None)
+        if span is not None:
+            span.end(error=error, **attrs)
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, **kwargs):
+        name = kwargs.get('name') or (serialized or {}).get('name') or 'chain'
+        self._start(run_id, parent_run_id, name, 'chain')
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=error)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, **kwargs):
+        self._start(run_id, parent_run_id, kwargs.get('name') or 'llm', 'llm',
+                    prompt_chars=sum(len(p) for p in prompts))
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kwargs):
+        chars = sum(len(str(m.content)) for batch in messages for m in batch)
+        self._start(run_id, parent_run_id, kwargs.get('name') or 'chat_model', 'llm', prompt_chars=chars)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        prompt, completion = token_usage(response)
+        self._end(run_id, prompt_tokens=prompt, completion_tokens=completion)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=error)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs):
+        name = kwargs.get('name') or (serialized or {}).get('name') or 'tool'
+        self._start(run_id, parent_run_id, name, 'tool', input=str(input_str)[:MAX_STATEMENT_CHARS])
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id, output_chars=len(str(output)))
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=error)
+
+
+def _drain(events, future, handler=None):
+    """Yield text from the event queue, replaying relayed callbacks, until the job finishes"""
+    while True:
+        event = events.get()
+        if event is _DONE:
+            break
+        if isinstance(event, tuple):
+            target, name, args, kwargs = event
+            getattr(target, name)(*args, **kwargs)
+        else:
+            yield event
+    return future.result()
+
+
+def stream_agent(agent, inputs, callbacks=None, runner=None, session_id=None, inline_callbacks=None):
+    """Run the agent with `ainvoke` on the async runner and yield final-answer tokens as they arrive.
+
+    `callbacks` draw UI and are replayed on the consuming thread; `inline_callbacks`
+    (e.g. tracers) are thread-safe and called directly on the loop.
+    Returns (via StopIteration / `yield from`) the agent's full result dict.
+    """
+    events = queue.Queue()
+    handler = FinalAnswerStreamHandler(events)
+    relays = [CallbackRelay(cb, events) for cb in callbacks or []]
+
+    async def run():
+        try:
+            return await agent.ainvoke(inputs, {'callbacks': [handler] + relays + list(inline_callbacks or [])})
+        finally:
+            events.put(_DONE)
+
+    future = runner.submit(run, session_id)
+    future.add_done_callback(lambda f: f.cancelled() and events.put(_DONE))
+    result = yield from _drain(events, future)
+    if not handler.streamed:
+        # Parsing-error fallbacks and non-streaming models never hit the marker
+        yield result['output']
+    return result
+
+
+def stream_llm(llm, prompt, runner=None, session_id=None, inline_callbacks=None):
+    """Yield the text of each chunk from a chat model's `astream`, run on the async runner"""
+    events = queue.Queue()
+
+    async def run():
+        try:
+            async for chunk in llm.astream(prompt, {'callbacks': list(inline_callbacks or [])}):
+                if chunk.content:
+                    events.put(chunk.content)
+        finally:
+            events.put(_DONE)
+
+    future = runner.submit(run, session_id)
+    future.add_done_callback(lambda f: f.cancelled() and events.put(_DONE))
+    yield from _drain(events, future)
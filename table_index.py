@@ -0,0 +1,119 @@
+import math
+import re
+from collections import Counter, defaultdict
+
+K1 = 1.2
+B = 0.75
+NAME_WEIGHT = 3
+TRIGRAM_THRESHOLD = 0.5
+STOPWORDS = {
+    'a', 'an', 'the', 'of', 'in', 'on', 'for', 'to', 'by', 'with', 'and', 'or', 'is', 'are', 'was', 'were',
+    'what', 'which', 'who', 'how', 'many', 'much', 'show', 'list', 'give', 'me', 'all', 'each', 'per',
+    'top', 'most', 'from', 'that', 'this', 'do', 'does', 'have', 'has', 'their', 'there', 'i', 'we',
+}
+
+
+def tokenize(value):
+    """Split identifiers like InvoiceLine / billing_country into lowercase words"""
+    value = re.sub(r'([a-z0-9])([A-Z])', r'\1 \2', value)
+    return [t for t in re.split(r'[^a-zA-Z0-9]+', value.lower()) if t]
+
+
+def stem(token):
+    """Very small English stemmer; enough to match 'customers' to Customer and 'categories' to category"""
+    if token.endswith('ies') and len(token) > 4:
+        return token[:-3] + 'y'
+    if token.endswith('s') and not token.endswith('ss') and len(token) > 3:
+        return token[:-1]
+    return token
+
+
+def trigrams(term):
+    padded = f'  {term} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TableIndex:
+    """Offline BM25 index over tables, for picking the few tables a question needs.
+
+    Each table is a document made of its name (weighted), column names, the
+    names of FK-adjacent tables and any comments. Query words that are not in
+    the vocabulary are mapped to the closest term by trigram overlap, so small
+    misspellings still hit.
+    """
+
+    def __init__(self, tables):
+        self.tables = tables
+        self.doc_terms = {}
+        self.postings = defaultdict(dict)
+        self.trigram_terms = defaultdict(set)
+        neighbors = defaultdict(set)
+        for name, info in tables.items():
+            for _, ref, _ in info.get('fks', []):
+                neighbors[name].add(ref)
+                neighbors[ref].add(name)
+
+        for name, info in tables.items():
+            terms = [stem(t) for t in tokenize(name)] * NAME_WEIGHT
+            for col, _ in info.get('columns', []):
+                terms.extend(stem(t) for t in tokenize(col))
+            for other in neighbors[name]:
+                terms.extend(stem(t) for t in tokenize(other))
+            terms.extend(stem(t) for t in tokenize(info.get('comment') or '') if t not in STOPWORDS)
+            counts = Counter(terms)
+            self.doc_terms[name] = sum(counts.values())
+            for term, tf in counts.items():
+                self.postings[term][name] = tf
+
+        self.neighbors = neighbors
+        self.avg_len = sum(self.doc_terms.values()) / max(len(self.doc_terms), 1)
+        self.idf = {
+            term: math.log(1 + (len(tables) - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in self.postings.items()
+        }
+        for term in self.postings:
+            for gram in trigrams(term):
+                self.trigram_terms[gram].add(term)
+
+    def _resolve(self, token):
+        if token in self.postings:
+            return token
+        grams = trigrams(token)
+        candidates = Counter()
+        for gram in grams:
+            for term in self.trigram_terms.get(gram, ()):
+                candidates[term] += 1
+        best, best_score = None, 0.0
+        for term, shared in candidates.items():
+            score = shared / len(grams | trigrams(term))
+            if score > best_score:
+                best, best_score = term, score
+        return best if best_score >= TRIGRAM_THRESHOLD else None
+
+    def search(self, question, k=5):
+        """Return the top-k (table, score) pairs for a question"""
+        terms = []
+        for token in tokenize(question):
+            if token in STOPWORDS:
+                continue
+            term = self._resolve(stem(token))
+            if term is not None:
+                terms.append(term)
+        scores = Counter()
+        for term in terms:
+            idf = self.idf[term]
+            for name, tf in self.postings[term].items():
+                norm = K1 * (1 - B + B * self.doc_terms[name] / self.avg_len)
+                scores[name] += idf * tf * (K1 + 1) / (tf + norm)
+        return scores.most_common(k)
+
+    def select(self, question, k=5, max_tables=12):
+        """Top-k tables plus their one-hop join neighborhood, capped at max_tables"""
+        selected = [name for name, _ in self.search(question, k)]
+        for name in list(selected):
+            for other in sorted(self.neighbors[name]):
+                if len(selected) >= max_tables:
+                    return selected
+                if other not in selected and other in self.tables:
+                    selected.append(other)
+        return selected
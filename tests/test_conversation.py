@@ -0,0 +1,53 @@
+import pytest
+
+from conversation import Conversation
+
+PREVIOUS_SQL = "SELECT BillingCountry, sum(Total) FROM Invoice GROUP BY BillingCountry"
+
+
+@pytest.fixture
+def conversation():
+    conversation = Conversation('Hi!')
+    conversation.append({'role': 'user', 'content': 'Total sales per country'})
+    conversation.append({'role': 'assistant', 'content': '24 rows.', 'sql': PREVIOUS_SQL})
+    return conversation
+
+
+@pytest.mark.parametrize('question', [
+    "now only for 2013",
+    "what about Canada?",
+    "and in 2012?",
+    "exclude Brazil",
+    "only the top 5",
+    "sort them by total",
+    "break it down by year",
+    "same for customers",
+    "just show those from Europe",
+    "including the ones with no invoices in the previous result",
+    "show the same as a percentage",
+    "can you run that query again for 2011",
+])
+def test_follow_ups_carry_the_previous_query(conversation, question):
+    resolved = conversation.resolve(question)
+    assert resolved.startswith(question)
+    assert '"Total sales per country"' in resolved and PREVIOUS_SQL in resolved
+
+
+@pytest.mark.parametrize('question', [
+    "Include a list of all albums by AC/DC",
+    "And which employees have the most customers in each country?",
+    "Only customers from Canada who bought more than ten tracks",
+    "Now list every playlist with more than 100 tracks in it",
+    "Without counting cancelled orders, what is the average invoice total?",
+    "How many tracks are in the database?",
+    "Which genres are the most popular?",
+])
+def test_new_questions_stand_on_their_own(conversation, question):
+    assert conversation.resolve(question) is None
+
+
+def test_no_follow_up_without_a_previous_query():
+    conversation = Conversation('Hi!')
+    conversation.append({'role': 'user', 'content': 'hi'})
+    conversation.append({'role': 'assistant', 'content': 'Hello!'})
+    assert conversation.resolve("now only for 2013") is None
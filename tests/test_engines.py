@@ -0,0 +1,173 @@
+import threading
+import time
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+import engines
+from engines import POOL_SETTINGS, TimedQueuePool, is_shared, pool_metrics, shared_engine, sqlite_engine
+from resource_cache import ResourceCache, dispose_resource
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = tmp_path / 'pool.db'
+    engine = create_engine(f'sqlite:///{path}')
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE Genre (GenreId INTEGER PRIMARY KEY, Name TEXT)"))
+        conn.execute(text("INSERT INTO Genre (Name) VALUES ('Rock'), ('Jazz'), ('Metal')"))
+    engine.dispose()
+    return path
+
+
+class Holder:
+    """Stands in for a cached SQLDatabase: something with an `_engine`"""
+
+    def __init__(self, engine):
+        self._engine = engine
+
+
+# ── One engine per DSN ──
+def test_same_dsn_gets_the_same_engine(db_path):
+    url = f'sqlite:///{db_path}'
+    assert shared_engine(url) is shared_engine(url)
+    assert sqlite_engine(db_path) is sqlite_engine(str(db_path))
+    assert sqlite_engine(db_path) is not sqlite_engine(db_path, immutable=True)
+    assert is_shared(shared_engine(url)) and is_shared(sqlite_engine(db_path))
+
+
+def test_sessions_on_one_dsn_share_one_pool(db_path):
+    found = []
+    threads = [threading.Thread(target=lambda: found.append(shared_engine(f'sqlite:///{db_path}'))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len({id(e) for e in found}) == 1
+
+
+# ── Health checks ──
+def test_pool_settings(db_path):
+    engine = shared_engine(f'sqlite:///{db_path}')
+    assert isinstance(engine.pool, TimedQueuePool)
+    assert engine.pool._pre_ping is True
+    assert engine.pool._recycle == POOL_SETTINGS['pool_recycle']
+    assert engine.pool.size() == POOL_SETTINGS['pool_size']
+    assert shared_engine(f"sqlite:///{db_path.with_name('other.db')}", pool_recycle=60).pool._recycle == 60
+
+
+def test_pre_ping_replaces_a_dead_connection(db_path):
+    engine = shared_engine(f'sqlite:///{db_path}', pool_size=1, max_overflow=0)
+    with engine.connect() as conn:
+        raw = conn.connection.driver_connection
+    # The server dropped it while it sat in the pool
+    raw.close()
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM Genre")).scalar() == 3
+        assert conn.connection.driver_connection is not raw
+
+
+def test_recycle_replaces_old_connections(db_path):
+    engine = shared_engine(f'sqlite:///{db_path}', pool_size=1, max_overflow=0, pool_recycle=0.05)
+    with engine.connect() as conn:
+        first = conn.connection.driver_connection
+    time.sleep(0.1)
+    with engine.connect() as conn:
+        assert conn.connection.driver_connection is not first
+
+
+# ── Checkout metrics ──
+def test_checkout_waits_are_recorded_under_contention(db_path):
+    engine = shared_engine(f'sqlite:///{db_path}', pool_size=1, max_overflow=0)
+    peak = []
+
+    def session():
+        with engine.connect() as conn:
+            peak.append(pool_metrics(engine)['checked_out'])
+            conn.execute(text("SELECT count(*) FROM Genre")).scalar()
+            time.sleep(0.05)
+
+    threads = [threading.Thread(target=session) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    metrics = pool_metrics(engine)
+    assert max(peak) == 1
+    assert metrics['checkouts'] == 4
+    # Three sessions queued behind the one holding the only connection; the last one about 150 ms
+    assert metrics['max_wait_ms'] >= 100
+    assert 0 < metrics['avg_wait_ms'] < metrics['max_wait_ms']
+    assert metrics['checked_out'] == 0
+
+
+def test_checkout_metrics_survive_dispose(db_path):
+    engine = shared_engine(f'sqlite:///{db_path}')
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    engine.dispose()
+    assert pool_metrics(engine)['checkouts'] == 1
+
+
+# ── Read-only sessions ──
+def test_sqlite_engine_cannot_write(db_path):
+    with sqlite_engine(db_path).connect() as conn:
+        with pytest.raises(OperationalError, match='readonly|read-only|query_only'):
+            conn.execute(text("INSERT INTO Genre (Name) VALUES ('Polka')"))
+        assert conn.execute(text("PRAGMA query_only")).scalar() == 1
+
+
+def test_server_sessions_are_opened_read_only(db_path, monkeypatch):
+    # SQLite stands in for the server: its read-only session statement is a pragma
+    monkeypatch.setitem(engines.READ_ONLY_SESSION, 'sqlite', 'PRAGMA query_only = ON')
+    with shared_engine(f'sqlite:///{db_path}').connect() as conn:
+        with pytest.raises(OperationalError, match='readonly|read-only|query_only'):
+            conn.execute(text("INSERT INTO Genre (Name) VALUES ('Polka')"))
+
+
+def test_read_only_sessions_can_be_turned_off(db_path, monkeypatch):
+    monkeypatch.setitem(engines.READ_ONLY_SESSION, 'sqlite', 'PRAGMA query_only = ON')
+    monkeypatch.setattr(engines, 'READ_ONLY', False)
+    with shared_engine(f'sqlite:///{db_path}').begin() as conn:
+        conn.execute(text("INSERT INTO Genre (Name) VALUES ('Polka')"))
+        assert conn.execute(text("SELECT count(*) FROM Genre")).scalar() == 4
+
+
+# ── Engine lifetimes ──
+def test_evicting_a_session_keeps_the_shared_pool_warm(db_path):
+    engine = sqlite_engine(db_path)
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    pool = engine.pool
+    cache = ResourceCache(max_entries=1)
+    cache.get_or_create(('db', 'a'), lambda: Holder(engine))
+    cache.get_or_create(('db', 'b'), lambda: Holder(engine))
+    cache.invalidate()
+    assert cache.stats()['evictions'] == 2
+    assert engine.pool is pool and pool.checkedin() == 1
+
+
+def test_losing_a_creation_race_keeps_the_shared_pool_warm(db_path):
+    engine = sqlite_engine(db_path)
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    pool = engine.pool
+    cache = ResourceCache()
+
+    def build():
+        # Another session finishes building the same entry first
+        cache.get_or_create(('db', 'a'), lambda: Holder(engine))
+        return Holder(engine)
+    cache.get_or_create(('db', 'a'), build)
+    assert engine.pool is pool and pool.checkedin() == 1
+
+
+def test_private_engines_are_still_disposed(db_path):
+    engine = create_engine(f'sqlite:///{db_path}')
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    pool = engine.pool
+    assert not is_shared(engine)
+    dispose_resource(Holder(engine))
+    assert engine.pool is not pool
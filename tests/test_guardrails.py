@@ -0,0 +1,182 @@
+import threading
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from guardrails import StatementTimeout, check_statement, fetch_capped, guard_stats, statement_timeout
+from results import enforce_limit, fetch_page
+from sql_repair import SQLValidationError, check_read_only, validate_sql
+
+# Counts up forever; only a timeout or a cancel stops it
+ENDLESS = "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT max(i) FROM n"
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'guard.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE Customer (Id INTEGER PRIMARY KEY, Name TEXT)"))
+        conn.execute(text("INSERT INTO Customer (Name) VALUES ('Ann'), ('Bo'), ('Cy'), ('Di'), ('Ed')"))
+    yield engine
+    engine.dispose()
+
+
+# ── Read-only check ──
+@pytest.mark.parametrize('dialect', ['sqlite', 'mysql', None])
+@pytest.mark.parametrize('sql', [
+    "SELECT Name FROM Customer",
+    "select count(*) from Customer;",
+    "WITH c AS (SELECT * FROM Customer) SELECT Name FROM c",
+    "(SELECT 1) UNION (SELECT 2)",
+    "SELECT 'delete; drop' AS note FROM Customer",
+    "SELECT 'it''s', \"a\"\"b\", `c``d` FROM Customer",
+    "/* leading comment */ SELECT 1",
+    "SELECT 1 -- trailing comment; not a second statement",
+    "SELECT Id FROM Customer WHERE Name LIKE '%update%'",
+])
+def test_read_only_accepts_single_select(sql, dialect):
+    assert check_read_only(sql, dialect) == sql.strip().rstrip(';')
+
+
+@pytest.mark.parametrize('dialect', ['sqlite', 'mysql', None])
+@pytest.mark.parametrize('sql', [
+    "DELETE FROM Customer",
+    "SELECT 1; DELETE FROM Customer",
+    "WITH gone AS (DELETE FROM Customer RETURNING *) SELECT * FROM gone",
+    "SELECT * FROM Customer FOR UPDATE",
+    "SELECT sleep(10)",
+    "SELECT Name INTO OUTFILE '/tmp/x' FROM Customer",
+    "SELECT 'unterminated FROM Customer",
+    "SELECT 1 -- it's\n; DELETE FROM Customer; SELECT 'x'",
+    "",
+])
+def test_read_only_rejects(sql, dialect):
+    with pytest.raises(SQLValidationError):
+        check_read_only(sql, dialect)
+
+
+@pytest.mark.parametrize('dialect', ['mysql', None])
+@pytest.mark.parametrize('sql', [
+    # A backslash-escaped quote hides the rest from a lexer that only knows '' escapes
+    "SELECT 'a\\'' ; DELETE FROM Customer; -- '",
+    "SELECT \"a\\\"\" ; DELETE FROM Customer; -- \"",
+    # ... and without backslash escapes (NO_BACKSLASH_ESCAPES / ANSI_QUOTES) the string ends at the backslash
+    "SELECT \"a\\\" ; DELETE FROM Customer; -- \"",
+    # Executable comments run on MySQL
+    "SELECT 1 /*!50000 , sleep(10) */",
+    "/*!50000 DELETE FROM Customer */ SELECT 1",
+    "SELECT 1 # it's\n; DELETE FROM Customer; SELECT 'x'",
+])
+def test_read_only_lexes_mysql_quotes_and_comments(sql, dialect):
+    with pytest.raises(SQLValidationError):
+        check_read_only(sql, dialect)
+
+
+@pytest.mark.parametrize('dialect', ['sqlite', None])
+def test_read_only_lexes_sqlite_bracket_identifiers(dialect):
+    with pytest.raises(SQLValidationError):
+        check_read_only("SELECT [it's] FROM Customer; DELETE FROM Customer; SELECT ''", dialect)
+
+
+def test_sqlite_string_ends_at_quote_not_backslash():
+    # One string on SQLite: the backslash is an ordinary character and '' is the escaped quote
+    sql = "SELECT 'a\\'' ; DELETE FROM Customer; -- '"
+    assert check_read_only(sql, 'sqlite') == sql
+
+
+def test_validate_sql_does_not_explain_rejected_statements(engine):
+    with pytest.raises(SQLValidationError, match='single statement'):
+        validate_sql(engine, "SELECT 1; DELETE FROM Customer")
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM Customer")).scalar() == 5
+
+
+def test_check_statement_counts_rejections():
+    before = dict(guard_stats)
+    check_statement("SELECT 1", 'sqlite')
+    with pytest.raises(SQLValidationError):
+        check_statement("DROP TABLE Customer", 'sqlite')
+    assert guard_stats['statements'] == before['statements'] + 2
+    assert guard_stats['rejected'] == before['rejected'] + 1
+
+
+# ── Statement timeout ──
+def test_statement_timeout_stops_long_query(engine):
+    before = guard_stats['timeouts']
+    with engine.connect() as conn:
+        with pytest.raises(StatementTimeout):
+            with statement_timeout(conn, 0.2):
+                conn.execute(text(ENDLESS)).fetchall()
+        # The progress handler is removed with the block
+        assert conn.execute(text("SELECT count(*) FROM Customer")).scalar() == 5
+    assert guard_stats['timeouts'] == before + 1
+
+
+def test_statement_timeout_leaves_fast_queries_alone(engine):
+    with engine.connect() as conn, statement_timeout(conn, 5):
+        assert conn.execute(text("SELECT count(*) FROM Customer")).scalar() == 5
+
+
+def test_cancel_interrupts_without_counting_a_timeout(engine):
+    before = guard_stats['timeouts']
+    cancel = threading.Event()
+    threading.Timer(0.1, cancel.set).start()
+    with engine.connect() as conn:
+        with pytest.raises(OperationalError, match='interrupted'):
+            with statement_timeout(conn, 30, cancel=cancel):
+                conn.execute(text(ENDLESS)).fetchall()
+    assert guard_stats['timeouts'] == before
+
+
+# ── Row and byte caps ──
+def test_fetch_capped_row_cap(engine):
+    before = guard_stats['row_capped']
+    with engine.connect() as conn:
+        rows, truncated = fetch_capped(conn.execute(text("SELECT Name FROM Customer ORDER BY Id")), 3)
+    assert rows == [['Ann'], ['Bo'], ['Cy']]
+    assert truncated == 'rows'
+    assert guard_stats['row_capped'] == before + 1
+
+
+def test_fetch_capped_whole_result(engine):
+    with engine.connect() as conn:
+        rows, truncated = fetch_capped(conn.execute(text("SELECT Name FROM Customer")), 5)
+    assert len(rows) == 5
+    assert truncated is None
+
+
+def test_fetch_capped_byte_cap(engine):
+    before = guard_stats['byte_capped']
+    with engine.connect() as conn:
+        # 'Ann' and 'Bo' fill the 5 bytes, 'Cy' goes over
+        rows, truncated = fetch_capped(conn.execute(text("SELECT Name FROM Customer ORDER BY Id")), 10, max_bytes=5)
+    assert rows == [['Ann'], ['Bo']]
+    assert truncated == 'bytes'
+    assert guard_stats['byte_capped'] == before + 1
+
+
+def test_fetch_page_reports_more_rows_without_a_notice(engine):
+    before = guard_stats['row_capped']
+    columns, rows, truncated = fetch_page(engine, "SELECT Name FROM Customer ORDER BY Id", 0, page_size=2)
+    assert columns == ['Name'] and rows == [['Ann'], ['Bo']] and truncated == 'rows'
+    columns, rows, truncated = fetch_page(engine, "SELECT Name FROM Customer ORDER BY Id", 2, page_size=2)
+    assert rows == [['Ed']] and truncated is None
+    assert guard_stats['row_capped'] == before
+
+
+def test_fetch_page_respects_max_rows(engine):
+    _, rows, truncated = fetch_page(engine, "SELECT Name FROM Customer ORDER BY Id", 1, page_size=2, max_rows=3)
+    assert rows == [['Cy']] and truncated is None
+
+
+@pytest.mark.parametrize('sql', [
+    "SELECT Name FROM Customer ORDER BY Id -- all customers",
+    "SELECT Name FROM Customer ORDER BY Id LIMIT 3 -- the first three",
+    "SELECT Name FROM Customer /* by id */ ORDER BY Id\n-- trailing\n",
+])
+def test_fetch_page_wraps_trailing_comments(engine, sql):
+    columns, rows, truncated = fetch_page(engine, sql, 0, page_size=2)
+    assert columns == ['Name'] and rows == [['Ann'], ['Bo']] and truncated == 'rows'
+    with engine.connect() as conn:
+        assert conn.execute(text(enforce_limit(check_statement(sql, 'sqlite'), 2))).fetchall() == [('Ann',), ('Bo',)]
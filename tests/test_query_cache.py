@@ -0,0 +1,53 @@
+import pytest
+from sqlalchemy import create_engine, text
+
+from query_cache import QueryCache, result_recorder, run_sql_cached, schema_fingerprint
+
+SQL = "SELECT Name FROM Customer ORDER BY Id"
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'cache.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE Customer (Id INTEGER PRIMARY KEY, Name TEXT)"))
+        conn.execute(text("INSERT INTO Customer (Name) VALUES ('Ann'), ('Bo'), ('Cy'), ('Di'), ('Ed')"))
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return QueryCache(tmp_path / 'answers.db')
+
+
+def test_result_rows_are_served_while_they_cover_the_request(engine, cache):
+    fp = schema_fingerprint(engine)
+    assert run_sql_cached(cache, 'db', fp, engine, SQL, 2) == (['Name'], [['Ann'], ['Bo']], 'rows')
+    assert run_sql_cached(cache, 'db', fp, engine, SQL, 1) == (['Name'], [['Ann']], 'rows')
+    assert cache.stats['result_hits'] == 1
+    # Three rows are more than the two cached: the query runs again and keeps the longer head
+    assert run_sql_cached(cache, 'db', fp, engine, SQL, 3)[1] == [['Ann'], ['Bo'], ['Cy']]
+    assert cache.stats['result_misses'] == 2
+
+
+def test_whole_result_covers_any_request(engine, cache):
+    fp = schema_fingerprint(engine)
+    run_sql_cached(cache, 'db', fp, engine, SQL, 10)
+    assert run_sql_cached(cache, 'db', fp, engine, SQL, 100) == (['Name'], [['Ann'], ['Bo'], ['Cy'], ['Di'], ['Ed']], None)
+    assert cache.stats['result_hits'] == 1
+
+
+def test_result_ttl_is_separate_from_the_answer_ttl(engine, tmp_path):
+    cache = QueryCache(tmp_path / 'answers.db', data_ttl=0, result_ttl=-1)
+    fp = schema_fingerprint(engine)
+    cache.put_answer('db', fp, 'who?', SQL, 'Ann')
+    run_sql_cached(cache, 'db', fp, engine, SQL, 2)
+    assert cache.get_answer('db', fp, 'who?')[2]
+    assert cache.get_result('db', fp, SQL) is None
+
+
+def test_recorded_rows_are_kept_under_the_current_schema(engine, cache):
+    result_recorder(cache, 'db', engine)(SQL, ['Name'], [['Ann']], 'rows')
+    assert cache.get_result('db', schema_fingerprint(engine), SQL, 1) == (['Name'], [['Ann']], 'rows')
+    assert cache.get_result('db', schema_fingerprint(engine), SQL, 2) is None
@@ -0,0 +1,295 @@
+import re
+from functools import lru_cache
+
+THEMES = {
+    'light': {
+        'bg': '#ffffff',
+        'text': '#262626',
+        'secondary_bg': '#f8fafc',
+        'border': '#e2e8f0',
+        'card_bg': '#f1f5f9',
+        'gradient_start': '#667eea',
+        'gradient_end': '#764ba2',
+        'success_bg': '#dcfce7',
+        'success_color': '#15803d',
+        'success_border': '#bbf7d0',
+        'error_bg': '#fef2f2',
+        'error_color': '#dc2626',
+        'error_border': '#fecaca',
+        'feature_bg': 'rgba(102, 126, 234, 0.1)',
+        'main_content_bg': 'rgba(102, 126, 234, 0.08)',
+        'main_content_border': 'rgba(102, 126, 234, 0.2)'
+    },
+    'dark': {
+        'bg': '#0e1117',
+        'text': '#fafafa',
+        'secondary_bg': '#262730',
+        'border': '#464853',
+        'card_bg': '#1e1e2e',
+        'gradient_start': '#667eea',
+        'gradient_end': '#764ba2',
+        'success_bg': '#1a472a',
+        'success_color': '#4ade80',
+        'success_border': '#22543d',
+        'error_bg': '#5b1d1d',
+        'error_color': '#ef4444',
+        'error_border': '#7f1d1d',
+        'feature_bg': 'rgba(102, 126, 234, 0.2)',
+        'main_content_bg': 'rgba(102, 126, 234, 0.15)',
+        'main_content_border': 'rgba(102, 126, 234, 0.3)'
+    },
+}
+
+# Custom CSS with proper theme support; placeholders are THEMES keys
+STYLESHEET = """
+<style>
+    /* Main app background */
+    .stApp {{
+        background-color: {bg} !important;
+        color: {text} !important;
+    }}
+    
+    /* Sidebar styling */
+    .css-1d391kg, .css-1cypcdb, section[data-testid="stSidebar"] {{
+        background-color: {secondary_bg} !important;
+    }}
+    
+    /* Text elements */
+    .stMarkdown, .stText, p, span, div {{
+        color: {text} !important;
+    }}
+    
+    /* Reduce top padding */
+    .block-container {{
+        padding-top: 1rem;
+        padding-bottom: 0rem;
+    }}
+    
+    /* Main title styling */
+    .main-title {{
+        background: linear-gradient(90deg, {gradient_start} 0%, {gradient_end} 100%);
+        -webkit-background-clip: text;
+        -webkit-text-fill-color: transparent;
+        background-clip: text;
+        font-size: 2.5rem;
+        font-weight: bold;
+        text-align: center;
+        margin-bottom: 0.5rem;
+        margin-top: 0;
+    }}
+    
+    /* Sidebar SQLBOT title */
+    .sidebar-header {{
+        background: linear-gradient(45deg, {gradient_start}, {gradient_end});
+        color: white;
+        padding: 1rem;
+        border-radius: 10px;
+        margin-bottom: 1rem;
+        box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
+        text-align: center;
+    }}
+    
+    .sidebar-header h1 {{
+        color: white !important;
+        font-size: 1.8rem;
+        margin: 0;
+        font-weight: bold;
+    }}
+    
+    .sidebar-header p {{
+        color: rgba(255, 255, 255, 0.8) !important;
+        margin: 0.3rem 0 0 0;
+        font-size: 0.85rem;
+    }}
+    
+    /* Connection status indicator */
+    .connection-status {{
+        padding: 0.75rem;
+        border-radius: 8px;
+        text-align: center;
+        margin: 1rem 0;
+        font-weight: bold;
+        border: 1px solid;
+    }}
+    
+    .connected {{
+        background-color: {success_bg};
+        color: {success_color} !important;
+        border-color: {success_border};
+    }}
+    
+    .disconnected {{
+        background-color: {error_bg};
+        color: {error_color} !important;
+        border-color: {error_border};
+    }}
+    
+    /* Database info card */
+    .db-info {{
+        background: {card_bg};
+        padding: 1rem;
+        border-radius: 10px;
+        margin: 1rem 0;
+        border-left: 4px solid {gradient_start};
+        color: {text} !important;
+    }}
+    
+    /* Feature highlights */
+    .feature-box {{
+        background: {feature_bg};
+        padding: 1rem;
+        border-radius: 8px;
+        margin: 0.5rem 0;
+        border-left: 3px solid {gradient_start};
+        color: {text} !important;
+    }}
+    
+    /* File upload info */
+    .file-upload-info {{
+        background: {feature_bg};
+        padding: 1rem;
+        border-radius: 8px;
+        margin: 1rem 0;
+        border-left: 3px solid {gradient_start};
+        color: {text} !important;
+    }}
+    
+    /* Main content styling */
+    .main-content-box {{
+        text-align: center;
+        padding: 1.5rem;
+        background: {main_content_bg};
+        border-radius: 10px;
+        margin-bottom: 1.5rem;
+        border: 1px solid {main_content_border};
+    }}
+    
+    .main-content-box h3 {{
+        color: {gradient_start} !important;
+        margin-bottom: 0.5rem;
+    }}
+    
+    .main-content-box p {{
+        color: {text} !important;
+        opacity: 0.8;
+        margin: 0;
+    }}
+    
+    /* Custom button styling */
+    .stButton > button {{
+        background: linear-gradient(45deg, {gradient_start}, {gradient_end}) !important;
+        color: white !important;
+        border: none !important;
+        border-radius: 8px !important;
+        padding: 0.5rem 1rem !important;
+        font-weight: bold !important;
+        transition: all 0.3s ease !important;
+    }}
+    
+    .stButton > button:hover {{
+        transform: translateY(-2px) !important;
+        box-shadow: 0 4px 8px rgba(0, 0, 0, 0.2) !important;
+    }}
+    
+    /* Theme toggle button specific styling */
+    button[title="Toggle Dark/Light Mode"] {{
+        width: 35px !important;
+        height: 35px !important;
+        min-height: 35px !important;
+        padding: 0 !important;
+        font-size: 18px !important;
+        border-radius: 6px !important;
+        display: flex !important;
+        align-items: center !important;
+        justify-content: center !important;
+    }}
+    
+    /* Chat message styling */
+    .stChatMessage {{
+        background-color: {card_bg} !important;
+        border-radius: 10px !important;
+        margin-bottom: 1rem !important;
+        color: {text} !important;
+    }}
+    
+    /* Input fields */
+    .stTextInput > div > div > input {{
+        background-color: {secondary_bg} !important;
+        color: {text} !important;
+        border-color: {border} !important;
+    }}
+    
+    .stSelectbox > div > div > select {{
+        background-color: {secondary_bg} !important;
+        color: {text} !important;
+        border-color: {border} !important;
+    }}
+    
+    /* Radio buttons */
+    .stRadio > div {{
+        color: {text} !important;
+    }}
+    
+    /* Expander */
+    .streamlit-expanderHeader {{
+        background-color: {secondary_bg} !important;
+        color: {text} !important;
+    }}
+    
+    .streamlit-expanderContent {{
+        background-color: {card_bg} !important;
+        color: {text} !important;
+    }}
+    
+    /* Success/Error messages */
+    .stSuccess {{
+        background-color: {success_bg} !important;
+        color: {success_color} !important;
+    }}
+    
+    .stError {{
+        background-color: {error_bg} !important;
+        color: {error_color} !important;
+    }}
+    
+    .stWarning {{
+        background-color: {feature_bg} !important;
+        color: {text} !important;
+    }}
+    
+    .stInfo {{
+        background-color: {feature_bg} !important;
+        color: {text} !important;
+    }}
+    
+    /* Footer styling */
+    .footer-text {{
+        text-align: center;
+        color: {text} !important;
+        opacity: 0.7;
+        padding: 1rem;
+    }}
+    
+    /* Hide Streamlit branding */
+    #MainMenu {{visibility: hidden;}}
+    footer {{visibility: hidden;}}
+    header {{visibility: hidden;}}
+</style>
+"""
+
+
+def theme_colors(dark_mode):
+    return THEMES['dark' if dark_mode else 'light']
+
+
+@lru_cache(maxsize=None)
+def theme_css(dark_mode):
+    """The stylesheet for one theme, formatted and minified once per process.
+
+    It is re-sent on every full rerun, so comments and indentation are dropped
+    from what goes over the websocket.
+    """
+    css = STYLESHEET.format(**theme_colors(dark_mode))
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.DOTALL)
+    css = re.sub(r'\s+', ' ', css)
+    return re.sub(r'\s*([{};:,>])\s*', r'\1', css).strip()
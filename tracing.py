@@ -0,0 +1,269 @@
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+from sqlalchemy import event as sa_event
+
+TRACE_DIR = Path(os.environ.get('SQLBOT_TRACE_DIR', Path(__file__).parent / '.sqlbot_cache' / 'traces'))
+MAX_STATEMENT_CHARS = 500
+
+_current_trace = contextvars.ContextVar('sqlbot_trace', default=None)
+
+
+def _now_ns():
+    return time.time_ns()
+
+
+class Span:
+    """One timed step of a request: the message itself, an LLM call, a tool, a SQL statement, a cache lookup"""
+
+    __slots__ = ('name', 'kind', 'span_id', 'parent_id', 'start_ns', 'end_ns', 'attrs', 'error')
+
+    def __init__(self, name, kind, parent_id=None, **attrs):
+        self.name = name
+        self.kind = kind
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.start_ns = _now_ns()
+        self.end_ns = None
+        self.attrs = attrs
+        self.error = None
+
+    def end(self, error=None, **attrs):
+        self.end_ns = _now_ns()
+        self.attrs.update(attrs)
+        if error is not None:
+            self.error = str(error)
+
+    @property
+    def duration_ms(self):
+        return ((self.end_ns or _now_ns()) - self.start_ns) / 1e6
+
+    def to_dict(self):
+        return {
+            'name': self.name, 'kind': self.kind, 'span_id': self.span_id, 'parent_id': self.parent_id,
+            'start_ns': self.start_ns, 'end_ns': self.end_ns, 'duration_ms': round(self.duration_ms, 3),
+            'attrs': self.attrs, 'error': self.error,
+        }
+
+
+class Trace:
+    """Span tree for one chat message"""
+
+    def __init__(self, name, **attrs):
+        self.trace_id = uuid.uuid4().hex
+        self.root = Span(name, 'message', **attrs)
+        self.spans = [self.root]
+        self._lock = threading.Lock()
+
+    def start_span(self, name, kind='internal', parent_id=None, **attrs):
+        span = Span(name, kind, parent_id or self.root.span_id, **attrs)
+        with self._lock:
+            self.spans.append(span)
+        return span
+
+    @contextmanager
+    def span(self, name, kind='internal', **attrs):
+        span = self.start_span(name, kind, **attrs)
+        try:
+            yield span
+        except BaseException as e:
+            span.end(error=e)
+            raise
+        span.end()
+
+    @contextmanager
+    def activate(self):
+        """Make this the current trace for code (and executor threads) running in this context"""
+        token = _current_trace.set(self)
+        try:
+            yield self
+        finally:
+            _current_trace.reset(token)
+
+    def finish(self, **attrs):
+        self.root.end(**attrs)
+
+    def open_span(self, kind):
+        """Innermost still-running span of a kind (e.g. the tool a SQL statement belongs to)"""
+        with self._lock:
+            for span in reversed(self.spans):
+                if span.kind == kind and span.end_ns is None:
+                    return span
+        return None
+
+    def last_span(self, kind):
+        with self._lock:
+            for span in reversed(self.spans):
+                if span.kind == kind:
+                    return span
+        return None
+
+    def tree(self):
+        """(depth, span) pairs in start order, children under their parent"""
+        children = {}
+        for span in self.spans[1:]:
+            children.setdefault(span.parent_id, []).append(span)
+        out = []
+
+        def walk(span, depth):
+            out.append((depth, span))
+            for child in sorted(children.get(span.span_id, []), key=lambda s: s.start_ns):
+                walk(child, depth + 1)
+
+        walk(self.root, 0)
+        return out
+
+    def summary(self):
+        """Totals per span kind, for a one-line breakdown of where the time went"""
+        totals = {}
+        for span in self.spans[1:]:
+            entry = totals.setdefault(span.kind, {'count': 0, 'ms': 0.0})
+            entry['count'] += 1
+            entry['ms'] += span.duration_ms
+        return totals
+
+    def to_dict(self):
+        return {'trace_id': self.trace_id, 'spans': [s.to_dict() for s in self.spans]}
+
+    def to_otlp_spans(self):
+        spans = []
+        for s in self.spans:
+            attributes = [{'key': 'sqlbot.kind', 'value': {'stringValue': s.kind}}]
+            attributes += [{'key': k, 'value': _otlp_value(v)} for k, v in s.attrs.items()]
+            spans.append({
+                'traceId': self.trace_id,
+                'spanId': s.span_id,
+                'parentSpanId': s.parent_id or '',
+                'name': s.name,
+                'kind': 1,
+                'startTimeUnixNano': str(s.start_ns),
+                'endTimeUnixNano': str(s.end_ns or s.start_ns),
+                'attributes': attributes,
+                'status': {'code': 2, 'message': s.error} if s.error else {'code': 1},
+            })
+        return spans
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name, kind='internal', **attrs):
+    """Span on the current trace; a no-op outside a traced request"""
+    trace = current_trace()
+    if trace is None:
+        yield None
+        return
+    with trace.span(name, kind, **attrs) as s:
+        yield s
+
+
+def record(name, kind, duration_ms=0.0, **attrs):
+    """Add an already-finished span (e.g. a cache lookup) to the current trace"""
+    trace = current_trace()
+    if trace is None:
+        return None
+    s = trace.start_span(name, kind, **attrs)
+    s.end()
+    s.start_ns = s.end_ns - int(duration_ms * 1e6)
+    return s
+
+
+def annotate_sql(**attrs):
+    """Attach facts only the caller knows (e.g. rows fetched) to the latest SQL span"""
+    trace = current_trace()
+    s = trace.last_span('sql') if trace is not None else None
+    if s is not None:
+        s.attrs.update(attrs)
+
+
+def token_usage(response):
+    """(prompt, completion) tokens of an LLMResult, from message usage metadata or llm_output"""
+    prompt = completion = 0
+    for generations in response.generations:
+        for gen in generations:
+            usage = getattr(getattr(gen, 'message', None), 'usage_metadata', None) or {}
+            prompt += usage.get('input_tokens', 0)
+            completion += usage.get('output_tokens', 0)
+    if not prompt and not completion:
+        usage = (response.llm_output or {}).get('token_usage', {})
+        prompt, completion = usage.get('prompt_tokens', 0), usage.get('completion_tokens', 0)
+    return prompt, completion
+
+
+def instrument_engine(engine):
+    """Record every SQL statement run on this engine as a span on the current trace (idempotent)"""
+    if getattr(engine, '_sqlbot_traced', False):
+        return engine
+
+    @sa_event.listens_for(engine, 'before_cursor_execute')
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('sqlbot_query_start', []).append(time.perf_counter())
+
+    @sa_event.listens_for(engine, 'after_cursor_execute')
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info['sqlbot_query_start'].pop()
+        trace = current_trace()
+        if trace is None:
+            return
+        tool = trace.open_span('tool')
+        s = trace.start_span('sql', 'sql', tool.span_id if tool else None,
+                             statement=statement[:MAX_STATEMENT_CHARS], dialect=engine.dialect.name)
+        s.end(**({'rowcount': cursor.rowcount} if cursor.rowcount >= 0 else {}))
+        s.start_ns = s.end_ns - int((time.perf_counter() - started) * 1e9)
+
+    engine._sqlbot_traced = True
+    return engine
+
+
+def export_jsonl(traces, path):
+    """Append traces, one JSON object per line"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'a', encoding='utf-8') as f:
+        for trace in traces:
+            f.write(json.dumps(trace.to_dict(), default=str) + '\n')
+    return path
+
+
+def export_otlp(traces, path, service_name='sqlbot'):
+    """Write traces as an OTLP/JSON ExportTraceServiceRequest that collectors can ingest"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    payload = {'resourceSpans': [{
+        'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': service_name}}]},
+        'scopeSpans': [{
+            'scope': {'name': 'sqlbot.tracing'},
+            'spans': [s for trace in traces for s in trace.to_otlp_spans()],
+        }],
+    }]}
+    path.write_text(json.dumps(payload, default=str), encoding='utf-8')
+    return path
+
+
+def timed_stream(chunks, timings):
+    """Pass chunks through, recording time-to-first-token and total time (seconds) in `timings`"""
+    start = time.perf_counter()
+    for chunk in chunks:
+        if 'ttft' not in timings:
+            timings['ttft'] = time.perf_counter() - start
+        yield chunk
+    timings['total'] = time.perf_counter() - start
+    timings.setdefault('ttft', timings['total'])
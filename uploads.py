@@ -0,0 +1,108 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+UPLOAD_DIR = Path(os.environ.get('SQLBOT_UPLOAD_DIR', Path(tempfile.gettempdir()) / 'sqlbot_uploads'))
+UPLOAD_QUOTA_BYTES = int(os.environ.get('SQLBOT_UPLOAD_QUOTA_MB', '2048')) * 1024 * 1024
+CHUNK_SIZE = 1024 * 1024
+SQLITE_HEADER = b'SQLite format 3\x00'
+
+
+def _chunks(fileobj, chunk_size=CHUNK_SIZE):
+    fileobj.seek(0)
+    while True:
+        chunk = fileobj.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+    fileobj.seek(0)
+
+
+def hash_upload(fileobj, chunk_size=CHUNK_SIZE):
+    """SHA-256 of a file-like object, read in chunks"""
+    digest = hashlib.sha256()
+    for chunk in _chunks(fileobj, chunk_size):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def upload_path(sha, upload_dir=UPLOAD_DIR):
+    return Path(upload_dir) / f'{sha}.db'
+
+
+def store_upload(fileobj, sha=None, upload_dir=UPLOAD_DIR, quota_bytes=UPLOAD_QUOTA_BYTES):
+    """Store an uploaded SQLite file once under its content hash and return (sha, path).
+
+    Re-uploading identical content (or rerunning the script) reuses the existing
+    copy; only new content is streamed to disk.
+    """
+    upload_dir = Path(upload_dir)
+    upload_dir.mkdir(parents=True, exist_ok=True)
+    sha = sha or hash_upload(fileobj)
+    path = upload_path(sha, upload_dir)
+
+    if path.exists():
+        path.touch()
+        return sha, path
+
+    fileobj.seek(0)
+    if fileobj.read(len(SQLITE_HEADER)) != SQLITE_HEADER:
+        fileobj.seek(0)
+        raise ValueError("The uploaded file is not a valid SQLite database.")
+
+    fd, tmp_path = tempfile.mkstemp(dir=upload_dir, suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            for chunk in _chunks(fileobj):
+                out.write(chunk)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+    enforce_quota(upload_dir, quota_bytes, keep={path.name})
+    return sha, path
+
+
+def private_copy(path, owner, upload_dir=UPLOAD_DIR, quota_bytes=UPLOAD_QUOTA_BYTES):
+    """Writable copy of a stored upload owned by one session (e.g. to add indexes to).
+
+    The content-addressed original must stay byte-identical to its name: it is
+    opened immutable and shared by every session reading the same content.
+    """
+    private_dir = Path(upload_dir) / 'private'
+    private_dir.mkdir(parents=True, exist_ok=True)
+    copy = private_dir / f'{owner}-{Path(path).name}'
+    if copy.exists():
+        copy.touch()
+        return copy
+    fd, tmp_path = tempfile.mkstemp(dir=private_dir, suffix='.part')
+    os.close(fd)
+    try:
+        shutil.copyfile(path, tmp_path)
+        os.replace(tmp_path, copy)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    enforce_quota(private_dir, quota_bytes, keep={copy.name})
+    return copy
+
+
+def enforce_quota(upload_dir=UPLOAD_DIR, quota_bytes=UPLOAD_QUOTA_BYTES, keep=()):
+    """Delete least-recently-used uploads until the directory fits in quota_bytes"""
+    files = [p for p in Path(upload_dir).glob('*.db') if p.name not in keep]
+    files.sort(key=lambda p: p.stat().st_mtime)
+    total = sum(p.stat().st_size for p in Path(upload_dir).glob('*.db'))
+    for p in files:
+        if total <= quota_bytes:
+            break
+        try:
+            size = p.stat().st_size
+            p.unlink()
+            total -= size
+        except OSError:
+            pass
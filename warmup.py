@@ -0,0 +1,197 @@
+import json
+import threading
+import time
+from pathlib import Path
+
+from sqlalchemy import MetaData, inspect, text
+
+from guardrails import StatementTimeout, statement_timeout
+from query_cache import schema_fingerprint
+from schema_catalog import short_type
+
+STATS_DIR = Path(__file__).parent / '.sqlbot_cache' / 'stats'
+STATS_SAMPLE_ROWS = 100000
+TOP_VALUES = 5
+TOP_VALUE_COLUMNS = 8
+MAX_VALUE_LEN = 40
+
+
+def _plain(value):
+    """JSON-safe form of a driver value (Decimal, dates, bytes)"""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value if not isinstance(value, str) else value[:MAX_VALUE_LEN]
+    return str(value)[:MAX_VALUE_LEN]
+
+
+def reflect_database(db):
+    """Reflect a lazily created SQLDatabase's tables into fresh metadata, then swap it in.
+
+    Tools that reflect on demand keep using the old (partial) metadata until the
+    swap, so the two never mutate the same MetaData concurrently.
+    """
+    metadata = MetaData()
+    metadata.reflect(views=db._view_support, bind=db._engine, only=list(db._usable_tables), schema=db._schema)
+    db._metadata = metadata
+
+
+def table_stats(conn, inspector, table, sample_rows=STATS_SAMPLE_ROWS):
+    """Row count and per-column distinct count, nulls, min/max and top values for one table.
+
+    Each table is read in one aggregate pass over at most `sample_rows` rows,
+    which is also what pulls its pages into the page cache / buffer pool.
+    """
+    quote = conn.dialect.identifier_preparer.quote
+    columns = inspector.get_columns(table)
+    source = f"(SELECT * FROM {quote(table)} LIMIT {int(sample_rows)}) AS sampled"
+    aggregates = ['count(*)']
+    for c in columns:
+        col = quote(c['name'])
+        aggregates += [f'count(DISTINCT {col})', f'count({col})', f'min({col})', f'max({col})']
+    row = conn.execute(text(f"SELECT {', '.join(aggregates)} FROM {source}")).fetchone()
+    sampled = row[0]
+    stats = {'rows': sampled, 'sampled': sampled >= sample_rows, 'columns': {}}
+    if stats['sampled']:
+        stats['rows'] = conn.execute(text(f"SELECT count(*) FROM {quote(table)}")).scalar()
+    for i, c in enumerate(columns):
+        distinct, non_null, low, high = row[1 + 4 * i:5 + 4 * i]
+        stats['columns'][c['name']] = {
+            'type': short_type(c['type']), 'distinct': distinct, 'nulls': sampled - non_null,
+            'min': _plain(low), 'max': _plain(high), 'top': [],
+        }
+    # Top values only say something for categorical text columns
+    categorical = [name for name, s in stats['columns'].items()
+                   if s['type'] == 'text' and 0 < s['distinct'] < max(sampled, 2) / 2]
+    for name in categorical[:TOP_VALUE_COLUMNS]:
+        col = quote(name)
+        top = conn.execute(text(
+            f"SELECT {col}, count(*) AS n FROM {source} WHERE {col} IS NOT NULL "
+            f"GROUP BY {col} ORDER BY n DESC LIMIT {TOP_VALUES}"
+        )).fetchall()
+        stats['columns'][name]['top'] = [[_plain(v), n] for v, n in top]
+    return stats
+
+
+def prime(conn, table, sample_rows=STATS_SAMPLE_ROWS):
+    """Read at most `sample_rows` rows of a table under the statement timeout; False if it timed out"""
+    quote = conn.dialect.identifier_preparer.quote
+    try:
+        with statement_timeout(conn):
+            conn.execute(text(
+                f"SELECT count(*) FROM (SELECT * FROM {quote(table)} LIMIT {int(sample_rows)}) AS primed"
+            )).scalar()
+    except StatementTimeout:
+        return False
+    return True
+
+
+def analyze(conn, table):
+    """Refresh optimizer statistics where the connection is allowed to (MySQL ANALYZE TABLE)"""
+    if conn.dialect.name == 'mysql':
+        try:
+            conn.execute(text(f"ANALYZE TABLE {conn.dialect.identifier_preparer.quote(table)}")).fetchall()
+        except Exception:
+            pass
+
+
+def stats_path(db_id, stats_dir=STATS_DIR):
+    return Path(stats_dir) / f'{db_id}.json'
+
+
+def load_stats(path, schema_fp):
+    """Persisted statistics for this schema, or None if missing or taken on another schema"""
+    try:
+        saved = json.loads(Path(path).read_text())
+    except (OSError, ValueError):
+        return None
+    return saved['tables'] if saved.get('schema_fp') == schema_fp else None
+
+
+def save_stats(path, schema_fp, tables):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix('.tmp')
+    tmp.write_text(json.dumps({'schema_fp': schema_fp, 'saved_at': time.time(), 'tables': tables}))
+    tmp.replace(path)
+
+
+class Warmup:
+    """Background warmup of one connection, started as soon as it is configured.
+
+    In a daemon thread it runs the `prepare` callables (reflecting the
+    SQLDatabase, building the schema catalog), then gathers row counts and
+    column statistics, priming the page cache / buffer pool with those scans.
+    Statistics are persisted per database and schema fingerprint; on reconnect
+    they are reused and only a light priming scan runs. The script thread only
+    reads `progress()`.
+    """
+
+    def __init__(self, path, prepare=()):
+        self.path = path
+        self.prepare = list(prepare)
+        self.status = 'pending'
+        self.tables = {}
+        self.total = 0
+        self.done = 0
+        self.current = None
+        self.reused = False
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+        self._thread = None
+
+    @classmethod
+    def start(cls, engine, path, prepare=()):
+        warmup = cls(path, prepare)
+        warmup._thread = threading.Thread(target=warmup._run, args=(engine,), name='sqlbot-warmup', daemon=True)
+        warmup.started_at = time.perf_counter()
+        warmup.status = 'running'
+        warmup._thread.start()
+        return warmup
+
+    def _run(self, engine):
+        try:
+            self.current = 'schema'
+            for step in self.prepare:
+                step()
+            schema_fp = schema_fingerprint(engine)
+            saved = load_stats(self.path, schema_fp)
+            self.reused = saved is not None
+            with engine.connect() as conn:
+                # Reflect on this connection; a second checkout could wait on a pool the sessions drained
+                inspector = inspect(conn)
+                names = sorted(saved) if saved is not None else inspector.get_table_names()
+                self.total = len(names)
+                for name in names:
+                    self.current = name
+                    if saved is not None:
+                        # Statistics are known; a scan bounded like the statistics pass still pulls
+                        # the table's first pages into cache
+                        prime(conn, name)
+                        self.tables[name] = saved[name]
+                    else:
+                        analyze(conn, name)
+                        self.tables[name] = table_stats(conn, inspector, name)
+                    self.done += 1
+            if saved is None:
+                save_stats(self.path, schema_fp, self.tables)
+            status = 'done'
+        except Exception as e:
+            self.error = str(e)
+            status = 'failed'
+        self.current = None
+        self.finished_at = time.perf_counter()
+        self.status = status
+
+    @property
+    def ready(self):
+        return self.status == 'done'
+
+    def progress(self):
+        """(fraction done, one-line status) for the sidebar"""
+        if self.status == 'failed':
+            return 1.0, f"Warmup failed: {self.error}"
+        if self.status == 'done':
+            source = 'reused saved statistics' if self.reused else 'statistics gathered'
+            return 1.0, f"Warm: {self.total} tables, {source} in {self.finished_at - self.started_at:.1f}s"
+        fraction = self.done / self.total if self.total else 0.0
+        return fraction, f"Warming up: {self.current or '…'} ({self.done}/{self.total or '?'} tables)"